@@ -1,4 +1,6 @@
-from fastapi import Depends, HTTPException, status
+import time
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.core.config import get_settings, Settings
@@ -7,9 +9,19 @@ security = HTTPBearer(auto_error=False)
 
 
 async def verify_api_key(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     settings: Settings = Depends(get_settings)
 ) -> str:
+    # Handlers report this as the "auth" phase of Server-Timing
+    request.state.started = time.perf_counter()
+    try:
+        return _check_credentials(credentials, settings)
+    finally:
+        request.state.auth_seconds = time.perf_counter() - request.state.started
+
+
+def _check_credentials(credentials: HTTPAuthorizationCredentials, settings: Settings) -> str:
     # Optional auth to allow guest tracking by IP in routes
     if not credentials:
         return None
@@ -0,0 +1,122 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class BatchLineTooLong(ValueError):
+    pass
+
+
+async def iter_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Splits a byte stream into lines without buffering more than one line.
+
+    Oversized lines are yielded as BatchLineTooLong instances so the caller can
+    report them against their index and keep going."""
+    buffer = bytearray()
+    skipping = False
+    async for chunk in stream:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        skipping = True
+                break
+            if skipping:
+                skipping = False
+                yield BatchLineTooLong(f"Line exceeds {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield BatchLineTooLong(f"Line exceeds {max_line_bytes} bytes")
+                else:
+                    yield bytes(buffer)
+                buffer.clear()
+            start = end + 1
+    if skipping:
+        yield BatchLineTooLong(f"Line exceeds {max_line_bytes} bytes")
+    elif buffer:
+        yield bytes(buffer)
+
+
+class ProviderSlots:
+    """Per-provider semaphores capping how many batch items hit one upstream
+    at a time, shared by every batch in the process."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def hold(self, provider_name: str):
+        slot = self._slots.get(provider_name)
+        if slot is None:
+            slot = self._slots[provider_name] = asyncio.Semaphore(self.limit)
+        async with slot:
+            yield
+
+
+async def run_batch(
+    lines: AsyncIterator[Any],
+    dispatch: Callable[[int, Any], Awaitable[Dict[str, Any]]],
+    max_in_flight: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Dispatches each non-blank input line and yields results in completion
+    order.
+
+    A slot is held from dispatch until the result has been consumed, so at most
+    max_in_flight items are parsed, running or waiting to be written at once;
+    reading the input pauses while all slots are taken."""
+    slots = asyncio.Semaphore(max_in_flight)
+    results: asyncio.Queue = asyncio.Queue()
+    tasks: Set[asyncio.Task] = set()
+    reader_error: Optional[BaseException] = None
+
+    async def run_item(index: int, line: Any) -> None:
+        await results.put(await dispatch(index, line))
+
+    async def read() -> None:
+        nonlocal reader_error
+        index = 0
+        try:
+            async for line in lines:
+                if isinstance(line, bytes) and not line.strip():
+                    continue
+                await slots.acquire()
+                task = asyncio.create_task(run_item(index, line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                index += 1
+        except Exception as e:
+            reader_error = e
+        if tasks:
+            await asyncio.wait(set(tasks))
+        await results.put(None)
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+            slots.release()
+        if reader_error is not None:
+            raise reader_error
+    finally:
+        reader.cancel()
+        for task in list(tasks):
+            task.cancel()
+
+
+provider_slots = ProviderSlots(settings.batch_provider_concurrency)
+
+def get_provider_slots() -> ProviderSlots:
+    return provider_slots
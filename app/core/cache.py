@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.schemas import ChatResponse, new_completion_id
+
+settings = get_settings()
+
+
+class ResponseCache:
+    """Exact-match LRU cache of chat completions bounded by a byte budget.
+
+    Entries are stored as serialized JSON so their size is exact and cached
+    objects can never be mutated by a caller."""
+
+    def __init__(self, max_bytes: int, default_ttl: float):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # {key: (expires_at, stored_at, payload)}
+        self._entries: "OrderedDict[str, Tuple[float, float, bytes]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[ChatResponse, float]]:
+        """Returns (response, age_seconds) for a live entry, or None."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, stored_at, payload = entry
+        if expires_at <= now:
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        response = ChatResponse.model_validate_json(payload)
+        response.id = new_completion_id()
+        return response, now - stored_at
+
+    def set(self, key: str, response: ChatResponse, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        payload = response.model_dump_json().encode("utf-8")
+        if len(payload) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        now = time.monotonic()
+        self._entries[key] = (now + ttl, now, payload)
+        self.current_bytes += len(payload)
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str) -> None:
+        _, _, payload = self._entries.pop(key)
+        self.current_bytes -= len(payload)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.cache_max_bytes,
+    default_ttl=settings.cache_default_ttl
+)
+
+def get_response_cache() -> ResponseCache:
+    return response_cache
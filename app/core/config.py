@@ -2,9 +2,7 @@ from pydantic_settings import BaseSettings
 from functools import lru_cache
 from dotenv import load_dotenv
 import os
-
-# Load .env file at the very beginning
-load_dotenv()
+from typing import List
 
 class Settings(BaseSettings):
     app_name: str = "AxonNexus API"
@@ -15,11 +13,181 @@ class Settings(BaseSettings):
     openrouter_api_key: str = os.getenv("OPENROUTER_API_KEY", "")
     groq_api_key: str = os.getenv("GROQ_API_KEY", "")
     mistral_api_key: str = os.getenv("MISTRAL_API_KEY", "")
+
+    # Optional comma-separated key pools, used together with the single keys above
+    groq_api_keys: str = os.getenv("GROQ_API_KEYS", "")
+    nvidia_api_keys: str = os.getenv("NVIDIA_API_KEYS", "")
+    openrouter_api_keys: str = os.getenv("OPENROUTER_API_KEYS", "")
+    mistral_api_keys: str = os.getenv("MISTRAL_API_KEYS", "")
+
+    # Declarative model registry file; empty uses app/models/models.json.
+    # Send SIGHUP to reload it without a restart
+    model_registry_path: str = ""
+
+    # Upstream base URLs
+    groq_base_url: str = "https://api.groq.com/openai/v1"
+    nvidia_base_url: str = "https://integrate.api.nvidia.com/v1"
+    openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    mistral_base_url: str = "https://api.mistral.ai/v1"
+
+    # Shared upstream HTTP transport (one pool per provider)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = True
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 60.0
+    http_write_timeout: float = 10.0
+    http_pool_timeout: float = 5.0
+
+    # Overall time budget for one request, shared by routing, failover attempts
+    # and the whole upstream call. A model's registry "deadline" or the tier's
+    # <tier>_request_deadline replaces it; clients can set their own with the
+    # X-Axon-Timeout header (seconds), up to request_deadline_max
+    request_deadline: float = 60.0
+    request_deadline_max: float = 300.0
+    # Cap on a single backend attempt when a fallback is still available
+    failover_attempt_timeout: float = 20.0
+
+    # Per-provider circuit breakers
+    breaker_failure_threshold: int = 5
+    breaker_error_rate: float = 0.5
+    breaker_window: int = 50
+    breaker_min_samples: int = 10
+    breaker_open_seconds: float = 30.0
+    breaker_half_open_probes: int = 1
+    # Seconds between background probes of unhealthy providers; 0 disables
+    health_probe_interval: float = 0.0
+
+    # Adaptive per-provider concurrency limits. The limit moves between the
+    # min and max with upstream latency; calls over it queue (up to
+    # admission_max_queue, for up to admission_queue_timeout seconds) and are
+    # otherwise shed with 503 and Retry-After
+    admission_enabled: bool = True
+    admission_initial_limit: int = 20
+    admission_min_limit: int = 2
+    admission_max_limit: int = 200
+    admission_max_queue: int = 50
+    admission_queue_timeout: float = 2.0
+    # Latency may grow to this multiple of its long-run average before the limit shrinks
+    admission_tolerance: float = 2.0
+
+    # Exact-match response cache
+    cache_enabled: bool = True
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_default_ttl: float = 300.0
+    # Fraction of a cached response's tokens charged to the caller's daily budget
+    cache_hit_charge_ratio: float = 0.0
+
+    # History trimming before dispatch: "" (off), "last_n", "fit" or "middle_out";
+    # clients may pick one per request with X-Axon-Trim, or send "off". last_n
+    # keeps system messages and the last trim_last_turns turns. fit and
+    # middle_out shrink the prompt to the smallest registry context_window in
+    # the backend chain minus max_tokens, and to trim_max_prompt_tokens if set
+    trim_strategy: str = ""
+    trim_last_turns: int = 8
+    trim_max_prompt_tokens: int = 0
+
+    # Coalesce identical in-flight requests into a single upstream call
+    coalesce_enabled: bool = True
+
+    # Batch endpoint: items dispatched or awaiting output per batch, concurrent
+    # upstream calls per provider across all batches, and max bytes per input line
+    batch_max_in_flight: int = 64
+    batch_provider_concurrency: int = 16
+    batch_max_line_bytes: int = 1024 * 1024
+
+    # Prometheus metrics. With several workers, point every worker at the same
+    # directory (cleared on deploy) and flush interval so /metrics sums them all.
+    # Exited workers' counters are folded into one retired.json in it
+    metrics_enabled: bool = True
+    metrics_multiprocess_dir: str = ""
+    metrics_flush_interval: float = 5.0
+
+    # Structured per-request phase timing log (logger "app.timing"), optionally
+    # only for requests slower than the threshold
+    timing_log_enabled: bool = False
+    timing_log_min_ms: float = 0.0
+
+    # Durable usage ledger (SQLite, WAL mode) behind /v1/usage. Events are
+    # buffered in memory and written in batches every ledger_flush_interval
+    # seconds or ledger_batch_size events; beyond ledger_max_pending buffered
+    # events new ones are dropped. Every ledger_compact_interval seconds they
+    # are rolled into daily totals, and raw events are kept for
+    # ledger_retention_days. usage_admin_key may read every key's usage
+    ledger_enabled: bool = True
+    ledger_path: str = "data/usage.db"
+    ledger_flush_interval: float = 1.0
+    ledger_batch_size: int = 500
+    ledger_max_pending: int = 100_000
+    ledger_compact_interval: float = 60.0
+    ledger_retention_days: float = 7.0
+    usage_admin_key: str = ""
+
+    # Providers and their HTTP clients are created on first use. With warm-up
+    # on, the lifespan startup builds the ones with keys and opens a connection
+    # to each upstream first, waiting at most startup_warmup_timeout seconds
+    startup_warmup: bool = False
+    startup_warmup_timeout: float = 5.0
+
+    # Production launcher (python -m app.server). 0 workers starts one per
+    # available CPU. keepalive should outlast the load balancer's idle timeout;
+    # limit_concurrency caps connections per worker, answering 503 beyond it
+    # (0 for no cap). Workers are recycled after max_requests plus up to
+    # max_requests_jitter requests (0 never), and get graceful_timeout seconds
+    # on SIGTERM to finish in-flight requests and streams
+    server_host: str = "0.0.0.0"
+    server_port: int = 5000
+    server_workers: int = 0
+    server_backlog: int = 2048
+    server_keepalive: int = 75
+    server_limit_concurrency: int = 1000
+    server_max_requests: int = 20000
+    server_max_requests_jitter: int = 2000
+    server_graceful_timeout: int = 60
+    server_access_log: bool = False
+
+    # Rate limiter storage: "memory" (single worker), "shm" (workers on one host) or "redis"
+    limiter_backend: str = "memory"
+    limiter_redis_url: str = "redis://localhost:6379/0"
+    # File the shm backend maps; app.server derives one per app name and port
+    limiter_shm_path: str = ""
+    limiter_shm_slots: int = 65536
+    # In-memory backend bounds: hard cap on tracked keys and idle eviction age
+    limiter_max_keys: int = 1_000_000
+    limiter_idle_ttl: float = 86400.0
+
+    # Per-tier limits
+    guest_rpm: int = 5
+    guest_daily_tokens: int = 2000
+    test_rpm: int = 10
+    test_daily_tokens: int = 10000
+    premium_rpm: int = 30
+    premium_daily_tokens: int = 50000
+    # Per-tier request deadlines in seconds; 0 uses request_deadline
+    guest_request_deadline: float = 30.0
+    test_request_deadline: float = 0.0
+    premium_request_deadline: float = 0.0
+    # Per-tier weights in the fair queue ahead of each provider's admission
+    # limit: under contention a tier gets upstream slots in this proportion
+    guest_weight: float = 1.0
+    test_weight: float = 2.0
+    premium_weight: float = 8.0
     
     class Config:
         extra = "ignore"
 
+    def api_keys(self, provider: str) -> List[str]:
+        """All configured keys for a provider, single key first, without duplicates."""
+        single = getattr(self, f"{provider}_api_key", "")
+        pooled = getattr(self, f"{provider}_api_keys", "")
+        keys = [k.strip() for k in [single, *pooled.split(",")] if k.strip()]
+        return list(dict.fromkeys(keys))
+
 
 @lru_cache()
 def get_settings() -> Settings:
+    """Settings from the environment and .env, read on first use rather than
+    at import, so the environment can still be adjusted before then."""
+    load_dotenv()
     return Settings()
@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when a request runs out of its time budget."""
+
+
+class RouteContext:
+    """Per-request state collected while routing, such as response headers
+    that the route handler copies onto the HTTP response and the time spent
+    in each routing phase."""
+
+    def __init__(self, use_cache: bool = True, deadline: Optional[float] = None, started: Optional[float] = None) -> None:
+        self.use_cache = use_cache
+        # Absolute time.monotonic() by which the request must complete
+        self.deadline = deadline
+        self.headers: Dict[str, str] = {}
+        # time.perf_counter() when handling began, and seconds spent per phase
+        self.started = time.perf_counter() if started is None else started
+        self.timings: Dict[str, float] = {}
+        # History trimming strategy chosen by the client; None uses the setting
+        self.trim: Optional[str] = None
+
+    def remaining(self) -> float:
+        return float("inf") if self.deadline is None else self.deadline - time.monotonic()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Adds the time spent inside the block to phase `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - started)
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def timing_ms(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, plus the total so far."""
+        timings = {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timing_ms().items())
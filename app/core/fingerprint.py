@@ -0,0 +1,13 @@
+import hashlib
+import json
+from typing import Iterable, Optional, Tuple
+
+
+def request_fingerprint(internal_model: str, messages: Iterable[Tuple[str, str]], max_tokens: Optional[int], temperature: Optional[float]) -> str:
+    """Returns a canonical hash of everything that determines an upstream completion."""
+    canonical = json.dumps(
+        [internal_model, [[role, content] for role, content in messages], max_tokens, temperature],
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
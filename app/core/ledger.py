@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.metrics import LEDGER_DROPPED, LEDGER_FLUSH_LATENCY, LEDGER_PENDING
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    key_hint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    cached INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_events_ts ON usage_events (ts);
+CREATE TABLE IF NOT EXISTS usage_daily (
+    day TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    key_hint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    cached_requests INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    PRIMARY KEY (day, key_id, model)
+);
+CREATE TABLE IF NOT EXISTS ledger_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+INSERT_EVENTS = """
+INSERT INTO usage_events (ts, day, key_id, key_hint, model, cached, prompt_tokens, completion_tokens, total_tokens)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+ROLL_UP = """
+INSERT INTO usage_daily (day, key_id, key_hint, model, requests, cached_requests, prompt_tokens, completion_tokens, total_tokens)
+SELECT day, key_id, MAX(key_hint), model, COUNT(*), SUM(cached), SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens)
+FROM usage_events WHERE id > ? AND id <= ?
+GROUP BY day, key_id, model
+ON CONFLICT (day, key_id, model) DO UPDATE SET
+    requests = requests + excluded.requests,
+    cached_requests = cached_requests + excluded.cached_requests,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    total_tokens = total_tokens + excluded.total_tokens
+"""
+
+# Rollups plus the events not rolled up yet, so totals are never behind the log
+TOTALS = """
+SELECT key_id, MAX(key_hint), model, SUM(requests), SUM(cached_requests),
+       SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens)
+FROM (
+    SELECT day, key_id, key_hint, model, requests, cached_requests, prompt_tokens, completion_tokens, total_tokens
+    FROM usage_daily
+    UNION ALL
+    SELECT day, key_id, key_hint, model, 1, cached, prompt_tokens, completion_tokens, total_tokens
+    FROM usage_events WHERE id > (SELECT COALESCE(MAX(value), 0) FROM ledger_state WHERE name = 'rolled_up_to')
+)
+WHERE day BETWEEN ? AND ? {key_filter}
+GROUP BY key_id, model
+ORDER BY key_id, model
+"""
+
+Event = Tuple[float, str, str, str, str, int, int, int, int]
+
+
+def key_id(client_key: str) -> str:
+    """Stable identifier for a client key; the key itself is never stored."""
+    return hashlib.sha256(client_key.encode()).hexdigest()[:16]
+
+
+class UsageLedger:
+    """Durable log of token usage, in SQLite in WAL mode.
+
+    `record` only appends to an in-memory buffer, so the request path never
+    waits on disk. A background task writes the buffer every
+    `flush_interval` seconds, or once `batch_size` events are waiting, as one
+    transaction (group commit) in a worker thread. Every `compact_interval`
+    seconds, new events are added into per-day, per-key, per-model rollups,
+    and rolled-up events older than `retention_days` are deleted. Several
+    workers can share one file. If writes fail the buffer is kept, up to
+    `max_pending` events, and dropped beyond that."""
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 500,
+                 max_pending: int = 100_000, compact_interval: float = 60.0, retention_days: float = 7.0,
+                 enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.compact_interval = compact_interval
+        self.retention_days = retention_days
+        self.dropped = 0
+        self._pending: List[Event] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def record(self, client_key: str, model: str, prompt_tokens: int, completion_tokens: int,
+               total_tokens: int, cached: bool = False) -> None:
+        """Queues one usage event. `total_tokens` is what was charged."""
+        if not self.enabled:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            LEDGER_DROPPED.inc()
+            return
+        now = time.time()
+        self._pending.append((
+            now, time.strftime("%Y-%m-%d", time.gmtime(now)), key_id(client_key), f"...{client_key[-4:]}",
+            model, int(cached), prompt_tokens, completion_tokens, total_tokens
+        ))
+        if len(self._pending) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL survives process crashes; only a power loss can undo the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, events: List[Event]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(INSERT_EVENTS, events)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _compact(self) -> int:
+        """Adds the events written since the last compaction to the rollups.
+        Returns how many were rolled up."""
+        with self._lock:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock first, so workers never roll up the same events twice
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM ledger_state WHERE name = 'rolled_up_to'").fetchone()
+                rolled_up_to = row[0] if row else 0
+                top = conn.execute("SELECT COALESCE(MAX(id), 0) FROM usage_events").fetchone()[0]
+                if top > rolled_up_to:
+                    conn.execute(ROLL_UP, (rolled_up_to, top))
+                    conn.execute(
+                        "INSERT INTO ledger_state (name, value) VALUES ('rolled_up_to', ?) "
+                        "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                        (top,)
+                    )
+                cutoff = time.time() - self.retention_days * 86400
+                conn.execute("DELETE FROM usage_events WHERE id <= ? AND ts < ?", (top, cutoff))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return max(top - rolled_up_to, 0)
+
+    def _totals(self, start_day: str, end_day: str, client_key: Optional[str]) -> List[Dict[str, Any]]:
+        params: List[Any] = [start_day, end_day]
+        key_filter = ""
+        if client_key is not None:
+            key_filter = "AND key_id = ?"
+            params.append(key_id(client_key))
+        with self._lock:
+            rows = self._connect().execute(TOTALS.format(key_filter=key_filter), params).fetchall()
+        return [
+            {
+                "key_id": row[0],
+                "key": row[1],
+                "model": row[2],
+                "requests": row[3],
+                "cached_requests": row[4],
+                "prompt_tokens": row[5],
+                "completion_tokens": row[6],
+                "total_tokens": row[7],
+            }
+            for row in rows
+        ]
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        events, self._pending = self._pending, []
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._write, events)
+        except Exception as e:
+            logger.error(f"Usage ledger write of {len(events)} events failed: {type(e).__name__}: {e}")
+            # Keep them for the next attempt, oldest first, within the buffer bound
+            kept = (events + self._pending)[-self.max_pending:]
+            lost = len(events) + len(self._pending) - len(kept)
+            if lost:
+                self.dropped += lost
+                LEDGER_DROPPED.inc(amount=lost)
+            self._pending = kept
+        else:
+            LEDGER_FLUSH_LATENCY.observe(time.monotonic() - started)
+        LEDGER_PENDING.set(len(self._pending))
+
+    async def compact(self) -> None:
+        try:
+            rolled = await asyncio.to_thread(self._compact)
+        except Exception as e:
+            logger.error(f"Usage ledger compaction failed: {type(e).__name__}: {e}")
+            return
+        if rolled:
+            logger.info(f"Usage ledger: rolled {rolled} events into daily totals")
+
+    async def totals(self, start_day: str, end_day: str, client_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-key, per-model totals for the days from `start_day` to `end_day`
+        (YYYY-MM-DD, inclusive), for one client key or all of them."""
+        # Include this worker's own latest events
+        await self.flush()
+        return await asyncio.to_thread(self._totals, start_day, end_day, client_key)
+
+    async def run(self) -> None:
+        """Writer loop, run as a background task for the app's lifetime."""
+        self._wakeup = asyncio.Event()
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if time.monotonic() >= next_compaction:
+                next_compaction = time.monotonic() + self.compact_interval
+                await self.compact()
+
+    async def aclose(self) -> None:
+        """Writes what is still buffered and closes the database."""
+        await self.flush()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+ledger = UsageLedger(
+    settings.ledger_path,
+    flush_interval=settings.ledger_flush_interval,
+    batch_size=settings.ledger_batch_size,
+    max_pending=settings.ledger_max_pending,
+    compact_interval=settings.ledger_compact_interval,
+    retention_days=settings.ledger_retention_days,
+    enabled=settings.ledger_enabled
+)
+
+def get_ledger() -> UsageLedger:
+    return ledger
@@ -1,76 +1,111 @@
 import time
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.limiter_backends import LimiterBackend, create_backend
+from app.core.metrics import LIMIT_REJECTIONS
+
+settings = get_settings()
+
+
+class UsageLimitExceeded(Exception):
+    """Raised when a request's token reservation does not fit the daily budget."""
+
+
+class Reservation:
+    """Tokens held against a client's daily budget while a request is in flight."""
+    __slots__ = ("key", "day", "tokens", "done")
+
+    def __init__(self, key: str, day: str, tokens: int):
+        self.key = key
+        self.day = day
+        self.tokens = tokens
+        self.done = False
+
+
+def get_tier(is_test: bool, is_guest: bool) -> str:
+    if is_guest:
+        return "guest"
+    if is_test:
+        return "test"
+    return "premium"
+
 
 class RateLimiter:
-    def __init__(self):
-        # {key: (timestamp, count)}
-        self.requests: Dict[str, Tuple[float, int]] = {}
-        # {key: (date, total_tokens)}
-        self.usage: Dict[str, Tuple[str, int]] = {}
-        
-        # IP/Guest limits
-        self.GUEST_RPM = 5
-        self.GUEST_DAILY_TOKENS = 2000
-        
-        # Test key limits
-        self.TEST_RPM = 10
-        self.TEST_DAILY_TOKENS = 10000
-        
-        # Premium key limits
-        self.PREMIUM_RPM = 30
-        self.PREMIUM_DAILY_TOKENS = 50000
+    WINDOW_SECONDS = 60
+
+    def __init__(self, backend: Optional[LimiterBackend] = None):
+        # Counters live in a pluggable backend so several workers can share them
+        if backend is None:
+            backend = create_backend(
+                settings.limiter_backend,
+                redis_url=settings.limiter_redis_url,
+                shm_path=settings.limiter_shm_path,
+                shm_slots=settings.limiter_shm_slots,
+                max_keys=settings.limiter_max_keys,
+                idle_ttl=settings.limiter_idle_ttl
+            )
+        self.backend = backend
+
+        # {tier: (requests_per_minute, daily_tokens)}
+        self.tier_limits: Dict[str, Tuple[int, int]] = {
+            "guest": (settings.guest_rpm, settings.guest_daily_tokens),
+            "test": (settings.test_rpm, settings.test_daily_tokens),
+            "premium": (settings.premium_rpm, settings.premium_daily_tokens)
+        }
 
     def get_current_date(self) -> str:
         return time.strftime("%Y-%m-%d", time.gmtime())
 
-    def check_rate_limit(self, key: str, is_test: bool, is_guest: bool) -> bool:
-        now = time.time()
-        rpm_limit = self.PREMIUM_RPM
-        if is_test: rpm_limit = self.TEST_RPM
-        if is_guest: rpm_limit = self.GUEST_RPM
-        
-        if key not in self.requests:
-            self.requests[key] = (now, 1)
-            return True
-            
-        last_time, count = self.requests[key]
-        if now - last_time > 60:
-            self.requests[key] = (now, 1)
-            return True
-            
-        if count < rpm_limit:
-            self.requests[key] = (last_time, count + 1)
-            return True
-            
-        return False
-
-    def check_usage_limit(self, key: str, is_test: bool, is_guest: bool) -> bool:
-        today = self.get_current_date()
-        daily_limit = self.PREMIUM_DAILY_TOKENS
-        if is_test: daily_limit = self.TEST_DAILY_TOKENS
-        if is_guest: daily_limit = self.GUEST_DAILY_TOKENS
-        
-        if key not in self.usage:
-            self.usage[key] = (today, 0)
-            return True
-            
-        usage_date, tokens = self.usage[key]
-        if usage_date != today:
-            self.usage[key] = (today, 0)
-            return True
-            
-        return tokens < daily_limit
-
-    def update_usage(self, key: str, tokens: int):
-        today = self.get_current_date()
-        if key in self.usage:
-            usage_date, current_tokens = self.usage[key]
-            if usage_date == today:
-                self.usage[key] = (today, current_tokens + tokens)
-            else:
-                self.usage[key] = (today, tokens)
-        else:
-            self.usage[key] = (today, tokens)
+    def _limits(self, is_test: bool, is_guest: bool) -> Tuple[int, int]:
+        return self.tier_limits[get_tier(is_test, is_guest)]
+
+    async def check_rate_limit(self, key: str, is_test: bool, is_guest: bool) -> bool:
+        rpm_limit, _ = self._limits(is_test, is_guest)
+        return await self.backend.hit(key, rpm_limit, self.WINDOW_SECONDS)
+
+    async def check_usage_limit(self, key: str, is_test: bool, is_guest: bool) -> bool:
+        _, daily_limit = self._limits(is_test, is_guest)
+        return await self.backend.get_usage(key, self.get_current_date()) < daily_limit
+
+    async def check_limits(self, key: str, is_test: bool, is_guest: bool) -> Tuple[bool, bool]:
+        """Checks the rate and usage limits in one backend round trip.
+        Returns (rate_ok, usage_ok)."""
+        tier = get_tier(is_test, is_guest)
+        rpm_limit, daily_limit = self.tier_limits[tier]
+        rate_ok, tokens = await self.backend.check(key, rpm_limit, self.WINDOW_SECONDS, self.get_current_date())
+        usage_ok = tokens < daily_limit
+        if not rate_ok:
+            LIMIT_REJECTIONS.inc(tier, "rate")
+        elif not usage_ok:
+            LIMIT_REJECTIONS.inc(tier, "usage")
+        return rate_ok, usage_ok
+
+    async def update_usage(self, key: str, tokens: int):
+        await self.backend.add_usage(key, self.get_current_date(), tokens)
+
+    async def reserve(self, key: str, is_test: bool, is_guest: bool, tokens: int) -> Reservation:
+        """Holds `tokens` against the daily budget before dispatch, so concurrent
+        requests cannot all pass the check and then overshoot together."""
+        _, daily_limit = self._limits(is_test, is_guest)
+        day = self.get_current_date()
+        if not await self.backend.reserve_usage(key, day, tokens, daily_limit):
+            LIMIT_REJECTIONS.inc(get_tier(is_test, is_guest), "usage")
+            raise UsageLimitExceeded("Daily token limit exceeded.")
+        return Reservation(key, day, tokens)
+
+    async def settle(self, reservation: Reservation, actual_tokens: int):
+        """Replaces the reserved estimate with the tokens actually used."""
+        if reservation.done:
+            return
+        reservation.done = True
+        delta = actual_tokens - reservation.tokens
+        if delta:
+            await self.backend.add_usage(reservation.key, reservation.day, delta)
+
+    async def refund(self, reservation: Reservation):
+        """Releases a reservation for a request that failed or was cancelled."""
+        await self.settle(reservation, 0)
 
 limiter = RateLimiter()
 
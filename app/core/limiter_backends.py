@@ -0,0 +1,404 @@
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LimiterBackend(ABC):
+    """Storage for rate-limit windows and daily token usage.
+
+    Every method must be atomic with respect to other workers sharing the
+    backend, so that N workers enforce one limit rather than N.
+
+    Rate limits use a sliding-window counter: the count for the current fixed
+    window plus the previous window's count weighted by how much of it still
+    overlaps the trailing `window` seconds. This is O(1) per check and, unlike
+    a plain fixed window, does not let a client send 2x the limit across a
+    window boundary."""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        """Counts one request in `key`'s sliding window; False if over `limit`."""
+
+    @abstractmethod
+    async def get_usage(self, key: str, day: str) -> int:
+        pass
+
+    @abstractmethod
+    async def add_usage(self, key: str, day: str, tokens: int) -> int:
+        """Adds tokens (negative to release) to `key`'s usage for `day` and
+        returns the new total. Updates for a day that has already rolled over
+        are dropped."""
+
+    @abstractmethod
+    async def reserve_usage(self, key: str, day: str, tokens: int, limit: int) -> bool:
+        """Adds tokens to `key`'s usage only if the total stays within `limit`."""
+
+    async def check(self, key: str, limit: int, window: float, day: str) -> Tuple[bool, int]:
+        """Batched `hit` + `get_usage`; backends override to save a round trip."""
+        return await self.hit(key, limit, window), await self.get_usage(key, day)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _day_ordinal(day: str) -> int:
+    return int(day.replace("-", ""))
+
+
+def _slide(window_index: int, current: int, previous: int, now: float, window: float) -> Tuple[int, int, int, float]:
+    """Advances a sliding-window counter to `now`.
+    Returns (window_index, current, previous, estimated_count)."""
+    index = int(now // window)
+    if index != window_index:
+        previous = current if index == window_index + 1 else 0
+        current = 0
+        window_index = index
+    weight = 1.0 - (now % window) / window
+    return window_index, current, previous, previous * weight + current
+
+
+class _KeyState:
+    __slots__ = ("window", "current", "previous", "day", "tokens", "last_seen")
+
+    def __init__(self) -> None:
+        self.window = 0
+        self.current = 0
+        self.previous = 0
+        self.day = 0
+        self.tokens = 0
+        self.last_seen = 0.0
+
+
+class MemoryBackend(LimiterBackend):
+    """Per-process state, only correct with a single worker.
+
+    Keys are kept in least-recently-seen order. Keys idle for longer than
+    `idle_ttl` are evicted a few at a time on each access, and the oldest key
+    is dropped whenever `max_keys` is exceeded, so memory stays bounded on a
+    public endpoint keyed by client IP."""
+
+    EVICTIONS_PER_CALL = 2
+
+    def __init__(self, max_keys: int = 1_000_000, idle_ttl: float = 86400.0):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self._keys: "OrderedDict[str, _KeyState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _state(self, key: str, now: float) -> _KeyState:
+        keys = self._keys
+        state = keys.get(key)
+        if state is None:
+            state = _KeyState()
+            keys[key] = state
+            if len(keys) > self.max_keys:
+                keys.popitem(last=False)
+        else:
+            keys.move_to_end(key)
+        state.last_seen = now
+
+        cutoff = now - self.idle_ttl
+        for _ in range(self.EVICTIONS_PER_CALL):
+            oldest = next(iter(keys.values()))
+            if oldest.last_seen >= cutoff:
+                break
+            keys.popitem(last=False)
+        return state
+
+    def _hit(self, state: _KeyState, limit: int, window: float, now: float) -> bool:
+        state.window, state.current, state.previous, estimate = _slide(state.window, state.current, state.previous, now, window)
+        if estimate < limit:
+            state.current += 1
+            return True
+        return False
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        now = time.time()
+        return self._hit(self._state(key, now), limit, window, now)
+
+    async def get_usage(self, key: str, day: str) -> int:
+        state = self._keys.get(key)
+        if state is None or state.day != _day_ordinal(day):
+            return 0
+        return state.tokens
+
+    async def add_usage(self, key: str, day: str, tokens: int) -> int:
+        state = self._state(key, time.time())
+        ordinal = _day_ordinal(day)
+        if ordinal < state.day:
+            return state.tokens
+        if ordinal > state.day:
+            state.day, state.tokens = ordinal, 0
+        state.tokens += tokens
+        return state.tokens
+
+    async def reserve_usage(self, key: str, day: str, tokens: int, limit: int) -> bool:
+        state = self._state(key, time.time())
+        ordinal = _day_ordinal(day)
+        if ordinal > state.day:
+            state.day, state.tokens = ordinal, 0
+        if state.tokens + tokens > limit:
+            return False
+        state.tokens += tokens
+        return True
+
+    async def check(self, key: str, limit: int, window: float, day: str) -> Tuple[bool, int]:
+        now = time.time()
+        state = self._state(key, now)
+        allowed = self._hit(state, limit, window, now)
+        return allowed, state.tokens if state.day == _day_ordinal(day) else 0
+
+
+class SharedMemoryBackend(LimiterBackend):
+    """Fixed-size open-addressing hash table in a memory-mapped file.
+
+    Workers on one host map the same file and serialize updates with
+    `fcntl.flock`, which is held only for the few microseconds a probe takes.
+    When a probe sequence is full, the least recently seen slot is reused.
+
+    flock locks belong to an open file description, and a forked child shares
+    its parent's, so the lock only excludes processes that opened the file
+    themselves. Each process therefore opens and maps it on first use, which
+    keeps a backend created before a fork (as under gunicorn's preload_app)
+    correct in every worker."""
+
+    # key_hash, window, current, previous, usage_day, usage_tokens, last_seen
+    RECORD = struct.Struct("<QIIIIqd")
+    MAX_PROBES = 16
+
+    def __init__(self, path: str, slots: int):
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = slots
+        self._pid = 0
+        self._open()
+        logger.info(f"SharedMemoryBackend: mapped {slots} slots at '{path}'")
+
+    def _open(self) -> None:
+        if self._pid:
+            # Our copies of the parent's descriptor and mapping; the parent keeps its own
+            self._map.close()
+            os.close(self._fd)
+        size = self.slots * self.RECORD.size
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # The first worker to take the lock sizes the file; others just map it
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        return digest or 1  # 0 marks an empty slot
+
+    def _slot(self, key_hash: int) -> Tuple[int, list]:
+        """Finds the slot for key_hash, claiming an empty or stale one if absent.
+        Must be called with the lock held."""
+        start = key_hash % self.slots
+        victim, victim_seen = start, float("inf")
+        for i in range(self.MAX_PROBES):
+            index = (start + i) % self.slots
+            record = self.RECORD.unpack_from(self._map, index * self.RECORD.size)
+            if record[0] == key_hash:
+                return index, list(record)
+            if record[0] == 0:
+                victim, victim_seen = index, -1.0
+                break
+            if record[6] < victim_seen:
+                victim, victim_seen = index, record[6]
+        return victim, [key_hash, 0, 0, 0, 0, 0, 0.0]
+
+    def _update(self, key: str, fn):
+        if self._pid != os.getpid():
+            self._open()
+        key_hash = self._hash(key)
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+        try:
+            index, record = self._slot(key_hash)
+            result = fn(record)
+            record[6] = time.time()
+            self.RECORD.pack_into(self._map, index * self.RECORD.size, *record)
+            return result
+        finally:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hit(record: list, limit: int, window: float, now: float) -> bool:
+        record[1], record[2], record[3], estimate = _slide(record[1], record[2], record[3], now, window)
+        if estimate < limit:
+            record[2] += 1
+            return True
+        return False
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        now = time.time()
+        return self._update(key, lambda r: self._hit(r, limit, window, now))
+
+    async def get_usage(self, key: str, day: str) -> int:
+        ordinal = _day_ordinal(day)
+        return self._update(key, lambda r: r[5] if r[4] == ordinal else 0)
+
+    async def add_usage(self, key: str, day: str, tokens: int) -> int:
+        ordinal = _day_ordinal(day)
+
+        def add(record: list) -> int:
+            if ordinal < record[4]:
+                return record[5]
+            if ordinal > record[4]:
+                record[4], record[5] = ordinal, 0
+            record[5] += tokens
+            return record[5]
+
+        return self._update(key, add)
+
+    async def reserve_usage(self, key: str, day: str, tokens: int, limit: int) -> bool:
+        ordinal = _day_ordinal(day)
+
+        def reserve(record: list) -> bool:
+            if ordinal > record[4]:
+                record[4], record[5] = ordinal, 0
+            if record[5] + tokens > limit:
+                return False
+            record[5] += tokens
+            return True
+
+        return self._update(key, reserve)
+
+    async def check(self, key: str, limit: int, window: float, day: str) -> Tuple[bool, int]:
+        ordinal, now = _day_ordinal(day), time.time()
+
+        def check(record: list) -> Tuple[bool, int]:
+            allowed = self._hit(record, limit, window, now)
+            return allowed, record[5] if record[4] == ordinal else 0
+
+        return self._update(key, check)
+
+    async def aclose(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+# KEYS[1] = current window key, KEYS[2] = previous window key, KEYS[3] = usage key
+# ARGV[1] = limit, ARGV[2] = window in ms, ARGV[3] = now in ms
+_CHECK_SCRIPT = """
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local weight = 1 - (now % window) / window
+local allowed = 0
+if previous * weight + current < tonumber(ARGV[1]) then
+    redis.call('INCR', KEYS[1])
+    redis.call('PEXPIRE', KEYS[1], window * 2)
+    allowed = 1
+end
+return {allowed, tonumber(redis.call('GET', KEYS[3]) or '0')}
+"""
+
+# KEYS[1] = usage key; ARGV[1] = tokens, ARGV[2] = limit, ARGV[3] = ttl in seconds
+_RESERVE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used + tonumber(ARGV[1]) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class RedisBackend(LimiterBackend):
+    """Shared state in any server speaking the Redis protocol.
+
+    Checks run as one Lua script and usage updates as one pipeline, so each
+    is a single atomic round trip regardless of the number of workers. Scripts
+    get every key they touch through KEYS, and a client's keys share a hash
+    tag, so they all map to one slot on Redis Cluster."""
+
+    USAGE_TTL = 2 * 24 * 3600
+
+    def __init__(self, url: str, prefix: str = "axon:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("LIMITER_BACKEND=redis requires the 'redis' package (pip install 'redis>=5')") from e
+        self.prefix = prefix
+        self.client = redis.from_url(url)
+        self._check = self.client.register_script(_CHECK_SCRIPT)
+        self._reserve = self.client.register_script(_RESERVE_SCRIPT)
+
+    def _rate_key(self, key: str, window_index: int) -> str:
+        return f"{self.prefix}rl:{{{key}}}:{window_index}"
+
+    def _usage_key(self, key: str, day: str) -> str:
+        return f"{self.prefix}usage:{{{key}}}:{day}"
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        allowed, _ = await self.check(key, limit, window, "")
+        return allowed
+
+    async def get_usage(self, key: str, day: str) -> int:
+        return int(await self.client.get(self._usage_key(key, day)) or 0)
+
+    async def add_usage(self, key: str, day: str, tokens: int) -> int:
+        usage_key = self._usage_key(key, day)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incrby(usage_key, tokens)
+            pipe.expire(usage_key, self.USAGE_TTL)
+            total, _ = await pipe.execute()
+        return int(total)
+
+    async def reserve_usage(self, key: str, day: str, tokens: int, limit: int) -> bool:
+        reserved = await self._reserve(keys=[self._usage_key(key, day)], args=[tokens, limit, self.USAGE_TTL])
+        return bool(reserved)
+
+    async def check(self, key: str, limit: int, window: float, day: str) -> Tuple[bool, int]:
+        window_ms, now_ms = int(window * 1000), int(time.time() * 1000)
+        index = now_ms // window_ms
+        allowed, tokens = await self._check(
+            keys=[self._rate_key(key, index), self._rate_key(key, index - 1), self._usage_key(key, day)],
+            args=[limit, window_ms, now_ms]
+        )
+        return bool(allowed), int(tokens)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def default_shm_path(app_name: str, port: int) -> str:
+    """A file for the shm backend that the workers of one deployment share and
+    other deployments on the host, which listen on other ports, do not."""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    name = re.sub(r"[^a-z0-9]+", "-", app_name.lower()).strip("-") or "axon"
+    return os.path.join(directory, f"{name}-limiter-{port}")
+
+
+def create_backend(name: str, redis_url: str = "", shm_path: str = "", shm_slots: int = 65536,
+                   max_keys: int = 1_000_000, idle_ttl: float = 86400.0) -> LimiterBackend:
+    if name == "memory":
+        return MemoryBackend(max_keys=max_keys, idle_ttl=idle_ttl)
+    if name == "shm":
+        if not shm_path:
+            raise ValueError("The shm limiter backend needs a file path; set LIMITER_SHM_PATH")
+        return SharedMemoryBackend(shm_path, shm_slots)
+    if name == "redis":
+        return RedisBackend(redis_url)
+    raise ValueError(f"Unknown limiter backend '{name}'")
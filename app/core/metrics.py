@@ -0,0 +1,357 @@
+import asyncio
+import bisect
+import glob
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Seconds; covers in-process mock calls up to slow upstream completions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metric:
+    """Base for metrics whose samples are keyed by a tuple of label values.
+
+    Each worker keeps its own samples in plain dicts. Updates run on the event
+    loop thread, so they need no lock and cost one dict lookup."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(labels), value] for labels, value in self._values.items()],
+        }
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        # Per-bucket (not cumulative) counts, the +Inf bucket, then the sum
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+
+class MetricsRegistry:
+    """Holds this worker's metrics and renders the Prometheus text format.
+
+    With a multiprocess directory configured, each worker periodically writes
+    its snapshot to `<dir>/metrics-<pid>.json` and a scrape of any worker merges
+    every file, so counters and histograms add up across workers.
+
+    Counters of workers that are gone must keep counting, but their files must
+    not pile up as workers are recycled. A worker folds its final snapshot,
+    without gauges, into `<dir>/retired.json` when it shuts down and removes its
+    own file. A scrape does the same for the file of any worker whose process
+    no longer exists, such as one that crashed. Both happen under a lock on
+    `<dir>/metrics.lock`, so no file is counted twice or missed."""
+
+    def __init__(self, multiprocess_dir: str = ""):
+        self.multiprocess_dir = multiprocess_dir
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self, live: bool = True) -> Dict[str, Any]:
+        """Returns all samples; gauges are left out once the worker is stopping."""
+        return {
+            name: metric.snapshot()
+            for name, metric in self._metrics.items()
+            if live or metric.kind != "gauge"
+        }
+
+    def _path(self) -> str:
+        return os.path.join(self.multiprocess_dir, f"metrics-{os.getpid()}.json")
+
+    def flush(self, live: bool = True) -> None:
+        """Writes this worker's snapshot for other workers to merge."""
+        if not self.multiprocess_dir:
+            return
+        path = self._path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(live), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    async def run_flusher(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
+
+    def retire(self) -> None:
+        """Folds this worker's counters into the retired totals and removes
+        its file. Called once, as the worker shuts down."""
+        if not self.multiprocess_dir:
+            return
+        with self._locked():
+            self._retire([self.snapshot(live=False)], [self._path()])
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        import fcntl
+        fd = os.open(os.path.join(self.multiprocess_dir, "metrics.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    def _retire(self, snapshots: List[Dict[str, Any]], paths: List[str]) -> None:
+        """Merges `snapshots` into retired.json and deletes `paths`. Must be
+        called with the lock held."""
+        retired_path = os.path.join(self.multiprocess_dir, "retired.json")
+        retired = _read(retired_path)
+        counters = [
+            {name: metric for name, metric in snapshot.items() if metric["kind"] != "gauge"}
+            for snapshot in snapshots
+        ]
+        merged = merge(([retired] if retired else []) + counters)
+        tmp = f"{retired_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(_unmerge(merged), f, separators=(",", ":"))
+        os.replace(tmp, retired_path)
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def collect(self) -> List[Dict[str, Any]]:
+        if not self.multiprocess_dir:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        dead: List[Tuple[str, Dict[str, Any]]] = []
+        with self._locked():
+            for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics-*.json")):
+                snapshot = _read(path)
+                if snapshot is None:
+                    continue
+                if _alive(path):
+                    snapshots.append(snapshot)
+                else:
+                    dead.append((path, snapshot))
+            if dead:
+                logger.info(f"Folding metrics of {len(dead)} exited workers into the retired totals")
+                self._retire([snapshot for _, snapshot in dead], [path for path, _ in dead])
+            retired = _read(os.path.join(self.multiprocess_dir, "retired.json"))
+        if retired:
+            snapshots.append(retired)
+        return snapshots
+
+    def render(self) -> str:
+        return render(merge(self.collect()))
+
+
+def _read(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+        return None
+
+
+def _alive(path: str) -> bool:
+    """Whether the worker that wrote `<dir>/metrics-<pid>.json` still runs."""
+    try:
+        pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+        os.kill(pid, 0)
+    except ValueError:
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process, so the pid is taken: leave the file alone
+        return True
+    return True
+
+
+def _unmerge(merged: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns the output of `merge` back into the snapshot format."""
+    return {
+        name: {**metric, "samples": [[list(labels), value] for labels, value in metric["samples"].items()]}
+        for name, metric in merged.items()
+    }
+
+
+def merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sums samples with the same name and labels across worker snapshots."""
+    merged: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    samples[key] = current + value
+    return merged
+
+
+def render(merged: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric["labelnames"]
+        for labels, value in metric["samples"].items():
+            if metric["kind"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labelnames, labels, ('le', _format(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, labels)} {_format(value[-1])}")
+                lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(labelnames, labels)} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+metrics = MetricsRegistry(multiprocess_dir=settings.metrics_multiprocess_dir)
+
+HTTP_REQUESTS = metrics.counter("axon_http_requests_total", "HTTP requests by route, method and status.", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram("axon_http_request_duration_seconds", "HTTP request latency by route, until the response body is sent.", ("method", "route"))
+HTTP_IN_FLIGHT = metrics.gauge("axon_http_requests_in_flight", "HTTP requests currently being served.")
+UPSTREAM_LATENCY = metrics.histogram("axon_upstream_request_duration_seconds", "Upstream call latency (to the first chunk for streams) by provider, model and outcome.", ("provider", "model", "outcome"))
+UPSTREAM_IN_FLIGHT = metrics.gauge("axon_upstream_requests_in_flight", "Upstream calls currently awaiting a response, by provider.", ("provider",))
+PROMPT_TOKENS = metrics.counter("axon_prompt_tokens_total", "Prompt tokens reported by upstream responses, by model.", ("model",))
+COMPLETION_TOKENS = metrics.counter("axon_completion_tokens_total", "Completion tokens reported by upstream responses, by model.", ("model",))
+LIMIT_REJECTIONS = metrics.counter("axon_limit_rejections_total", "Requests rejected by the rate or daily usage limit, by tier.", ("tier", "limit"))
+ADMISSION_LIMIT = metrics.gauge("axon_admission_limit", "Current adaptive concurrency limit, by provider.", ("provider",))
+ADMISSION_QUEUED = metrics.gauge("axon_admission_queued", "Upstream calls waiting for a concurrency slot, by provider.", ("provider",))
+ADMISSION_QUEUE_TIME = metrics.histogram("axon_admission_queue_seconds", "Time calls waited for a provider concurrency slot, by provider and tier.", ("provider", "tier"))
+ADMISSION_SHED = metrics.counter("axon_admission_shed_total", "Upstream calls rejected because the provider's queue was full or the wait timed out, by provider.", ("provider",))
+REQUEST_CANCELLATIONS = metrics.counter("axon_request_cancellations_total", "Requests abandoned before completing, by reason (disconnect or deadline).", ("reason",))
+LEDGER_PENDING = metrics.gauge("axon_ledger_pending_events", "Usage events buffered in memory, waiting to be written to the ledger.")
+LEDGER_DROPPED = metrics.counter("axon_ledger_dropped_events_total", "Usage events dropped because the ledger buffer was full.")
+LEDGER_FLUSH_LATENCY = metrics.histogram("axon_ledger_flush_seconds", "Time to write one batch of usage events to the ledger.")
+FUZZY_REWRITES = metrics.counter("axon_model_fuzzy_rewrites_total", "Unknown model aliases rewritten to the closest match, by target alias.", ("model",))
+
+
+def get_metrics() -> MetricsRegistry:
+    return metrics
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight gauges.
+
+    Routes are labelled by their path template; unmatched paths share one
+    label so arbitrary URLs cannot inflate the series count."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(scope["method"], path, str(status_code))
+            HTTP_LATENCY.observe(elapsed, scope["method"], path)
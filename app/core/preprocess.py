@@ -0,0 +1,54 @@
+from typing import Dict, List, Sequence
+
+from app.core.schemas import Message
+
+
+class KeywordMatcher:
+    """Case-insensitive matcher for a fixed set of keywords, compiled once.
+
+    Keywords that contain another keyword are dropped at compile time, since
+    the shorter one already matches ("axon" covers "axonnexus"). Matching
+    lowercases the text once and runs CPython's substring search for each
+    remaining keyword; on prompt-sized text that measured faster than an
+    equivalent `re` alternation, with or without re.IGNORECASE."""
+
+    def __init__(self, keywords: Sequence[str]):
+        lowered = sorted({k.lower() for k in keywords}, key=len)
+        compiled: List[str] = []
+        for keyword in lowered:
+            if not any(shorter in keyword for shorter in compiled):
+                compiled.append(keyword)
+        self.keywords = tuple(compiled)
+
+    def search(self, text: str) -> bool:
+        lowered = text.lower()
+        for keyword in self.keywords:
+            if keyword in lowered:
+                return True
+        return False
+
+
+# Identity rules
+IDENTITY_TRIGGERS = KeywordMatcher(["axon", "axonnexus", "axoninnova", "who built", "who made", "who runs", "who developed", "created by"])
+AXON_MENTION = KeywordMatcher(["axon", "axonnexus", "axoninnova"])
+
+# Prepended to the conversation when the last message asks about identity
+IDENTITY_MESSAGE = Message(role="system", content="AxonNexus is a first-party AI API developed and maintained by the AxonInnova community.")
+# Sent upstream ahead of every message that mentions Axon
+MAKER_NOTE = {"role": "system", "content": "AxonInnova is the community and maker behind AxonNexus."}
+
+
+def needs_identity(messages: Sequence[Message]) -> bool:
+    """True when the last message mentions Axon or asks who made the service."""
+    return bool(messages) and IDENTITY_TRIGGERS.search(messages[-1].content)
+
+
+def build_upstream_messages(messages: Sequence[Message]) -> List[Dict[str, str]]:
+    """Shapes messages into the OpenAI wire format in one pass, adding the
+    maker note ahead of each message that mentions Axon."""
+    payload: List[Dict[str, str]] = []
+    for m in messages:
+        if AXON_MENTION.search(m.content):
+            payload.append(dict(MAKER_NOTE))
+        payload.append({"role": m.role, "content": m.content})
+    return payload
@@ -1,9 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import uuid
 
 
+def new_completion_id() -> str:
+    return f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+
 class Message(BaseModel):
     role: str = Field(..., description="The role of the message author (e.g., 'user', 'assistant', 'system')")
     content: str = Field(..., description="The content of the message")
@@ -14,6 +18,7 @@ class ChatRequest(BaseModel):
     messages: List[Message] = Field(..., description="List of messages in the conversation")
     temperature: Optional[float] = Field(default=1.0, ge=0.0, le=2.0, description="Sampling temperature")
     max_tokens: Optional[int] = Field(default=None, description="Maximum tokens to generate")
+    stream: Optional[bool] = Field(default=False, description="Stream the completion back as server-sent events")
 
 
 class Choice(BaseModel):
@@ -29,7 +34,7 @@ class Usage(BaseModel):
 
 
 class ChatResponse(BaseModel):
-    id: str = Field(default_factory=lambda: f"chatcmpl-{uuid.uuid4().hex[:24]}")
+    id: str = Field(default_factory=new_completion_id)
     object: str = "chat.completion"
     created: int = Field(default_factory=lambda: int(datetime.now().timestamp()))
     model: str
@@ -37,11 +42,86 @@ class ChatResponse(BaseModel):
     usage: Usage
 
 
+class ProviderHealth(BaseModel):
+    state: str
+    error_rate: float
+    requests: int
+    failures: int
+    ewma_latency_ms: Optional[float] = None
+    p50_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+
+
 class HealthResponse(BaseModel):
     status: str
     app_name: str
     version: str
     timestamp: datetime
+    providers: Dict[str, ProviderHealth] = {}
+
+
+class PoolStats(BaseModel):
+    open: int
+    idle: int
+    active: int
+    waiting: int
+    max_connections: int
+
+
+class PoolStatsResponse(BaseModel):
+    pools: Dict[str, PoolStats]
+
+
+class AdmissionStats(BaseModel):
+    limit: int
+    in_flight: int
+    queued: int
+    max_queue: int
+    shed: int
+    latency_ms: Optional[float] = None
+    baseline_latency_ms: Optional[float] = None
+
+
+class TenantQueueStat(BaseModel):
+    tenant: str
+    tier: str
+    requests: int
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class AdmissionStatsResponse(BaseModel):
+    providers: Dict[str, AdmissionStats]
+    tenants: List[TenantQueueStat] = []
+
+
+class UsageTotals(BaseModel):
+    requests: int = 0
+    cached_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+
+class ModelUsage(UsageTotals):
+    model: str
+
+
+class KeyUsage(UsageTotals):
+    key: str
+    key_id: str
+    models: List[ModelUsage] = []
+
+
+class UsageResponse(BaseModel):
+    object: str = "usage"
+    start: str
+    end: str
+    total: UsageTotals
+    keys: List[KeyUsage]
+    models: List[ModelUsage]
 
 
 class ModelInfo(BaseModel):
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.context import DeadlineExceeded
+from app.core.metrics import REQUEST_CANCELLATIONS
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the call; callers that arrive
+    while it is in flight await the same future instead of repeating it."""
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None,
+                 retry: Optional[Callable[[BaseException], bool]] = None) -> Tuple[Any, bool]:
+        """Returns (result, shared), where shared is True for followers.
+
+        A follower waits at most `timeout` seconds and then raises
+        DeadlineExceeded, so its own deadline holds whatever the leader's is.
+        When the leader fails with an error for which `retry` returns True,
+        such as one caused by the leader's own deadline, followers run the
+        call again instead of sharing it."""
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                # Shield so a follower going away does not cancel the leader's call
+                return await asyncio.wait_for(asyncio.shield(future), timeout), True
+            except asyncio.CancelledError:
+                # If only the leader was cancelled, retry and let a follower take over
+                if future.cancelled() and not _current_task_cancelling():
+                    continue
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and not future.done():
+                    # Only this follower's wait ran out; the leader carries on
+                    REQUEST_CANCELLATIONS.inc("deadline")
+                    raise DeadlineExceeded("Request deadline exceeded while waiting for a coalesced call") from e
+                if retry is not None and future.done() and not future.cancelled() and future.exception() is e and retry(e):
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark exceptions as retrieved even when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+def _current_task_cancelling() -> bool:
+    task = asyncio.current_task()
+    return bool(task and task.cancelling())
+
+
+singleflight = SingleFlight()
+
+def get_singleflight() -> SingleFlight:
+    return singleflight
@@ -0,0 +1,26 @@
+from typing import Iterable
+
+# Framing overhead of the chat format (role markers and separators), as counted by OpenAI-style tokenizers
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximates the BPE token count of `text` without a tokenizer.
+
+    English text averages about four characters per token, while short words
+    and punctuation cost at least one token each; taking the larger of the
+    two keeps the estimate from undercounting either kind of text."""
+    if not text:
+        return 0
+    by_chars = (len(text) + 3) // 4
+    by_words = text.count(" ") + text.count("\n") + 1
+    return by_chars if by_chars > by_words else by_words
+
+
+def estimate_messages_tokens(messages: Iterable) -> int:
+    """Approximates prompt tokens for a list of `Message` objects."""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + estimate_tokens(message.content)
+    return total
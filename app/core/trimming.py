@@ -0,0 +1,92 @@
+from typing import List, Optional, Sequence
+
+from app.core.schemas import Message
+from app.core.tokens import TOKENS_PER_MESSAGE, TOKENS_PER_REPLY, estimate_tokens
+
+TRIM_STRATEGIES = ("last_n", "fit", "middle_out")
+
+
+class TrimResult:
+    """The messages left after trimming and what was removed to get there."""
+    __slots__ = ("strategy", "messages", "dropped", "tokens_before", "tokens_after")
+
+    def __init__(self, strategy: str, messages: List[Message], dropped: int, tokens_before: int, tokens_after: int):
+        self.strategy = strategy
+        self.messages = messages
+        self.dropped = dropped
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+
+    def header(self) -> str:
+        return f"{self.strategy}; messages={self.dropped}; tokens={self.tokens_before - self.tokens_after}"
+
+
+def trim_messages(messages: Sequence[Message], strategy: str, budget: Optional[int], last_turns: int) -> TrimResult:
+    """Shortens a conversation before it is sent upstream.
+
+    System messages and the latest message are always kept.
+    - last_n: keeps the last `last_turns` turns, each starting at a user message.
+    - fit: drops the oldest messages until the estimate is within `budget`.
+    - middle_out: keeps the opening message and as much of the end as fits in
+      `budget`, replacing the middle with one placeholder message.
+    Token counts use the local estimate from app.core.tokens."""
+    if strategy not in TRIM_STRATEGIES:
+        raise ValueError(f"Unknown trim strategy '{strategy}'; expected one of {', '.join(TRIM_STRATEGIES)}")
+    costs = [TOKENS_PER_MESSAGE + estimate_tokens(m.content) for m in messages]
+    total = TOKENS_PER_REPLY + sum(costs)
+    keep = [True] * len(messages)
+    placeholder_at = None
+
+    if strategy == "last_n":
+        turns = 0
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i].role == "user":
+                turns += 1
+                if turns == last_turns:
+                    keep = [j >= i or m.role == "system" for j, m in enumerate(messages)]
+                    break
+    elif budget is not None and total > budget:
+        droppable = [i for i, m in enumerate(messages[:-1]) if m.role != "system"]
+        if strategy == "fit":
+            excess = total - budget
+            for i in droppable:
+                # Stop once within budget, at the start of a turn
+                if excess <= 0 and messages[i].role == "user":
+                    break
+                keep[i] = False
+                excess -= costs[i]
+        elif len(droppable) > 1:
+            # Grow the tail backwards from the latest message while it fits
+            placeholder_cost = TOKENS_PER_MESSAGE + estimate_tokens(_placeholder(len(messages)).content)
+            head = droppable[0]
+            available = budget - (total - sum(costs[i] for i in droppable)) - costs[head] - placeholder_cost
+            tail = len(droppable)
+            while tail > 1 and costs[droppable[tail - 1]] <= available:
+                tail -= 1
+                available -= costs[droppable[tail]]
+            # Resume at the start of a turn rather than mid-exchange
+            while 1 < tail < len(droppable) and messages[droppable[tail]].role != "user":
+                tail += 1
+            for i in droppable[1:tail]:
+                keep[i] = False
+            if tail > 1:
+                placeholder_at = droppable[1]
+
+    dropped = keep.count(False)
+    if not dropped:
+        return TrimResult(strategy, list(messages), 0, total, total)
+    trimmed: List[Message] = []
+    after = TOKENS_PER_REPLY
+    for i, m in enumerate(messages):
+        if i == placeholder_at:
+            note = _placeholder(dropped)
+            trimmed.append(note)
+            after += TOKENS_PER_MESSAGE + estimate_tokens(note.content)
+        if keep[i]:
+            trimmed.append(m)
+            after += costs[i]
+    return TrimResult(strategy, trimmed, dropped, total, after)
+
+
+def _placeholder(dropped: int) -> Message:
+    return Message(role="system", content=f"[{dropped} earlier messages omitted to fit the context window]")
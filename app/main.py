@@ -1,19 +1,65 @@
+import asyncio
+import signal
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.responses import HTMLResponse
 
 from app.core.config import get_settings
-from app.routes import health_router, chat_router
+from app.routes import health_router, chat_router, metrics_router, usage_router
+from app.core.metrics import MetricsMiddleware, get_metrics
+from app.providers.transport import get_transport_pool
+from app.core.limiter import get_limiter
+from app.core.ledger import get_ledger
+from app.providers.router import get_router
+from app.models.registry import reload_registry
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.startup_warmup:
+        await get_router().warm_up(settings.startup_warmup_timeout)
+    prober = None
+    if settings.health_probe_interval > 0:
+        prober = asyncio.create_task(get_router().run_health_probes(settings.health_probe_interval))
+    try:
+        # Swap in an edited model registry without dropping connections
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_registry)
+    except (NotImplementedError, AttributeError, RuntimeError, ValueError):
+        pass
+    flusher = None
+    if settings.metrics_enabled and settings.metrics_multiprocess_dir:
+        flusher = asyncio.create_task(get_metrics().run_flusher(settings.metrics_flush_interval))
+    ledger_writer = None
+    if settings.ledger_enabled:
+        ledger_writer = asyncio.create_task(get_ledger().run())
+    yield
+    if prober:
+        prober.cancel()
+    if flusher:
+        flusher.cancel()
+        # Keep this worker's counters for the survivors, minus its gauges
+        get_metrics().retire()
+    if ledger_writer:
+        ledger_writer.cancel()
+        # Write what the last requests recorded
+        await get_ledger().aclose()
+    # Close pooled upstream connections on shutdown
+    await get_transport_pool().aclose()
+    await get_limiter().backend.aclose()
+
+
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="AI API Gateway - A proxy service for external AI providers",
     docs_url=None, # Disable default docs
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 @app.get("/docs", include_in_schema=False)
@@ -33,8 +79,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(health_router)
 app.include_router(chat_router)
+app.include_router(usage_router)
+if settings.metrics_enabled:
+    app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -47,5 +99,6 @@ async def root():
 
 
 if __name__ == "__main__":
+    # Development server; run `python -m app.server` in production
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=5000, reload=True)
@@ -1,112 +1,190 @@
 import difflib
-from typing import Dict, Any, Optional, List
+import json
+import logging
+import os
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
 from app.core.config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# User-facing model aliases to internal provider mapping
-MODEL_REGISTRY: Dict[str, Dict[str, Any]] = {
-    "axon-gpt-4o": {
-        "provider": "openrouter",
-        "internal_model": "openai/gpt-4o",
-        "required_key": "openrouter_api_key"
-    },
-    "axon-gpt-4": {
-        "provider": "openrouter",
-        "internal_model": "openai/gpt-4",
-        "required_key": "openrouter_api_key"
-    },
-    "axon-claude-sonnet": {
-        "provider": "openrouter",
-        "internal_model": "anthropic/claude-3-sonnet",
-        "required_key": "openrouter_api_key"
-    },
-    "axon-gemini-pro": {
-        "provider": "openrouter",
-        "internal_model": "google/gemini-pro",
-        "required_key": "openrouter_api_key"
-    },
-    "axon-llama-3-70b": {
-        "provider": "groq",
-        "internal_model": "llama-3.3-70b-versatile",
-        "required_key": "groq_api_key"
-    },
-    "axon-llama-3-8b": {
-        "provider": "groq",
-        "internal_model": "llama-3.1-8b-instant",
-        "required_key": "groq_api_key"
-    },
-    "axon-mixtral": {
-        "provider": "groq",
-        "internal_model": "mixtral-8x7b-32768",
-        "required_key": "groq_api_key"
-    },
-    "axon-mistral-large": {
-        "provider": "mistral",
-        "internal_model": "mistral-large-latest",
-        "required_key": "mistral_api_key"
-    },
-    "axon-mistral-medium": {
-        "provider": "mistral",
-        "internal_model": "mistral-medium-latest",
-        "required_key": "mistral_api_key"
-    },
-    "axon-llama-nvidia": {
-        "provider": "nvidia",
-        "internal_model": "meta/llama-3.1-8b-instruct",
-        "required_key": "nvidia_api_key"
-    },
-    "axon-mistral-nvidia": {
-        "provider": "nvidia",
-        "internal_model": "mistralai/mistral-7b-instruct-v0.3",
-        "required_key": "nvidia_api_key"
-    },
-    "axon-mock": {
-        "provider": "mock",
-        "internal_model": "axon-mock",
-        "required_key": None,
-        "premium": False,
-        "large": False
-    }
-}
-
-# Define model tiers
-for model in MODEL_REGISTRY:
-    # Mark large models
-    if "70b" in model or "large" in model:
-        MODEL_REGISTRY[model]["large"] = True
-    else:
-        MODEL_REGISTRY[model]["large"] = False
-        
-    # Mark premium models (OpenRouter/Mistral large)
-    if MODEL_REGISTRY[model]["provider"] in ["openrouter", "mistral"] and MODEL_REGISTRY[model]["large"]:
-        MODEL_REGISTRY[model]["premium"] = True
-    else:
-        MODEL_REGISTRY[model]["premium"] = False
-
-DEFAULT_MODEL = "axon-mock"
-
-def resolve_model(alias: str) -> Optional[Dict[str, Any]]:
+# User-facing model aliases live in a declarative JSON file (models.json next to
+# this module unless Settings.model_registry_path points elsewhere):
+#
+#   {"default_model": "axon-mock",
+#    "models": {"<alias>": {"provider": ..., "internal_model": ..., ...}}}
+#
+# Optional per-entry keys: "required_key" names the Settings field holding the
+# provider's API key; "large" and "premium" restrict the alias to higher tiers;
+# "cache_ttl" (seconds) overrides Settings.cache_default_ttl, 0 disables caching;
+# "fallbacks" lists equivalent aliases on other backends, tried in order when
+# this one is unavailable; "deadline" (seconds) overrides the tier's request
+# deadline; "context_window" (tokens) bounds history trimming.
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), "models.json")
+
+SUGGESTION_CUTOFF = 0.3
+# Candidates per miss passed to difflib after trigram ranking
+SUGGESTION_CANDIDATES = 8
+SUGGESTION_MEMO_SIZE = 4096
+# Longer inputs are never a typo of a known alias
+MAX_ALIAS_LENGTH = 128
+
+
+class RegistryError(ValueError):
+    """Raised when a registry file is malformed."""
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text.lower()} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class RegistrySnapshot:
+    """An immutable, compiled view of the model registry.
+
+    Everything a request needs is precomputed: read-only entries, which tiers
+    may use each alias, which aliases have provider keys configured and a
+    trigram index for suggestions. Misses are memoized in a bounded map owned
+    by the snapshot, so a reload also drops stale suggestions."""
+
+    def __init__(self, models: Dict[str, Dict[str, Any]], default_model: str):
+        self.entries: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+            alias: MappingProxyType({**entry, "fallbacks": tuple(entry.get("fallbacks", ()))})
+            for alias, entry in models.items()
+        })
+        self.aliases: Tuple[str, ...] = tuple(models)
+        self.default_model = default_model
+
+        self.tiers: Mapping[str, FrozenSet[str]] = MappingProxyType({
+            "guest": frozenset(a for a, e in self.entries.items() if not e.get("large") and not e.get("premium")),
+            "test": frozenset(a for a, e in self.entries.items() if not e.get("premium")),
+            "premium": frozenset(self.aliases),
+        })
+        # Aliases whose provider needs no key or has at least one configured
+        self.available: FrozenSet[str] = frozenset(
+            a for a, e in self.entries.items()
+            if not e.get("required_key") or settings.api_keys(e["provider"])
+        )
+        self.by_provider: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+            provider: tuple(a for a, e in self.entries.items() if e["provider"] == provider)
+            for provider in {e["provider"] for e in self.entries.values()}
+        })
+
+        # Trigram -> aliases containing it. Trigrams shared by most aliases
+        # (such as the common "axon-" prefix) say nothing about which one was
+        # meant, so they are left out of the index.
+        postings: Dict[str, List[str]] = {}
+        for alias in self.aliases:
+            for gram in _trigrams(alias):
+                postings.setdefault(gram, []).append(alias)
+        common = max(len(self.aliases) // 2, 1)
+        self._index: Dict[str, Tuple[str, ...]] = {
+            gram: tuple(aliases) for gram, aliases in postings.items()
+            if len(aliases) <= common or len(self.aliases) < 3
+        }
+        self._suggestions: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    def get(self, alias: str) -> Optional[Mapping[str, Any]]:
+        return self.entries.get(alias)
+
+    def allows(self, alias: str, tier: str) -> bool:
+        return alias in self.tiers[tier]
+
+    def suggest(self, alias: str) -> Optional[str]:
+        """Returns the closest known alias, or None. Ranks aliases by shared
+        trigrams and runs difflib only on the best few, so the cost does not
+        grow with the registry; results are memoized per snapshot."""
+        if len(alias) > MAX_ALIAS_LENGTH:
+            return None
+        if alias in self._suggestions:
+            self._suggestions.move_to_end(alias)
+            return self._suggestions[alias]
+
+        scores: Dict[str, int] = {}
+        for gram in _trigrams(alias):
+            for candidate in self._index.get(gram, ()):
+                scores[candidate] = scores.get(candidate, 0) + 1
+        candidates = sorted(scores, key=scores.get, reverse=True)[:SUGGESTION_CANDIDATES]
+        matches = difflib.get_close_matches(alias, candidates, n=1, cutoff=SUGGESTION_CUTOFF)
+        suggestion = matches[0] if matches else None
+
+        self._suggestions[alias] = suggestion
+        if len(self._suggestions) > SUGGESTION_MEMO_SIZE:
+            self._suggestions.popitem(last=False)
+        return suggestion
+
+
+def compile_registry(data: Dict[str, Any]) -> RegistrySnapshot:
+    """Validates a parsed registry document and compiles it into a snapshot."""
+    if not isinstance(data, dict):
+        raise RegistryError(f"Registry must be a JSON object, not {type(data).__name__}")
+    models = data.get("models")
+    if not isinstance(models, dict) or not models:
+        raise RegistryError("Registry must define a non-empty 'models' object")
+    for alias, entry in models.items():
+        if not isinstance(entry, dict) or not entry.get("provider") or not entry.get("internal_model"):
+            raise RegistryError(f"Model '{alias}' needs a 'provider' and an 'internal_model'")
+        window = entry.get("context_window")
+        if window is not None and (isinstance(window, bool) or not isinstance(window, int) or window <= 0):
+            raise RegistryError(f"Model '{alias}' has an invalid 'context_window': {window!r}")
+        deadline = entry.get("deadline")
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or deadline <= 0):
+            raise RegistryError(f"Model '{alias}' has an invalid 'deadline': {deadline!r}")
+        fallbacks = entry.get("fallbacks", [])
+        if not isinstance(fallbacks, list):
+            raise RegistryError(f"Model '{alias}' has an invalid 'fallbacks': expected a list of aliases, got {fallbacks!r}")
+        for fallback in fallbacks:
+            if not isinstance(fallback, str) or fallback not in models:
+                raise RegistryError(f"Model '{alias}' falls back to unknown alias '{fallback}'")
+    default_model = data.get("default_model", next(iter(models)))
+    if not isinstance(default_model, str) or default_model not in models:
+        raise RegistryError(f"Default model '{default_model}' is not defined")
+    return RegistrySnapshot(models, default_model)
+
+
+def load_registry(path: Optional[str] = None) -> RegistrySnapshot:
+    """Reads and compiles a registry file, then swaps it in atomically.
+    On any error the current snapshot stays in place and the error is raised."""
+    global _snapshot
+    path = path or settings.model_registry_path or DEFAULT_REGISTRY_PATH
+    with open(path) as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise RegistryError(f"Invalid registry file {path}: {e}")
+    snapshot = compile_registry(data)
+    # A single reference assignment: requests see the old or the new snapshot, never a mix
+    _snapshot = snapshot
+    logger.info(f"Loaded {len(snapshot.aliases)} model aliases from {path}")
+    return snapshot
+
+
+def reload_registry() -> bool:
+    """Reloads the registry file, keeping the current snapshot on failure."""
+    try:
+        load_registry()
+        return True
+    except (OSError, RegistryError) as e:
+        logger.error(f"Model registry reload failed, keeping the current one: {e}")
+        return False
+
+
+_snapshot: RegistrySnapshot = load_registry()
+
+def get_registry() -> RegistrySnapshot:
+    return _snapshot
+
+def resolve_model(alias: str) -> Optional[Mapping[str, Any]]:
     """Resolves a model alias, returns the mapping or None."""
-    model_info = MODEL_REGISTRY.get(alias)
-    if not model_info:
-        return None
-    
-    # Check if required key is present
-    required_key = model_info.get("required_key")
-    if required_key and not getattr(settings, required_key):
-        # We don't return None here anymore, we return the info but the router will fail
-        # Or we can return it and let the provider handle the missing key error
-        pass
-        
-    return model_info
+    return _snapshot.get(alias)
 
 def get_available_models() -> List[str]:
     """Returns a list of all model aliases."""
-    return list(MODEL_REGISTRY.keys())
+    return list(_snapshot.aliases)
 
 def suggest_model(alias: str) -> Optional[str]:
     """Suggests the closest model alias using fuzzy matching among available models."""
-    available_models = get_available_models()
-    matches = difflib.get_close_matches(alias, available_models, n=1, cutoff=0.3)
-    return matches[0] if matches else None
+    return _snapshot.suggest(alias)
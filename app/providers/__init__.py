@@ -1,8 +1,5 @@
-from app.providers.base import BaseProvider
+from app.providers.base import BaseProvider, LazyProviders, ProviderError
 from app.providers.mock import MockProvider
-from app.providers.groq_provider import GroqProvider
-from app.providers.nvidia import NVIDIAProvider
-from app.providers.openrouter import OpenRouterProvider
-from app.providers.mistral import MistralProvider
+from app.providers.openai_compat import OpenAICompatibleProvider, UPSTREAMS, create_providers, provider_factories
 
-__all__ = ["BaseProvider", "MockProvider", "GroqProvider", "NVIDIAProvider", "OpenRouterProvider", "MistralProvider"]
+__all__ = ["BaseProvider", "LazyProviders", "ProviderError", "MockProvider", "OpenAICompatibleProvider", "UPSTREAMS", "create_providers", "provider_factories"]
@@ -0,0 +1,200 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from app.providers.base import ProviderError
+from app.providers.scheduler import FairQueue, get_tenant_stats
+from app.core.metrics import ADMISSION_LIMIT, ADMISSION_QUEUED, ADMISSION_QUEUE_TIME, ADMISSION_SHED
+
+tenant_stats = get_tenant_stats()
+
+
+class ProviderOverloaded(ProviderError):
+    """Raised instead of queueing a call to a provider that is at its
+    concurrency limit with a full queue, or whose queue wait timed out."""
+
+    def __init__(self, name: str, retry_after: float):
+        retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"Provider '{name}' is overloaded, retry in {retry_after}s",
+            status_code=503,
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Adaptive concurrency limit for one upstream provider.
+
+    Calls over the limit wait for at most `queue_timeout` seconds in a
+    weighted fair queue across tenants, weighted by tier (`weights`). When the
+    `max_queue` entries are taken, the entry with the latest fair-queue tag is
+    shed at once with ProviderOverloaded: the newcomer, or the newest entry of
+    a tenant that has queued far more. The limit follows a gradient
+    algorithm, updated once per sampling window (at least `window` seconds and `min_samples`
+    calls) from the window's mean latency: it grows by about sqrt(limit) while
+    that stays within `tolerance` times the long-run average over roughly
+    `long_windows` windows, and shrinks in proportion as latency climbs above
+    it. Failures that suggest overload (timeouts, 429s, 5xx) cut it by `backoff`
+    right away, at most once per window."""
+
+    def __init__(self, name: str, initial_limit: int = 20, min_limit: int = 2, max_limit: int = 200,
+                 max_queue: int = 50, queue_timeout: float = 2.0, tolerance: float = 2.0,
+                 smoothing: float = 0.2, backoff: float = 0.9, window: float = 1.0,
+                 min_samples: int = 5, long_windows: int = 30, weights: Optional[Mapping[str, float]] = None):
+        self.name = name
+        self.weights = dict(weights or {})
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.window = window
+        self.min_samples = min_samples
+        self.long_alpha = 2.0 / (long_windows + 1)
+
+        self.in_flight = 0
+        self.long_latency: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.shed = 0
+        self._queue = FairQueue()
+        self._window_end = 0.0
+        self._window_sum = 0.0
+        self._window_count = 0
+        self._window_peak = 0
+        self._backoff_until = 0.0
+        ADMISSION_LIMIT.set(initial_limit, name)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def retry_after(self) -> float:
+        """Rough time for the current queue to drain at the current limit."""
+        latency = self.long_latency or 1.0
+        return latency * (self.queued + 1) / max(self.limit, 1.0)
+
+    def _shed(self) -> ProviderOverloaded:
+        self.shed += 1
+        ADMISSION_SHED.inc(self.name)
+        return ProviderOverloaded(self.name, self.retry_after())
+
+    async def acquire(self, timeout: Optional[float] = None, tenant: str = "", tier: str = "premium", cost: float = 1.0) -> None:
+        """Takes a slot for `tenant`, queueing for up to `queue_timeout` (or
+        `timeout`, if shorter). `cost` is the call's share of the fair queue,
+        such as its token estimate. Every successful acquire must be paired
+        with `release`."""
+        if self.in_flight < int(self.limit) and not self._queue:
+            self.in_flight += 1
+            self._window_peak = max(self._window_peak, self.in_flight)
+            self._record_wait(tenant, tier, 0.0)
+            return
+
+        weight = self.weights.get(tier, 1.0)
+        if len(self._queue) >= self.max_queue:
+            last = self._queue.last()
+            if last is None or last[0] <= self._queue.tag(tenant, weight, cost):
+                raise self._shed()
+            # Push out the tenant that is furthest ahead of its fair share
+            self._queue.discard(last[1], self._shed())
+
+        queued_at = time.monotonic()
+        waiter = self._queue.push(tenant, weight, cost)
+        ADMISSION_QUEUED.set(len(self._queue), self.name)
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        try:
+            async with asyncio.timeout(wait):
+                # release() hands its slot over by resolving the future
+                await waiter
+        except ProviderOverloaded:
+            raise
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Granted just as we gave up: pass the slot on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._queue.discard(waiter)
+                ADMISSION_QUEUED.set(len(self._queue), self.name)
+            if isinstance(e, TimeoutError):
+                raise self._shed()
+            raise
+        self._record_wait(tenant, tier, time.monotonic() - queued_at)
+
+    def _record_wait(self, tenant: str, tier: str, seconds: float) -> None:
+        ADMISSION_QUEUE_TIME.observe(seconds, self.name, tier)
+        if tenant:
+            tenant_stats.record(tenant, tier, seconds)
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """Returns a slot. `latency` of a successful call adjusts the limit;
+        `overloaded` marks a failure that suggests the upstream is saturated."""
+        if overloaded:
+            now = time.monotonic()
+            if now >= self._backoff_until:
+                self._backoff_until = now + self.window
+                self._set_limit(self.limit * self.backoff)
+        elif latency is not None:
+            self._observe(latency)
+        self.in_flight -= 1
+        self._wake()
+
+    def _observe(self, latency: float) -> None:
+        self._window_sum += latency
+        self._window_count += 1
+        now = time.monotonic()
+        if now < self._window_end or self._window_count < self.min_samples:
+            return
+        latency = self._window_sum / self._window_count
+        peak = self._window_peak
+        self._window_end = now + self.window
+        self._window_sum = 0.0
+        self._window_count = 0
+        self._window_peak = self.in_flight
+
+        self.last_latency = latency
+        if self.long_latency is None:
+            self.long_latency = latency
+            return
+        self.long_latency += self.long_alpha * (latency - self.long_latency)
+        # Let the baseline follow a lasting improvement quickly
+        if self.long_latency > 2 * latency:
+            self.long_latency *= 0.95
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_latency / latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        # Only an upstream kept busy says anything about room for more
+        if target > self.limit and peak < self.limit / 2:
+            return
+        self._set_limit(self.limit * (1 - self.smoothing) + target * self.smoothing)
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+        ADMISSION_LIMIT.set(int(self.limit), self.name)
+
+    def _wake(self) -> None:
+        while self.in_flight < int(self.limit):
+            waiter = self._queue.pop()
+            if waiter is None:
+                break
+            self.in_flight += 1
+            self._window_peak = max(self._window_peak, self.in_flight)
+            waiter.set_result(None)
+        ADMISSION_QUEUED.set(len(self._queue), self.name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "shed": self.shed,
+            "latency_ms": ms(self.last_latency),
+            "baseline_latency_ms": ms(self.long_latency),
+        }
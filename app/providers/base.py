@@ -1,9 +1,99 @@
+import asyncio
+import sys
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional
+
 from app.core.schemas import ChatRequest, ChatResponse
 
 
+class ProviderError(RuntimeError):
+    """An upstream failure, tagged with the HTTP status when there was one."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers
+
+
+class UpstreamError(ProviderError):
+    """Raised to the route when no backend could serve a request. Its
+    status_code is the one for the client: 502, or 400 when the upstream
+    rejected the request itself."""
+
+
+RETRYABLE_STATUS_CODES = {408, 429}
+
+# Upstream statuses that blame the request rather than the upstream
+REJECTED_STATUS_CODES = {400, 413, 422}
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """True for failures another backend may not share: connect errors,
+    timeouts, 429s and 5xx responses."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # httpx is imported with the first upstream client; until then none of its errors can occur
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and httpx is not None and isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return False
+
+
 class BaseProvider(ABC):
     @abstractmethod
-    def chat_completion(self, request: ChatRequest, model_name: Optional[str] = None) -> ChatResponse:
+    async def achat_completion(self, request: ChatRequest, model_name: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> ChatResponse:
         pass
+
+    async def astream_chat_completion(self, request: ChatRequest, model_name: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yields OpenAI-style `chat.completion.chunk` dicts. Providers without a
+        native streaming API fall back to a single chunk holding the full completion."""
+        response = await self.achat_completion(request, model_name=model_name, messages=messages)
+        for choice in response.choices:
+            yield {
+                "id": response.id,
+                "object": "chat.completion.chunk",
+                "created": response.created,
+                "model": response.model,
+                "choices": [{
+                    "index": choice.index,
+                    "delta": {"role": choice.message.role, "content": choice.message.content},
+                    "finish_reason": choice.finish_reason
+                }],
+                "usage": response.usage.model_dump()
+            }
+
+    async def warm_up(self) -> None:
+        """Opens what the first request would otherwise wait for, such as an
+        upstream connection. Called at startup when warm-up is enabled."""
+
+
+class LazyProviders(Mapping[str, BaseProvider]):
+    """Providers by name, each constructed on first lookup, so startup does
+    not pay for backends a process never calls."""
+
+    def __init__(self, factories: Mapping[str, Callable[[], BaseProvider]]):
+        self._factories = dict(factories)
+        self._instances: Dict[str, BaseProvider] = {}
+
+    def __getitem__(self, name: str) -> BaseProvider:
+        provider = self._instances.get(name)
+        if provider is None:
+            provider = self._instances[name] = self._factories[name]()
+        return provider
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._factories
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def loaded(self) -> List[str]:
+        return list(self._instances)
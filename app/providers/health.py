@@ -0,0 +1,138 @@
+import math
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.providers.base import ProviderError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ProviderError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        retry_after = max(1, math.ceil(retry_in))
+        super().__init__(
+            f"Provider '{name}' is unavailable (circuit open, retry in {retry_after}s)",
+            status_code=503,
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Tracks one provider's recent outcomes and latency and decides whether
+    requests may be sent to it.
+
+    The circuit opens after `failure_threshold` consecutive failures, or when
+    the error rate over the last `window` calls reaches `error_rate` (once at
+    least `min_samples` calls were seen). After `open_seconds` it half-opens
+    and lets up to `half_open_probes` requests through; a success closes it
+    again and a failure re-opens it."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate: float = 0.5, window: int = 50,
+                 min_samples: int = 10, open_seconds: float = 30.0, half_open_probes: int = 1,
+                 latency_alpha: float = 0.2, latency_samples: int = 512):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate
+        self.min_samples = min_samples
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.latency_alpha = latency_alpha
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+        self.outcomes: deque = deque(maxlen=window)
+        self.latencies: deque = deque(maxlen=latency_samples)
+        self.ewma_latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if self.retry_in() > 0:
+                return False
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_probes:
+                return False
+            self.probes_in_flight += 1
+        return True
+
+    def check(self) -> None:
+        """Raises CircuitOpenError if a request may not be sent now."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def _observe_latency(self, latency: float) -> None:
+        self.latencies.append(latency)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.latency_alpha * (latency - self.ewma_latency)
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.outcomes.append(True)
+        self._observe_latency(latency)
+        self.consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.outcomes.clear()
+
+    def record_failure(self, latency: Optional[float] = None) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.outcomes.append(False)
+        if latency is not None:
+            self._observe_latency(latency)
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold or (
+            len(self.outcomes) >= self.min_samples and self.error_rate() >= self.error_rate_threshold
+        ):
+            self._open()
+
+    def release_probe(self) -> None:
+        """Frees a half-open probe slot for a call that ended without an outcome."""
+        if self.state == HALF_OPEN and self.probes_in_flight:
+            self.probes_in_flight -= 1
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency_ms": ms(self.ewma_latency),
+            "p50_ms": ms(self.percentile(0.50)),
+            "p99_ms": ms(self.percentile(0.99)),
+        }
@@ -0,0 +1,132 @@
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, List, Mapping, Optional, Tuple
+
+from app.providers.base import ProviderError
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Cooldown for a 429 that carries no reset information
+DEFAULT_COOLDOWN = 10.0
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses rate-limit reset values such as '7.66s', '2m59.56s' or '20ms'."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ApiKey:
+    __slots__ = ("value", "remaining_requests", "remaining_tokens", "quota_reset_at", "cooldown_until", "outstanding")
+
+    def __init__(self, value: str):
+        self.value = value
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.quota_reset_at = 0.0
+        self.cooldown_until = 0.0
+        self.outstanding = 0
+
+
+class KeyPool:
+    """Spreads one provider's traffic over several API keys.
+
+    Each request goes to the key with the most remaining quota, as reported by
+    the upstream `x-ratelimit-remaining-*` headers, with the fewest outstanding
+    requests as the tiebreak. A key that gets a 429 is taken out of rotation
+    until its reported reset time and the request is retried on another key."""
+
+    def __init__(self, name: str, keys: List[str]):
+        self.name = name
+        self.keys = [ApiKey(k) for k in keys]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _score(self, key: ApiKey, now: float) -> Tuple[float, float, int]:
+        if now >= key.quota_reset_at:
+            # The quota window has rolled over, so the last report is stale
+            key.remaining_requests = key.remaining_tokens = None
+        requests = float("inf") if key.remaining_requests is None else key.remaining_requests
+        tokens = float("inf") if key.remaining_tokens is None else key.remaining_tokens
+        return (-requests, -tokens, key.outstanding)
+
+    def acquire(self) -> ApiKey:
+        now = time.monotonic()
+        available = [k for k in self.keys if k.cooldown_until <= now]
+        if not available:
+            retry_in = min(k.cooldown_until for k in self.keys) - now
+            raise ProviderError(f"All {self.name} API keys are rate limited; retry in {retry_in:.0f}s", status_code=429)
+        key = min(available, key=lambda k: self._score(k, now))
+        key.outstanding += 1
+        if key.remaining_requests is not None:
+            # Spend the quota optimistically so concurrent requests spread out
+            key.remaining_requests -= 1
+        return key
+
+    def release(self, key: ApiKey, headers: Optional[Mapping[str, str]] = None, status_code: Optional[int] = None) -> None:
+        key.outstanding -= 1
+        if headers is None:
+            return
+        now = time.monotonic()
+        requests = _int_header(headers, "x-ratelimit-remaining-requests")
+        tokens = _int_header(headers, "x-ratelimit-remaining-tokens")
+        if requests is not None or tokens is not None:
+            key.remaining_requests, key.remaining_tokens = requests, tokens
+            reset = max(
+                parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0
+            )
+            key.quota_reset_at = now + (reset or 60.0)
+        if status_code == 429:
+            cooldown = (
+                parse_duration(headers.get("retry-after"))
+                or parse_duration(headers.get("x-ratelimit-reset-requests"))
+                or parse_duration(headers.get("x-ratelimit-reset-tokens"))
+                or DEFAULT_COOLDOWN
+            )
+            key.cooldown_until = now + cooldown
+            logger.warning(f"KeyPool '{self.name}': key ...{key.value[-4:]} rate limited for {cooldown:.1f}s")
+
+    async def run(self, call: Callable[[str], Awaitable[Tuple[Any, Mapping[str, str]]]]) -> Any:
+        """Runs `call(api_key)`, which returns (result, response_headers),
+        retrying on another key when the upstream answers 429."""
+        for attempt in range(len(self.keys)):
+            key = self.acquire()
+            try:
+                result, headers = await call(key.value)
+            except BaseException as e:
+                status_code, headers = _error_response_info(e)
+                self.release(key, headers, status_code)
+                if status_code == 429 and attempt < len(self.keys) - 1:
+                    continue
+                raise
+            self.release(key, headers, 200)
+            return result
+
+
+def _error_response_info(error: BaseException) -> Tuple[Optional[int], Optional[Mapping[str, str]]]:
+    response = getattr(error, "response", None)
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None)
+    status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    return status_code, headers
@@ -1,32 +1,43 @@
 import logging
-from typing import Optional
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from app.providers.base import BaseProvider
 from app.core.schemas import ChatRequest, ChatResponse, Choice, Message, Usage
+from app.core.tokens import estimate_messages_tokens, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
 
 class MockProvider(BaseProvider):
-    def chat_completion(self, request: ChatRequest, model_name: Optional[str] = None) -> ChatResponse:
-        logger.info(f"MockProvider: handling model '{request.model}'")
-
+    def _build_content(self, request: ChatRequest) -> str:
         last_user_message = ""
         for msg in reversed(request.messages):
             if msg.role == "user":
                 last_user_message = msg.content
                 break
 
-        mock_response_content = (
+        return (
             f"[Mock Response] You requested model '{request.model}'. "
             f"Your message: '{last_user_message[:100]}{'...' if len(last_user_message) > 100 else ''}'. "
             f"This is a placeholder response from MockProvider."
         )
 
-        response_message = Message(role="assistant", content=mock_response_content)
+    def _build_usage(self, request: ChatRequest, content: str) -> Usage:
+        prompt_tokens = estimate_messages_tokens(request.messages)
+        completion_tokens = estimate_tokens(content)
+        return Usage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
 
-        prompt_tokens = sum(len(msg.content.split()) for msg in request.messages) * 4
-        completion_tokens = len(mock_response_content.split()) * 4
+    async def achat_completion(self, request: ChatRequest, model_name: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> ChatResponse:
+        logger.info(f"MockProvider: handling model '{request.model}'")
+
+        mock_response_content = self._build_content(request)
+        response_message = Message(role="assistant", content=mock_response_content)
 
         return ChatResponse(
             model=request.model,
@@ -37,9 +48,29 @@ class MockProvider(BaseProvider):
                     finish_reason="stop"
                 )
             ],
-            usage=Usage(
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=prompt_tokens + completion_tokens
-            )
+            usage=self._build_usage(request, mock_response_content)
         )
+
+    async def astream_chat_completion(self, request: ChatRequest, model_name: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        logger.info(f"MockProvider: streaming model '{request.model}'")
+
+        content = self._build_content(request)
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(datetime.now().timestamp())
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": request.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        yield chunk({"role": "assistant", "content": ""})
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            yield chunk({"content": word if i == 0 else " " + word})
+        final = chunk({}, finish_reason="stop")
+        final["usage"] = self._build_usage(request, content).model_dump()
+        yield final
@@ -0,0 +1,220 @@
+import logging
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Mapping, Optional
+
+import orjson
+
+from app.providers.base import BaseProvider, ProviderError
+from app.providers.keypool import KeyPool
+from app.providers.transport import get_transport_pool
+from app.core.schemas import ChatRequest, ChatResponse, new_completion_id
+from app.core.config import get_settings
+from app.core.preprocess import build_upstream_messages
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Upstreams speaking the OpenAI chat completions API. Base URLs come from
+# Settings.<name>_base_url and keys from Settings.api_keys(<name>), so adding
+# one is an entry here plus those two settings. Per-upstream options:
+#   display_name   used in log and error messages
+#   default_model  sent when the registry entry gives no internal model
+#   strip_fences   unwrap replies that are a single ``` fenced block
+#   require_usage  fail when the response carries no token usage
+#   usage_field    extra key holding {"usage": ...} on the final stream chunk
+#   stream_usage   ask for usage on streams with stream_options (default True);
+#                  off where the upstream does not take the option
+#   headers        sent with every request
+UPSTREAMS: Dict[str, Dict[str, Any]] = {
+    "groq": {"display_name": "Groq", "usage_field": "x_groq"},
+    "nvidia": {"display_name": "NVIDIA", "default_model": "meta/llama-3.1-8b-instruct", "strip_fences": True, "require_usage": True},
+    "openrouter": {"display_name": "OpenRouter", "default_model": "google/gemini-pro", "strip_fences": True},
+    # Mistral reports usage on the last stream chunk unasked
+    "mistral": {"display_name": "Mistral", "default_model": "mistral-large-latest", "strip_fences": True, "stream_usage": False},
+}
+
+CHAT_PATH = "/chat/completions"
+
+
+class OpenAICompatibleProvider(BaseProvider):
+    """One provider engine for every OpenAI-compatible upstream.
+
+    Requests are encoded with orjson and sent over the shared transport pool.
+    Responses are decoded with orjson and, since the upstream already speaks
+    the schema, validated straight from the decoded dict after rewriting
+    `model` to the alias, instead of being rebuilt object by object."""
+
+    def __init__(
+        self,
+        name: str,
+        display_name: Optional[str] = None,
+        default_model: Optional[str] = None,
+        strip_fences: bool = False,
+        require_usage: bool = False,
+        usage_field: Optional[str] = None,
+        stream_usage: bool = True,
+        headers: Optional[Mapping[str, str]] = None,
+        base_url: Optional[str] = None,
+    ):
+        self.name = name
+        self.display_name = display_name or name
+        self.default_model = default_model
+        self.strip_fences = strip_fences
+        self.require_usage = require_usage
+        self.usage_field = usage_field
+        self.stream_usage = stream_usage
+        self.extra_headers = dict(headers or {})
+        self.base_url = base_url or getattr(settings, f"{name}_base_url")
+        self.keys = KeyPool(name, settings.api_keys(name))
+        if not self.keys:
+            logger.warning(f"{self.name.upper()}_API_KEY is missing in environment")
+
+    def _client(self) -> "httpx.AsyncClient":
+        return get_transport_pool().get_client(self.name, base_url=self.base_url)
+
+    def _headers(self, api_key: str) -> Dict[str, str]:
+        return {
+            **self.extra_headers,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def warm_up(self) -> None:
+        if not self.keys:
+            return
+        started = time.monotonic()
+        # Any answer will do: the point is a pooled, handshaken connection
+        await self._client().head(CHAT_PATH)
+        logger.info(f"{self.display_name}: connection warmed in {(time.monotonic() - started) * 1000:.0f}ms")
+
+    def _check_keys(self) -> None:
+        if not self.keys:
+            raise ValueError(f"{self.display_name} API key is missing. Please add {self.name.upper()}_API_KEY to your .env file.")
+
+    def _body(self, request: ChatRequest, model: str, messages: Optional[List[Dict[str, str]]], stream: bool = False) -> bytes:
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages or build_upstream_messages(request.messages),
+            "temperature": request.temperature if request.temperature is not None else 1.0,
+            "max_tokens": request.max_tokens if request.max_tokens is not None else 1024
+        }
+        if stream:
+            payload["stream"] = True
+            if self.stream_usage:
+                payload["stream_options"] = {"include_usage": True}
+        return orjson.dumps(payload)
+
+    def _error(self, status_code: int, body: bytes, headers: Mapping[str, str], model: str) -> Exception:
+        text = body.decode(errors="replace")
+        logger.error(f"{self.display_name} API HTTP error: {status_code} - {text}")
+        if status_code == 400:
+            try:
+                message = orjson.loads(body)["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = text or "Invalid request"
+            return ValueError(f"{self.display_name} API Error (400): {message}. Internal model ID used: '{model}'")
+        return ProviderError(f"{self.display_name} API error: {status_code} - {text}", status_code=status_code, headers=headers)
+
+    def _content(self, content: Optional[str]) -> str:
+        content = (content or "").strip()
+        if self.strip_fences and content.startswith("```") and content.endswith("```"):
+            start = content.find("\n")
+            end = content.rfind("\n")
+            if start != end:
+                content = content[start + 1:end].strip()
+        return content
+
+    def _usage(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        usage = data.get("usage")
+        extra = data.pop(self.usage_field, None) if self.usage_field else None
+        if not usage and extra:
+            usage = extra.get("usage")
+        return usage
+
+    def _response(self, data: Dict[str, Any], alias: str) -> ChatResponse:
+        """Patches the decoded body in place and validates it in one call."""
+        usage = self._usage(data)
+        if not usage:
+            if self.require_usage:
+                raise ValueError("Provider API response missing usage information")
+            usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        choices = data.get("choices") or []
+        for i, choice in enumerate(choices):
+            message = choice.get("message") or {}
+            choice["message"] = {"role": message.get("role") or "assistant", "content": self._content(message.get("content"))}
+            choice.setdefault("index", i)
+            choice["finish_reason"] = choice.get("finish_reason") or "stop"
+        data["choices"] = choices
+        data["usage"] = usage
+        data["object"] = "chat.completion"
+        data["model"] = alias  # Return the alias, not the internal name
+        if not data.get("id"):
+            data["id"] = new_completion_id()
+        if not data.get("created"):
+            data["created"] = int(time.time())
+        return ChatResponse.model_validate(data)
+
+    async def achat_completion(self, request: ChatRequest, model_name: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> ChatResponse:
+        self._check_keys()
+        model = model_name or self.default_model or request.model
+        logger.info(f"{self.display_name}: calling model '{model}'")
+        body = self._body(request, model, messages)
+
+        async def send(api_key: str):
+            response = await self._client().post(CHAT_PATH, content=body, headers=self._headers(api_key))
+            if response.status_code >= 400:
+                raise self._error(response.status_code, response.content, response.headers, model)
+            return response.content, response.headers
+
+        content = await self.keys.run(send)
+        return self._response(orjson.loads(content), request.model)
+
+    async def astream_chat_completion(self, request: ChatRequest, model_name: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        self._check_keys()
+        model = model_name or self.default_model or request.model
+        logger.info(f"{self.display_name}: streaming model '{model}'")
+        body = self._body(request, model, messages, stream=True)
+
+        async def open_stream(api_key: str):
+            client = self._client()
+            upstream = await client.send(
+                client.build_request("POST", CHAT_PATH, content=body, headers=self._headers(api_key)),
+                stream=True
+            )
+            if upstream.status_code >= 400:
+                error_body = await upstream.aread()
+                await upstream.aclose()
+                raise self._error(upstream.status_code, error_body, upstream.headers, model)
+            return upstream, upstream.headers
+
+        response = await self.keys.run(open_stream)
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    # Keep reading to the end so the connection returns to the pool
+                    continue
+                chunk = orjson.loads(data)
+                chunk["model"] = request.model
+                usage = self._usage(chunk)
+                if usage:
+                    chunk["usage"] = usage
+                yield chunk
+        finally:
+            await response.aclose()
+
+
+def provider_factories() -> Dict[str, Callable[[], OpenAICompatibleProvider]]:
+    """One constructor per configured upstream, for building providers on first use."""
+    return {name: partial(OpenAICompatibleProvider, name, **options) for name, options in UPSTREAMS.items()}
+
+
+def create_providers() -> Dict[str, OpenAICompatibleProvider]:
+    """Builds one provider per configured upstream."""
+    return {name: factory() for name, factory in provider_factories().items()}
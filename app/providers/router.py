@@ -1,99 +1,558 @@
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from app.providers import (
-    MockProvider, 
-    GroqProvider, 
-    NVIDIAProvider, 
-    OpenRouterProvider, 
-    MistralProvider
-)
-from app.core.schemas import ChatRequest, ChatResponse
-from app.models.registry import resolve_model
+import time
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+from app.providers import LazyProviders, MockProvider, provider_factories
+from app.providers.base import REJECTED_STATUS_CODES, ProviderError, UpstreamError, is_retryable_error
+from app.providers.admission import AdmissionController, ProviderOverloaded
+from app.providers.health import CLOSED, CircuitBreaker, CircuitOpenError
+from app.core.schemas import ChatRequest, ChatResponse, Message, new_completion_id
+from app.core.cache import get_response_cache
+from app.core.config import get_settings
+from app.core.context import DeadlineExceeded, RouteContext
+from app.core.fingerprint import request_fingerprint
+from app.core.preprocess import IDENTITY_MESSAGE, build_upstream_messages, needs_identity
+from app.core.metrics import COMPLETION_TOKENS, FUZZY_REWRITES, PROMPT_TOKENS, REQUEST_CANCELLATIONS, UPSTREAM_IN_FLIGHT, UPSTREAM_LATENCY
+from app.core.singleflight import get_singleflight
+from app.models.registry import get_registry
 
 logger = logging.getLogger(__name__)
 
-from app.core.limiter import get_limiter
+from app.core.limiter import Reservation, get_limiter, get_tier
+from app.core.ledger import get_ledger
+from app.core.tokens import estimate_messages_tokens
+from app.core.trimming import TrimResult, trim_messages
 
 limiter = get_limiter()
+ledger = get_ledger()
+response_cache = get_response_cache()
+singleflight = get_singleflight()
+settings = get_settings()
+
+class PreparedRequest:
+    """A request after the preprocessing pipeline: the (possibly rewritten)
+    alias, its registry entry, the upstream message list, when history was
+    trimmed, what was removed, and who it is scheduled for upstream."""
+    __slots__ = ("request", "model_alias", "entry", "messages", "trim", "trimmed", "tenant", "tier", "cost")
+
+    def __init__(self, request: ChatRequest, trim: str = "", tier: str = "premium"):
+        self.request = request
+        self.model_alias: str = request.model
+        self.entry: Optional[Mapping[str, Any]] = None
+        self.messages: List[Dict[str, str]] = []
+        self.trim = trim
+        self.trimmed: Optional[TrimResult] = None
+        self.tenant = ""
+        self.tier = tier
+        self.cost = 0
+
 
 class ProviderRouter:
     def __init__(self):
-        self.providers = {
-            "mock": MockProvider(),
-            "groq": GroqProvider(),
-            "nvidia": NVIDIAProvider(),
-            "openrouter": OpenRouterProvider(),
-            "mistral": MistralProvider()
+        # Built on first use; breakers and admission state are cheap and kept for all
+        self.providers = LazyProviders({
+            "mock": MockProvider,
+            **provider_factories()
+        })
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=settings.breaker_failure_threshold,
+                error_rate=settings.breaker_error_rate,
+                window=settings.breaker_window,
+                min_samples=settings.breaker_min_samples,
+                open_seconds=settings.breaker_open_seconds,
+                half_open_probes=settings.breaker_half_open_probes
+            )
+            for name in self.providers
         }
+        self.admission: Dict[str, AdmissionController] = {
+            name: AdmissionController(
+                name,
+                initial_limit=settings.admission_initial_limit,
+                min_limit=settings.admission_min_limit,
+                max_limit=settings.admission_max_limit,
+                max_queue=settings.admission_max_queue,
+                queue_timeout=settings.admission_queue_timeout,
+                tolerance=settings.admission_tolerance,
+                weights={tier: getattr(settings, f"{tier}_weight") for tier in ("guest", "test", "premium")}
+            )
+            for name in self.providers
+        } if settings.admission_enabled else {}
 
-    def _should_inject_identity(self, messages: list) -> bool:
-        if not messages:
-            return False
-        
-        # Check last message content
-        last_message = messages[-1].get("content", "").lower()
-        trigger_keywords = ["axon", "axonnexus", "axoninnova"]
-        trigger_phrases = ["who built", "who made", "who runs", "who developed", "created by"]
-        
-        if any(kw in last_message for kw in trigger_keywords):
-            return True
-        if any(phrase in last_message for phrase in trigger_phrases):
-            return True
-            
-        return False
+    def _prepare(self, request: ChatRequest, is_test: bool, is_guest: bool, ctx: RouteContext) -> "PreparedRequest":
+        """Runs the preprocessing pipeline once, in order, timing each stage
+        under its Server-Timing phase."""
+        trim = settings.trim_strategy if ctx.trim is None else ctx.trim
+        prepared = PreparedRequest(request, trim=trim if trim != "off" else "", tier=get_tier(is_test, is_guest))
+        for phase, stage in self.PIPELINE:
+            with ctx.phase(phase):
+                stage(self, prepared, is_test, is_guest)
+        if prepared.trimmed:
+            ctx.headers["X-Axon-Trimmed"] = prepared.trimmed.header()
+        return prepared
 
-    def route_chat(self, request: ChatRequest, client_key: str, is_test: bool, is_guest: bool) -> ChatResponse:
+    def _clamp(self, prepared: "PreparedRequest", is_test: bool, is_guest: bool) -> None:
         # 1) Enforce hard limits
+        request = prepared.request
         request.max_tokens = min(request.max_tokens or 300, 300)
         request.temperature = 0.7 if request.temperature is None else 0.7
-        
-        # New Requirement: Conditional Axon identity injection
-        if self._should_inject_identity([m.dict() for m in request.messages]):
-            from app.core.schemas import Message
-            identity_msg = Message(role="system", content="AxonNexus is a first-party AI API developed and maintained by the AxonInnova community.")
-            # Insert after any existing system message or at start
-            request.messages.insert(0, identity_msg)
 
+    def _inject_identity(self, prepared: "PreparedRequest", is_test: bool, is_guest: bool) -> None:
+        # Conditional Axon identity injection, placed ahead of the conversation
+        if needs_identity(prepared.request.messages):
+            prepared.request.messages.insert(0, IDENTITY_MESSAGE)
+
+    def _resolve_alias(self, prepared: "PreparedRequest", is_test: bool, is_guest: bool) -> None:
+        prepared.model_alias, prepared.entry = self._resolve(prepared.request, is_test, is_guest)
+
+    def _trim_history(self, prepared: "PreparedRequest", is_test: bool, is_guest: bool) -> None:
+        if not prepared.trim:
+            return
+        result = trim_messages(prepared.request.messages, prepared.trim, self._prompt_budget(prepared), settings.trim_last_turns)
+        if result.dropped:
+            logger.info(f"Trimmed {result.dropped} messages ({prepared.trim}) for '{prepared.model_alias}'")
+            prepared.request.messages = result.messages
+            prepared.trimmed = result
+
+    def _prompt_budget(self, prepared: "PreparedRequest") -> Optional[int]:
+        """Prompt tokens that fit every backend the request may fail over to,
+        leaving room for the reply, or None when no limit is known."""
+        registry = get_registry()
+        entries = [prepared.entry, *(registry.get(alias) for alias in prepared.entry.get("fallbacks", ()))]
+        windows = [e["context_window"] for e in entries if e and e.get("context_window")]
+        limits = [w - (prepared.request.max_tokens or 0) for w in windows]
+        if settings.trim_max_prompt_tokens:
+            limits.append(settings.trim_max_prompt_tokens)
+        return min(limits) if limits else None
+
+    def _shape_payload(self, prepared: "PreparedRequest", is_test: bool, is_guest: bool) -> None:
+        # Built once here and shared by every backend attempt
+        prepared.messages = build_upstream_messages(prepared.request.messages)
+
+    PIPELINE = (
+        ("preprocess", _clamp),
+        ("preprocess", _inject_identity),
+        ("resolve", _resolve_alias),
+        ("preprocess", _trim_history),
+        ("preprocess", _shape_payload),
+    )
+
+    def _resolve(self, request: ChatRequest, is_test: bool, is_guest: bool) -> Tuple[str, Mapping[str, Any]]:
+        registry = get_registry()
         model_alias = request.model
-        resolved = resolve_model(model_alias)
+        resolved = registry.get(model_alias)
         
         if not resolved:
             # Attempt fuzzy matching internally
-            from app.models.registry import suggest_model
-            suggestion = suggest_model(model_alias)
+            suggestion = registry.suggest(model_alias)
             if suggestion:
                 logger.info(f"Fuzzy matched '{model_alias}' to '{suggestion}'")
+                FUZZY_REWRITES.inc(suggestion)
                 model_alias = suggestion
                 request.model = suggestion
-                resolved = resolve_model(suggestion)
+                resolved = registry.get(suggestion)
         
         if not resolved:
             raise ValueError(f"Model alias '{model_alias}' not found in registry")
 
         # 4) Enforce model access tiers
-        if is_guest and (resolved.get("large") or resolved.get("premium")):
-            raise ValueError(f"Model '{model_alias}' requires authentication")
-        if is_test and resolved.get("premium"):
+        if not registry.allows(model_alias, get_tier(is_test, is_guest)):
+            if is_guest:
+                raise ValueError(f"Model '{model_alias}' requires authentication")
             raise ValueError(f"Model '{model_alias}' requires a premium API key")
             
         provider_name = resolved["provider"]
-        internal_model = resolved["internal_model"]
         
-        provider = self.providers.get(provider_name)
-        if not provider:
+        if provider_name not in self.providers:
             raise ValueError(f"Provider '{provider_name}' not implemented")
+
+        return model_alias, resolved
+
+    def _backend_chain(self, model_alias: str, resolved: Mapping[str, Any], is_test: bool, is_guest: bool) -> List[Tuple[str, Mapping[str, Any]]]:
+        """Returns the primary (alias, entry) followed by usable fallbacks: ones
+        the caller's tier may use and whose provider has a key configured."""
+        registry = get_registry()
+        tier = get_tier(is_test, is_guest)
+        chain = [(model_alias, resolved)]
+        for alias in resolved.get("fallbacks", ()):
+            entry = registry.get(alias)
+            if not entry or entry["provider"] not in self.providers:
+                continue
+            if alias in registry.available and registry.allows(alias, tier):
+                chain.append((alias, entry))
+        return chain
+
+    def _start_deadline(self, ctx: RouteContext, prepared: "PreparedRequest", started: float, is_test: bool, is_guest: bool) -> None:
+        """Sets the deadline of a request that did not bring its own: the
+        model's registry "deadline", else its tier's, else the global default."""
+        if ctx.deadline is not None:
+            return
+        budget = prepared.entry.get("deadline") or getattr(settings, f"{get_tier(is_test, is_guest)}_request_deadline")
+        ctx.deadline = started + (budget or settings.request_deadline)
+
+    def _deadline_error(self, ctx: RouteContext, model_alias: str, error: BaseException) -> Optional[DeadlineExceeded]:
+        """Returns the error to raise when `error` means the deadline ran out."""
+        if isinstance(error, DeadlineExceeded):
+            return error
+        if isinstance(error, asyncio.TimeoutError) and ctx.remaining() <= 0:
+            REQUEST_CANCELLATIONS.inc("deadline")
+            return DeadlineExceeded(f"Request deadline exceeded while waiting for '{model_alias}'")
+        return None
+
+    def _upstream_error(self, model_alias: str, error: Exception) -> ProviderError:
+        """Returns the error to raise when the last backend for a request
+        failed: full queues and open circuits as they are (503 with
+        Retry-After), anything else as an UpstreamError."""
+        if isinstance(error, (ProviderOverloaded, CircuitOpenError)):
+            return error
+        logger.error(f"Provider error: {type(error).__name__}: {error}")
+        status_code = 400 if getattr(error, "status_code", None) in REJECTED_STATUS_CODES else 502
+        return UpstreamError(f"The model provider for '{model_alias}' encountered an issue: {str(error) or type(error).__name__}", status_code=status_code)
+
+    def _attempt_timeout(self, ctx: RouteContext, last_error: Optional[Exception], is_last: bool) -> float:
+        remaining = ctx.remaining()
+        if remaining <= 0:
+            REQUEST_CANCELLATIONS.inc("deadline")
+            raise DeadlineExceeded("Request deadline exceeded") from last_error
+        # Leave part of the budget for the next backend unless this is the last one
+        return remaining if is_last else min(remaining, settings.failover_attempt_timeout)
+
+    async def _attempt(self, provider_name: str, model_alias: str, call, timeout: float, prepared: Optional[PreparedRequest] = None):
+        """Runs one upstream call through the provider's circuit breaker and
+        admission controller, queued fairly for the tenant of `prepared`. Open
+        circuits and full queues fail immediately with a retryable
+        CircuitOpenError or ProviderOverloaded. For streams the call ends, and
+        the admission slot is released, at the first chunk.
+
+        A timeout only counts against the provider when it had the full
+        failover_attempt_timeout; one cut short by the request's own deadline
+        (such as a client's X-Axon-Timeout) says nothing about its health."""
+        breaker = self.breakers[provider_name]
+        breaker.check()
+        deadline_bound = timeout < settings.failover_attempt_timeout
+        admission = self.admission.get(provider_name)
+        if admission:
+            queued_at = time.monotonic()
+            try:
+                if prepared:
+                    await admission.acquire(timeout, tenant=prepared.tenant, tier=prepared.tier, cost=max(prepared.cost, 1))
+                else:
+                    await admission.acquire(timeout)
+            except BaseException:
+                breaker.release_probe()
+                raise
+            timeout -= time.monotonic() - queued_at
+        started = time.monotonic()
+        outcome = "error"
+        overloaded = False
+        UPSTREAM_IN_FLIGHT.inc(provider_name)
+        try:
+            result = await asyncio.wait_for(call(), timeout)
+            outcome = "ok"
+        except StopAsyncIteration:
+            outcome = "ok"
+            breaker.record_success(time.monotonic() - started)
+            raise
+        except Exception as e:
+            # Only failures that say something about upstream health count against it
+            if is_retryable_error(e) and not (deadline_bound and isinstance(e, asyncio.TimeoutError)):
+                overloaded = True
+                breaker.record_failure(time.monotonic() - started)
+            else:
+                breaker.release_probe()
+            raise
+        except BaseException:
+            outcome = "cancelled"
+            breaker.release_probe()
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            UPSTREAM_IN_FLIGHT.dec(provider_name)
+            UPSTREAM_LATENCY.observe(elapsed, provider_name, model_alias, outcome)
+            if admission:
+                admission.release(elapsed if outcome == "ok" else None, overloaded=overloaded)
+        breaker.record_success(time.monotonic() - started)
+        return result
+
+    async def warm_up(self, timeout: float) -> None:
+        """Builds every provider that has an API key and opens a connection to
+        its upstream, giving up after `timeout` seconds. Failures are logged."""
+        names = [name for name in self.providers if settings.api_keys(name)]
+        try:
+            async with asyncio.timeout(timeout):
+                results = await asyncio.gather(*(self.providers[name].warm_up() for name in names), return_exceptions=True)
+        except TimeoutError:
+            logger.warning(f"Provider warm-up did not finish within {timeout}s")
+            return
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm-up for '{name}' failed: {type(result).__name__}: {result}")
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+    def admission_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: controller.snapshot() for name, controller in self.admission.items()}
+
+    async def probe_unhealthy(self) -> None:
+        """Sends a one-token completion to each provider whose circuit is due
+        for a half-open probe, so recovery does not wait for user traffic."""
+        for name, breaker in self.breakers.items():
+            if breaker.state == CLOSED or breaker.retry_in() > 0:
+                continue
+            registry = get_registry()
+            aliases = registry.by_provider.get(name)
+            if not aliases:
+                continue
+            alias = aliases[0]
+            probe = ChatRequest(model=alias, messages=[Message(role="user", content="ping")], max_tokens=1)
+            try:
+                await self._attempt(
+                    name,
+                    alias,
+                    lambda: self.providers[name].achat_completion(probe, model_name=registry.get(alias)["internal_model"]),
+                    settings.failover_attempt_timeout
+                )
+                logger.info(f"Health probe for '{name}' succeeded; circuit is {breaker.state}")
+            except Exception as e:
+                logger.warning(f"Health probe for '{name}' failed: {type(e).__name__}: {e}")
+
+    async def run_health_probes(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.probe_unhealthy()
+
+    async def _complete_with_failover(self, prepared: PreparedRequest, chain: List[Tuple[str, Mapping[str, Any]]], ctx: RouteContext) -> Tuple[ChatResponse, str]:
+        """Calls each backend in `chain` until one succeeds, moving on only for
+        retryable errors and only while the request deadline allows.
+        Returns (response, backend) where backend is 'provider/internal_model'."""
+        last_error = None
+        for i, (alias, entry) in enumerate(chain):
+            timeout = self._attempt_timeout(ctx, last_error, is_last=i == len(chain) - 1)
+            backend = f"{entry['provider']}/{entry['internal_model']}"
+            provider = self.providers[entry["provider"]]
+            try:
+                response = await self._attempt(
+                    entry["provider"],
+                    alias,
+                    lambda: provider.achat_completion(prepared.request, model_name=entry["internal_model"], messages=prepared.messages),
+                    timeout,
+                    prepared
+                )
+                return response, backend
+            except Exception as e:
+                if i == len(chain) - 1 or not is_retryable_error(e):
+                    raise
+                logger.warning(f"Backend '{backend}' failed ({type(e).__name__}: {e}); failing over to '{chain[i + 1][0]}'")
+                last_error = e
+
+    async def _lead(self, prepared: PreparedRequest, chain: List[Tuple[str, Mapping[str, Any]]], ctx: RouteContext) -> Tuple[ChatResponse, str]:
+        """`_complete_with_failover` for a coalescing leader. A timeout caused
+        by the leader's own deadline is raised as DeadlineExceeded, which
+        followers do not share."""
+        try:
+            return await self._complete_with_failover(prepared, chain, ctx)
+        except Exception as e:
+            deadline_error = self._deadline_error(ctx, prepared.model_alias, e)
+            if deadline_error is not None and deadline_error is not e:
+                raise deadline_error from e
+            raise
+
+    async def _open_stream_with_failover(self, prepared: PreparedRequest, chain: List[Tuple[str, Mapping[str, Any]]], ctx: RouteContext) -> Tuple[Optional[Dict[str, Any]], AsyncIterator[Dict[str, Any]], str]:
+        """Streaming counterpart of `_complete_with_failover`. A backend can be
+        swapped only until its first chunk arrives. Returns (first, chunks, backend)."""
+        last_error = None
+        for i, (alias, entry) in enumerate(chain):
+            timeout = self._attempt_timeout(ctx, last_error, is_last=i == len(chain) - 1)
+            backend = f"{entry['provider']}/{entry['internal_model']}"
+            provider = self.providers[entry["provider"]]
+            chunks = provider.astream_chat_completion(prepared.request, model_name=entry["internal_model"], messages=prepared.messages)
+            try:
+                first = await self._attempt(entry["provider"], alias, chunks.__anext__, timeout, prepared)
+                return first, chunks, backend
+            except StopAsyncIteration:
+                return None, chunks, backend
+            except Exception as e:
+                await chunks.aclose()
+                if i == len(chain) - 1 or not is_retryable_error(e):
+                    raise
+                logger.warning(f"Backend '{backend}' failed ({type(e).__name__}: {e}); failing over to '{chain[i + 1][0]}'")
+                last_error = e
+
+    async def route_chat(self, request: ChatRequest, client_key: str, is_test: bool, is_guest: bool, ctx: Optional[RouteContext] = None) -> ChatResponse:
+        ctx = ctx or RouteContext()
+        started = time.monotonic()
+        prepared = self._prepare(request, is_test, is_guest, ctx)
+        prepared.tenant, prepared.cost = client_key, self._estimate_cost(request)
+        self._start_deadline(ctx, prepared, started, is_test, is_guest)
+        model_alias, resolved = prepared.model_alias, prepared.entry
+        internal_model = resolved["internal_model"]
+
+        use_cache = settings.cache_enabled and ctx.use_cache
+        fingerprint = None
+        cached = None
+        with ctx.phase("cache"):
+            if use_cache or settings.coalesce_enabled:
+                fingerprint = request_fingerprint(
+                    internal_model,
+                    ((m.role, m.content) for m in request.messages),
+                    request.max_tokens,
+                    request.temperature
+                )
+            if use_cache:
+                cached = response_cache.get(fingerprint)
+
+        if use_cache:
+            if cached:
+                response, age = cached
+                response.model = model_alias
+                ctx.headers["X-Axon-Cache"] = "HIT"
+                ctx.headers["Age"] = str(int(age))
+                # Cache hits are free or discounted against the daily budget
+                charged = int(response.usage.total_tokens * settings.cache_hit_charge_ratio)
+                with ctx.phase("limiter"):
+                    await limiter.update_usage(client_key, charged)
+                ledger.record(client_key, model_alias, 0, 0, charged, cached=True)
+                logger.info(f"Cache hit for '{model_alias}'")
+                return response
+            ctx.headers["X-Axon-Cache"] = "MISS"
+        else:
+            ctx.headers["X-Axon-Cache"] = "BYPASS"
+
+        # Hold the worst-case token cost before dispatch; settled against actual usage below
+        with ctx.phase("limiter"):
+            reservation = await limiter.reserve(client_key, is_test, is_guest, prepared.cost)
+        with ctx.phase("resolve"):
+            chain = self._backend_chain(model_alias, resolved, is_test, is_guest)
             
-        logger.info(f"Routing '{model_alias}' to '{provider_name}' (internal: {internal_model})")
+        logger.info(f"Routing '{model_alias}' to '{resolved['provider']}' (internal: {internal_model})")
         try:
-            response = provider.chat_completion(request, model_name=internal_model)
-            # 3) Track token usage
-            limiter.update_usage(client_key, response.usage.total_tokens)
+            with ctx.phase("upstream"):
+                if settings.coalesce_enabled:
+                    # Followers keep their own deadline, and take over when the
+                    # leader runs out of its own
+                    (response, backend), shared = await singleflight.do(
+                        fingerprint,
+                        lambda: self._lead(prepared, chain, ctx),
+                        timeout=max(ctx.remaining(), 0),
+                        retry=lambda e: isinstance(e, DeadlineExceeded)
+                    )
+                    if shared:
+                        # Each coalesced caller gets its own copy with a fresh id
+                        response = response.model_copy(deep=True, update={"id": new_completion_id(), "model": model_alias})
+                        ctx.headers["X-Axon-Coalesced"] = "true"
+                else:
+                    (response, backend), shared = await self._complete_with_failover(prepared, chain, ctx), False
+            ctx.headers["X-Axon-Backend"] = backend
+            logger.info(f"Served '{model_alias}' from '{backend}'")
+            # 3) Track token usage, charged to every caller under its own key
+            with ctx.phase("limiter"):
+                await limiter.settle(reservation, response.usage.total_tokens)
+            ledger.record(client_key, model_alias, response.usage.prompt_tokens, response.usage.completion_tokens, response.usage.total_tokens)
+            if not shared:
+                PROMPT_TOKENS.inc(model_alias, amount=response.usage.prompt_tokens)
+                COMPLETION_TOKENS.inc(model_alias, amount=response.usage.completion_tokens)
+            if use_cache and not shared:
+                with ctx.phase("cache"):
+                    response_cache.set(fingerprint, response, ttl=resolved.get("cache_ttl"))
             return response
         except ValueError as e:
             raise e
         except Exception as e:
-            logger.error(f"Provider error: {e}")
-            raise RuntimeError(f"The model provider for '{model_alias}' encountered an issue: {str(e)}")
+            deadline_error = self._deadline_error(ctx, model_alias, e)
+            if deadline_error:
+                raise deadline_error
+            raise self._upstream_error(model_alias, e)
+        finally:
+            # Failed or cancelled requests (client disconnects included) give their reservation back
+            if not reservation.done:
+                await asyncio.shield(limiter.refund(reservation))
+
+    async def route_chat_stream(self, request: ChatRequest, client_key: str, is_test: bool, is_guest: bool, ctx: Optional[RouteContext] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Starts a streaming completion and returns an iterator of chunk dicts.
+
+        The first chunk is fetched before returning so that routing and upstream
+        errors surface as exceptions here rather than mid-stream."""
+        ctx = ctx or RouteContext()
+        started = time.monotonic()
+        prepared = self._prepare(request, is_test, is_guest, ctx)
+        prepared.tenant, prepared.cost = client_key, self._estimate_cost(request)
+        self._start_deadline(ctx, prepared, started, is_test, is_guest)
+        model_alias, resolved = prepared.model_alias, prepared.entry
+        with ctx.phase("limiter"):
+            reservation = await limiter.reserve(client_key, is_test, is_guest, prepared.cost)
+        with ctx.phase("resolve"):
+            chain = self._backend_chain(model_alias, resolved, is_test, is_guest)
+
+        logger.info(f"Streaming '{model_alias}' from '{resolved['provider']}' (internal: {resolved['internal_model']})")
+        try:
+            with ctx.phase("upstream"):
+                first, chunks, backend = await self._open_stream_with_failover(prepared, chain, ctx)
+        except BaseException as e:
+            await asyncio.shield(limiter.refund(reservation))
+            if isinstance(e, ValueError) or not isinstance(e, Exception):
+                raise
+            deadline_error = self._deadline_error(ctx, model_alias, e)
+            if deadline_error:
+                raise deadline_error
+            raise self._upstream_error(model_alias, e)
+
+        ctx.headers["X-Axon-Backend"] = backend
+        logger.info(f"Streaming '{model_alias}' from '{backend}'")
+        return self._relay_stream(request, reservation, first, chunks, ctx)
+
+    def _estimate_cost(self, request: ChatRequest) -> int:
+        return estimate_messages_tokens(request.messages) + (request.max_tokens or 0)
+
+    async def _relay_stream(self, request: ChatRequest, reservation: Reservation, first: Optional[Dict[str, Any]], chunks: AsyncIterator[Dict[str, Any]], ctx: RouteContext) -> AsyncIterator[Dict[str, Any]]:
+        usage: Optional[Dict[str, Any]] = None
+        completion_chars = 0
+        try:
+            if first is None:
+                return
+            chunk = first
+            while True:
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                for choice in chunk.get("choices") or []:
+                    completion_chars += len((choice.get("delta") or {}).get("content") or "")
+                yield chunk
+                try:
+                    # The deadline covers the whole stream, not just its first chunk.
+                    # asyncio.timeout keeps the upstream read in this task, so the
+                    # generator is never left running elsewhere when we close it
+                    async with asyncio.timeout(max(ctx.remaining(), 0)):
+                        chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    REQUEST_CANCELLATIONS.inc("deadline")
+                    raise DeadlineExceeded(f"Request deadline exceeded while streaming '{request.model}'")
+        except (asyncio.CancelledError, GeneratorExit):
+            # The server stops consuming the stream when the client goes away
+            REQUEST_CANCELLATIONS.inc("disconnect")
+            raise
+        finally:
+            # Shielded: after a client disconnect the server has already cancelled
+            # this stream, and the upstream close and settlement must still run
+            await asyncio.shield(self._close_stream(request, reservation, chunks, usage, completion_chars))
+
+    async def _close_stream(self, request: ChatRequest, reservation: Reservation, chunks: AsyncIterator[Dict[str, Any]], usage: Optional[Dict[str, Any]], completion_chars: int) -> None:
+        await chunks.aclose()
+        # 3) Settle token usage once the stream closes, including on client disconnect
+        if usage:
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            total_tokens = usage.get("total_tokens", 0)
+            PROMPT_TOKENS.inc(request.model, amount=prompt_tokens)
+            COMPLETION_TOKENS.inc(request.model, amount=completion_tokens)
+        else:
+            prompt_tokens = estimate_messages_tokens(request.messages)
+            completion_tokens = (completion_chars + 3) // 4
+            total_tokens = prompt_tokens + completion_tokens
+        await limiter.settle(reservation, total_tokens)
+        ledger.record(reservation.key, request.model, prompt_tokens, completion_tokens, total_tokens)
 
 router = ProviderRouter()
 
@@ -0,0 +1,130 @@
+import asyncio
+import heapq
+import itertools
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class FairQueue:
+    """Weighted fair queue of waiters, keyed by tenant.
+
+    Uses self-clocked fair queuing: each entry is tagged with a virtual finish
+    time, max(V, tenant's previous tag) + cost / weight, where V is the tag of
+    the entry dispatched last, and entries leave in tag order. A tenant with
+    weight 8 can have eight times the cost of a weight-1 tenant dispatched
+    in the same span, and a tenant that floods the queue only pushes its own
+    tags further out, so others are not stuck behind it."""
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, asyncio.Future, str]] = []
+        self._finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        # Membership is tracked apart from future state: a waiter whose
+        # timeout fired is already cancelled but still counts until discarded
+        self._queued: Set[asyncio.Future] = set()
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def tag(self, tenant: str, weight: float, cost: float) -> float:
+        """The finish tag an entry for `tenant` would get if pushed now."""
+        return max(self._virtual_time, self._finish.get(tenant, 0.0)) + cost / max(weight, 1e-9)
+
+    def push(self, tenant: str, weight: float, cost: float) -> asyncio.Future:
+        finish = self.tag(tenant, weight, cost)
+        self._finish[tenant] = finish
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), waiter, tenant))
+        self._queued.add(waiter)
+        return waiter
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """Removes and returns the waiter with the smallest tag, or None."""
+        while self._heap:
+            finish, _, waiter, _ = heapq.heappop(self._heap)
+            if waiter not in self._queued:
+                continue
+            self._queued.remove(waiter)
+            if waiter.done():
+                # Gave up, but its owner has not discarded it yet
+                continue
+            self._virtual_time = finish
+            self._reset_if_idle()
+            return waiter
+        self._reset_if_idle()
+        return None
+
+    def last(self) -> Optional[Tuple[float, asyncio.Future]]:
+        """The live entry with the largest tag, the first to shed when full."""
+        live = [(finish, waiter) for finish, _, waiter, _ in self._heap if waiter in self._queued and not waiter.done()]
+        return max(live, key=lambda entry: entry[0]) if live else None
+
+    def discard(self, waiter: asyncio.Future, error: Optional[BaseException] = None) -> None:
+        """Takes a waiter out of the queue, cancelling it or failing it with
+        `error` unless it is done already (a timed-out or cancelled waiter).
+        Its heap entry is skipped lazily."""
+        if waiter not in self._queued:
+            return
+        self._queued.remove(waiter)
+        if not waiter.done():
+            if error is None:
+                waiter.cancel()
+            else:
+                waiter.set_exception(error)
+        self._reset_if_idle()
+
+    def _reset_if_idle(self) -> None:
+        if not self._queued:
+            # Idle: nobody is owed anything any more
+            self._heap.clear()
+            self._finish.clear()
+
+
+class TenantQueueStats:
+    """Recent admission queue times per tenant, for the busiest `max_tenants`
+    tenants. Tenants are shown masked, like API keys in logs."""
+
+    def __init__(self, max_tenants: int = 1024, samples: int = 256):
+        self.max_tenants = max_tenants
+        self.samples = samples
+        self._tenants: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def record(self, tenant: str, tier: str, seconds: float) -> None:
+        stats = self._tenants.get(tenant)
+        if stats is None:
+            stats = self._tenants[tenant] = {"tier": tier, "requests": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=self.samples)}
+            if len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+        else:
+            self._tenants.move_to_end(tenant)
+        stats["requests"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        stats["recent"].append(seconds)
+
+    def snapshot(self, top: int = 20) -> List[Dict[str, Any]]:
+        """The `top` tenants by p99 queue time over their recent requests."""
+        def ms(value: float) -> float:
+            return round(value * 1000, 1)
+
+        rows = []
+        for tenant, stats in self._tenants.items():
+            ordered = sorted(stats["recent"])
+            rows.append({
+                "tenant": f"...{tenant[-4:]}",
+                "tier": stats["tier"],
+                "requests": stats["requests"],
+                "mean_ms": ms(stats["total"] / stats["requests"]),
+                "p50_ms": ms(ordered[len(ordered) // 2]),
+                "p99_ms": ms(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]),
+                "max_ms": ms(stats["max"]),
+            })
+        rows.sort(key=lambda row: row["p99_ms"], reverse=True)
+        return rows[:top]
+
+
+tenant_stats = TenantQueueStats()
+
+def get_tenant_stats() -> TenantQueueStats:
+    return tenant_stats
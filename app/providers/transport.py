@@ -0,0 +1,96 @@
+import logging
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class TransportPool:
+    """Holds one pooled, keep-alive `httpx.AsyncClient` per upstream provider.
+
+    Clients are created on first use and shared by every request to that
+    upstream, so TCP/TLS handshakes are paid once per connection rather than
+    once per call. `aclose()` is called from the app lifespan on shutdown.
+    httpx itself is only imported with the first client."""
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+
+    @property
+    def timeout(self) -> "httpx.Timeout":
+        import httpx
+        return httpx.Timeout(
+            connect=settings.http_connect_timeout,
+            read=settings.http_read_timeout,
+            write=settings.http_write_timeout,
+            pool=settings.http_pool_timeout
+        )
+
+    @property
+    def limits(self) -> "httpx.Limits":
+        import httpx
+        return httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        )
+
+    def _http2_available(self) -> bool:
+        if not settings.http2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+            return False
+        return True
+
+    def get_client(self, name: str, base_url: Optional[str] = None) -> "httpx.AsyncClient":
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            import httpx
+            client = httpx.AsyncClient(
+                base_url=base_url or "",
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self._http2_available()
+            )
+            self._clients[name] = client
+            logger.info(f"TransportPool: created client for '{name}'")
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns open/idle/active/waiting connection counts per upstream."""
+        result = {}
+        for name, client in self._clients.items():
+            # httpx does not expose pool state publicly; read it from httpcore
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []) or [])
+            pending = list(getattr(pool, "_requests", []) or [])
+            idle = sum(1 for c in connections if c.is_idle())
+            waiting = sum(1 for r in pending if getattr(r, "is_queued", lambda: False)())
+            result[name] = {
+                "open": len(connections),
+                "idle": idle,
+                "active": len(connections) - idle,
+                "waiting": waiting,
+                "max_connections": settings.http_max_connections
+            }
+        return result
+
+    async def aclose(self) -> None:
+        for name, client in self._clients.items():
+            await client.aclose()
+            logger.info(f"TransportPool: closed client for '{name}'")
+        self._clients.clear()
+
+
+transport_pool = TransportPool()
+
+def get_transport_pool() -> TransportPool:
+    return transport_pool
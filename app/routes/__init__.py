@@ -1,4 +1,6 @@
 from app.routes.health import router as health_router
 from app.routes.chat import router as chat_router
+from app.routes.metrics import router as metrics_router
+from app.routes.usage import router as usage_router
 
-__all__ = ["health_router", "chat_router"]
+__all__ = ["health_router", "chat_router", "metrics_router", "usage_router"]
@@ -1,13 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.openapi.docs import get_swagger_ui_html
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
 from app.core.schemas import ChatRequest, ChatResponse, ModelListResponse, ModelInfo
 from app.core.auth import verify_api_key, security
+from app.providers.admission import ProviderOverloaded
+from app.providers.base import UpstreamError
+from app.providers.health import CircuitOpenError
 from app.providers.router import get_router
-from app.models.registry import get_available_models, suggest_model
-from app.core.limiter import get_limiter
+from app.models.registry import get_available_models, resolve_model, suggest_model
+from app.core.limiter import get_limiter, UsageLimitExceeded
+from app.core.context import DeadlineExceeded, RouteContext
+from app.core.trimming import TRIM_STRATEGIES
+from app.core.batch import get_provider_slots, iter_lines, run_batch
+from app.core.config import get_settings
+from app.core.metrics import REQUEST_CANCELLATIONS
+import asyncio
+import json
+import orjson
 import logging
+import time
 
 logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger("app.timing")
+settings = get_settings()
 router = APIRouter(prefix="/v1", tags=["Chat"])
 provider_router = get_router()
 limiter = get_limiter()
@@ -17,35 +34,280 @@ async def create_chat_completion(
     request_data: ChatRequest,
     fastapi_request: Request,
     api_key: str = Depends(verify_api_key)
-) -> ChatResponse:
+) -> Response:
+    ctx = _timed_context(fastapi_request)
     # Identify client
     client_key = api_key or fastapi_request.client.host
     is_test = api_key == "axn_test_123"
     is_guest = api_key is None
-    
-    # 2) Rate limiting
-    if not limiter.check_rate_limit(client_key, is_test, is_guest):
+
+    try:
+        ctx.deadline = _client_deadline(fastapi_request)
+        ctx.trim = _client_trim(fastapi_request)
+        # 2) Rate limiting and 3) usage tracking, checked in one backend round trip
+        with ctx.phase("limiter"):
+            await _enforce_limits(client_key, is_test, is_guest)
+
+        if request_data.stream:
+            chunks = await _cancel_on_disconnect(
+                fastapi_request,
+                provider_router.route_chat_stream(request_data, client_key, is_test, is_guest, ctx=ctx)
+            )
+            _log_timing(ctx, request_data, status.HTTP_200_OK)
+            return StreamingResponse(
+                _sse_frames(chunks),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **ctx.headers, "Server-Timing": ctx.server_timing()}
+            )
+        result = await _cancel_on_disconnect(
+            fastapi_request,
+            provider_router.route_chat(request_data, client_key, is_test, is_guest, ctx=ctx)
+        )
+        # Serialized here rather than by FastAPI so the cost shows up as a phase
+        with ctx.phase("serialize"):
+            if _wants_timing(fastapi_request):
+                payload = result.model_dump(mode="json")
+                payload["timing"] = ctx.timing_ms()
+                body = json.dumps(payload, separators=(',', ':'))
+            else:
+                body = result.model_dump_json()
+        _log_timing(ctx, request_data, status.HTTP_200_OK)
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={**ctx.headers, "Server-Timing": ctx.server_timing()}
+        )
+    except Exception as e:
+        error = e if isinstance(e, HTTPException) else _http_error(e)
+        _log_timing(ctx, request_data, error.status_code)
+        error.headers = {**(error.headers or {}), "Server-Timing": ctx.server_timing()}
+        raise error
+
+@router.post("/chat/batch")
+async def create_chat_batch(
+    fastapi_request: Request,
+    api_key: str = Depends(verify_api_key)
+) -> StreamingResponse:
+    """Runs a JSONL body of chat requests and streams one JSON result per line,
+    in completion order, tagged with the zero-based index of its input line
+    (blank lines are skipped). Item failures are reported inline.
+
+    Rate and token limits apply to each item as if it were its own request,
+    so a batch larger than the tier's requests per minute gets inline 429s
+    for the excess items. If the client disconnects, items still running are
+    cancelled and no new ones are started."""
+    client_key = api_key or fastapi_request.client.host
+    is_test = api_key == "axn_test_123"
+    is_guest = api_key is None
+    use_cache = _use_cache(fastapi_request)
+    try:
+        trim = _client_trim(fastapi_request)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    slots = get_provider_slots()
+
+    async def dispatch(index: int, line: Any) -> Dict[str, Any]:
+        try:
+            if isinstance(line, Exception):
+                raise line
+            request_data = ChatRequest.model_validate_json(line)
+            request_data.stream = False
+            await _enforce_limits(client_key, is_test, is_guest)
+            provider_name = (resolve_model(request_data.model) or {}).get("provider", "unresolved")
+            ctx = RouteContext(use_cache=use_cache)
+            ctx.trim = trim
+            async with slots.hold(provider_name):
+                result = await provider_router.route_chat(request_data, client_key, is_test, is_guest, ctx=ctx)
+            _log_timing(ctx, request_data, status.HTTP_200_OK)
+            return {"index": index, "response": result.model_dump()}
+        except Exception as e:
+            error = e if isinstance(e, HTTPException) else _http_error(e)
+            return {"index": index, "error": {"status": error.status_code, "message": error.detail}}
+
+    body_read = asyncio.Event()
+    lines = iter_lines(_read_body(fastapi_request, body_read), settings.batch_max_line_bytes)
+    results = run_batch(lines, dispatch, settings.batch_max_in_flight)
+    return _BatchResponse(_ndjson_lines(results), fastapi_request, body_read, media_type="application/x-ndjson")
+
+async def _enforce_limits(client_key: str, is_test: bool, is_guest: bool) -> None:
+    rate_ok, usage_ok = await limiter.check_limits(client_key, is_test, is_guest)
+    if not rate_ok:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded. Please slow down."
         )
         
-    # 3) Usage tracking
-    if not limiter.check_usage_limit(client_key, is_test, is_guest):
+    if not usage_ok:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Daily token limit exceeded."
         )
 
+def _client_deadline(fastapi_request: Request) -> Optional[float]:
+    """Returns the absolute deadline asked for with X-Axon-Timeout (seconds),
+    capped at request_deadline_max, or None to use the model or tier default."""
+    value = fastapi_request.headers.get("x-axon-timeout")
+    if value is None:
+        return None
     try:
-        return provider_router.route_chat(request_data, client_key, is_test, is_guest)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    except RuntimeError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        seconds = float(value)
+    except ValueError:
+        seconds = 0.0
+    if not 0 < seconds < float("inf"):
+        raise ValueError(f"Invalid X-Axon-Timeout header '{value}': expected a positive number of seconds")
+    return time.monotonic() + min(seconds, settings.request_deadline_max)
+
+def _client_trim(fastapi_request: Request) -> Optional[str]:
+    """Returns the history trimming strategy asked for with X-Axon-Trim
+    ("off" disables it), or None to use Settings.trim_strategy."""
+    value = fastapi_request.headers.get("x-axon-trim")
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value != "off" and value not in TRIM_STRATEGIES:
+        raise ValueError(f"Invalid X-Axon-Trim header '{value}': expected off or one of {', '.join(TRIM_STRATEGIES)}")
+    return value
+
+async def _cancel_on_disconnect(fastapi_request: Request, work: Awaitable[Any]) -> Any:
+    """Awaits `work`, cancelling it if the client disconnects first so the
+    upstream call is dropped and its token reservation refunded."""
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(fastapi_request))
+    try:
+        await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            # Let the router refund and close before the handler returns
+            await asyncio.wait((task,))
+    if task.cancelled():
+        REQUEST_CANCELLATIONS.inc("disconnect")
+        raise ClientDisconnect()
+    return task.result()
+
+async def _wait_for_disconnect(fastapi_request: Request) -> None:
+    # The body has already been read, so the next message is the disconnect
+    while (await fastapi_request.receive())["type"] != "http.disconnect":
+        pass
+
+def _timed_context(fastapi_request: Request) -> RouteContext:
+    """Starts the request's RouteContext with the auth time measured by
+    verify_api_key and the body parsing and validation that followed it."""
+    now = time.perf_counter()
+    started = getattr(fastapi_request.state, "started", now)
+    auth_seconds = getattr(fastapi_request.state, "auth_seconds", 0.0)
+    ctx = RouteContext(use_cache=_use_cache(fastapi_request), started=started)
+    ctx.add_timing("auth", auth_seconds)
+    ctx.add_timing("parse", max(now - started - auth_seconds, 0.0))
+    return ctx
+
+def _wants_timing(fastapi_request: Request) -> bool:
+    # Opt-in per request: the phase breakdown is also returned in the body
+    return "timing" in fastapi_request.headers.get("x-axon-debug", "").lower()
+
+def _log_timing(ctx: RouteContext, request_data: ChatRequest, status_code: int) -> None:
+    if not settings.timing_log_enabled:
+        return
+    timings = ctx.timing_ms()
+    if timings["total"] < settings.timing_log_min_ms:
+        return
+    record = {
+        "event": "request_timing",
+        "model": request_data.model,
+        "stream": bool(request_data.stream),
+        "status": status_code,
+        "backend": ctx.headers.get("X-Axon-Backend"),
+        "cache": ctx.headers.get("X-Axon-Cache"),
+        "timings_ms": timings,
+    }
+    timing_logger.info(json.dumps(record, separators=(',', ':')))
+
+def _use_cache(fastapi_request: Request) -> bool:
+    # Clients can opt out of the response cache per request
+    cache_control = fastapi_request.headers.get("cache-control", "").lower()
+    return "no-cache" not in cache_control and "no-store" not in cache_control
+
+def _http_error(e: Exception) -> HTTPException:
+    """Maps routing failures onto the HTTP errors clients see."""
+    if isinstance(e, ClientDisconnect):
+        # Nobody reads this response; the status only shows up in logs and metrics
+        logger.info("Client disconnected; cancelled the in-flight request")
+        return HTTPException(status_code=499, detail="Client closed request")
+    if isinstance(e, (ProviderOverloaded, CircuitOpenError)):
+        return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers=dict(e.headers))
+    if isinstance(e, UpstreamError):
+        return HTTPException(status_code=e.status_code, detail=str(e))
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    if isinstance(e, UsageLimitExceeded):
+        return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    if isinstance(e, (ValueError, RuntimeError)):
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    logger.error(f"Unexpected error: {e}")
+    return HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected internal error occurred.")
+
+async def _read_body(fastapi_request: Request, done: asyncio.Event) -> AsyncIterator[bytes]:
+    async for chunk in fastapi_request.stream():
+        yield chunk
+    done.set()
+
+async def _ndjson_lines(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    try:
+        async for result in results:
+            yield orjson.dumps(result) + b"\n"
+    except ClientDisconnect:
+        logger.info("Batch client disconnected")
+    except Exception as e:
+        logger.error(f"Batch error: {e}")
+        yield orjson.dumps({"error": {"message": str(e), "type": "batch_error"}}) + b"\n"
+
+class _BatchResponse(StreamingResponse):
+    """Streams results while the request body is still being read.
+
+    StreamingResponse watches receive() for a disconnect on older ASGI servers,
+    which would swallow the body chunks the batch reader is waiting for. Here
+    the reader owns receive() until the body has been read; after that the
+    response watches it and, on a disconnect, cancels the batch."""
+
+    def __init__(self, content: AsyncIterator[bytes], request: Request, body_read: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.request = request
+        self.body_read = body_read
+
+    async def __call__(self, scope, receive, send) -> None:
+        streaming = asyncio.ensure_future(self.stream_response(send))
+        watcher = asyncio.ensure_future(self._wait_for_disconnect())
+        try:
+            await asyncio.wait((streaming, watcher), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+            if not streaming.done():
+                streaming.cancel()
+                await asyncio.wait((streaming,))
+        if streaming.cancelled():
+            REQUEST_CANCELLATIONS.inc("disconnect")
+            logger.info("Batch client disconnected; cancelled the remaining items")
+            return
+        streaming.result()
+        if self.background is not None:
+            await self.background()
+
+    async def _wait_for_disconnect(self) -> None:
+        await self.body_read.wait()
+        await _wait_for_disconnect(self.request)
+
+async def _sse_frames(chunks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encodes completion chunks as OpenAI-compatible server-sent events."""
+    try:
+        async for chunk in chunks:
+            yield b"data: " + orjson.dumps(chunk) + b"\n\n"
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected internal error occurred.")
+        # Headers are already sent, so report the failure in-band and close the stream
+        logger.error(f"Stream error: {e}")
+        error = {"error": {"message": str(e), "type": "provider_error"}}
+        yield b"data: " + orjson.dumps(error) + b"\n\n"
+    yield b"data: [DONE]\n\n"
 
 @router.get("/models", response_model=ModelListResponse)
 def list_models() -> ModelListResponse:
@@ -2,16 +2,36 @@ from fastapi import APIRouter, Depends
 from datetime import datetime
 
 from app.core.config import Settings, get_settings
-from app.core.schemas import HealthResponse
+from app.core.schemas import AdmissionStatsResponse, HealthResponse, PoolStatsResponse
+from app.providers.transport import get_transport_pool
+from app.providers.router import get_router
+from app.providers.scheduler import get_tenant_stats
 
 router = APIRouter(tags=["Health"])
 
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check(settings: Settings = Depends(get_settings)) -> HealthResponse:
+    providers = get_router().health()
+    # Any provider with an open circuit degrades the gateway, but it keeps serving
+    degraded = any(p["state"] != "closed" for p in providers.values())
     return HealthResponse(
-        status="healthy",
+        status="degraded" if degraded else "healthy",
         app_name=settings.app_name,
         version=settings.app_version,
-        timestamp=datetime.now()
+        timestamp=datetime.now(),
+        providers=providers
     )
+
+
+@router.get("/health/pools", response_model=PoolStatsResponse)
+async def pool_stats() -> PoolStatsResponse:
+    """Reports upstream connection pool usage per provider."""
+    return PoolStatsResponse(pools=get_transport_pool().stats())
+
+
+@router.get("/health/admission", response_model=AdmissionStatsResponse)
+async def admission_stats() -> AdmissionStatsResponse:
+    """Reports each provider's adaptive concurrency limit, load and queue depth,
+    and the tenants with the longest recent queue times."""
+    return AdmissionStatsResponse(providers=get_router().admission_stats(), tenants=get_tenant_stats().snapshot())
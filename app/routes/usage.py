@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.core.auth import verify_api_key
+from app.core.config import get_settings
+from app.core.ledger import get_ledger
+from app.core.schemas import KeyUsage, ModelUsage, UsageResponse, UsageTotals
+
+settings = get_settings()
+router = APIRouter(prefix="/v1", tags=["Usage"])
+
+TOTAL_FIELDS = ("requests", "cached_requests", "prompt_tokens", "completion_tokens", "total_tokens")
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(
+    start: Optional[str] = Query(default=None, description="First day, YYYY-MM-DD (UTC); default 30 days before end"),
+    end: Optional[str] = Query(default=None, description="Last day, YYYY-MM-DD (UTC); default today"),
+    scope: str = Query(default="self", description="'self' for the calling key, 'all' for every key (admin key only)"),
+    api_key: str = Depends(verify_api_key)
+) -> UsageResponse:
+    """Token usage per key and per model, from the durable usage ledger."""
+    if not settings.ledger_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usage reporting is disabled.")
+    if api_key is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="An API key is required to read usage.")
+    if scope not in ("self", "all"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="scope must be 'self' or 'all'.")
+    if scope == "all" and not (settings.usage_admin_key and api_key == settings.usage_admin_key):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the usage admin key may read every key's usage.")
+
+    try:
+        end_day = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start and end must be dates in YYYY-MM-DD format.")
+    if start_day > end_day:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end.")
+
+    rows = await get_ledger().totals(start_day.isoformat(), end_day.isoformat(), None if scope == "all" else api_key)
+
+    total = UsageTotals()
+    keys: Dict[str, KeyUsage] = {}
+    models: Dict[str, ModelUsage] = {}
+    for row in rows:
+        key = keys.get(row["key_id"])
+        if key is None:
+            key = keys[row["key_id"]] = KeyUsage(key=row["key"], key_id=row["key_id"])
+        model = models.get(row["model"])
+        if model is None:
+            model = models[row["model"]] = ModelUsage(model=row["model"])
+        key.models.append(ModelUsage(model=row["model"], **{field: row[field] for field in TOTAL_FIELDS}))
+        for totals in (total, key, model):
+            for field in TOTAL_FIELDS:
+                setattr(totals, field, getattr(totals, field) + row[field])
+
+    return UsageResponse(
+        start=start_day.isoformat(),
+        end=end_day.isoformat(),
+        total=total,
+        keys=_by_tokens(keys.values()),
+        models=_by_tokens(models.values())
+    )
+
+
+def _by_tokens(items) -> List:
+    return sorted(items, key=lambda item: item.total_tokens, reverse=True)
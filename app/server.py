@@ -0,0 +1,185 @@
+"""Production launcher for the gateway.
+
+    python -m app.server                        # one worker per CPU, Settings.server_*
+    python -m app.server --workers 4 --port 8000
+    python -m app.server --server uvicorn       # even if gunicorn is installed
+
+`app.main` stays the development entry point (single worker, autoreload).
+This runs under gunicorn with uvicorn workers when gunicorn is installed,
+otherwise under uvicorn's own process supervisor. Either way:
+
+- uvloop and httptools are used when installed, else asyncio and h11.
+- Workers are recycled after Settings.server_max_requests requests, and
+  restarted if they crash.
+- On SIGTERM a worker stops accepting connections and gives in-flight
+  requests and streams up to Settings.server_graceful_timeout seconds before
+  the lifespan shutdown closes the upstream pools.
+- With several workers, the rate limiter and /metrics are pointed at state
+  shared between them unless configured otherwise.
+
+gunicorn preloads the app before forking, so workers share its memory and a
+broken config fails once, in the master. uvicorn spawns fresh interpreters
+instead, so there the app is only imported up front to fail fast.
+"""
+import argparse
+import importlib
+import importlib.util
+import logging
+import logging.config
+import os
+import sys
+import tempfile
+from typing import Any, Dict
+
+from app.core.config import Settings, get_settings
+from app.core.limiter_backends import default_shm_path
+
+APP = "app.main:app"
+
+# Modules that may be imported before share_worker_state, as they do not read the settings at import
+SETTINGS_FREE_MODULES = {"app.core", "app.core.config", "app.core.limiter_backends", "app.server"}
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def default_workers() -> int:
+    """CPUs this process may run on, which respects container CPU sets."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def event_loop() -> str:
+    return "uvloop" if _installed("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if _installed("httptools") else "h11"
+
+
+def share_worker_state(settings: Settings, workers: int, port: int) -> Settings:
+    """With several workers, moves per-process state the app would otherwise
+    keep per worker into shared storage. This goes through the environment,
+    which workers inherit, so it must run before any module that keeps the
+    settings at import (all of app except SETTINGS_FREE_MODULES) is imported."""
+    if workers <= 1:
+        return settings
+    imported = sorted(name for name in sys.modules if name.startswith("app.") and name not in SETTINGS_FREE_MODULES)
+    if imported:
+        raise RuntimeError(f"share_worker_state must run before the app is imported; already imported: {', '.join(imported)}")
+    if settings.metrics_enabled and not settings.metrics_multiprocess_dir:
+        os.environ["METRICS_MULTIPROCESS_DIR"] = tempfile.mkdtemp(prefix="axon-metrics-")
+    backend = settings.limiter_backend
+    if backend == "memory":
+        if "LIMITER_BACKEND" in os.environ:
+            logger.warning(f"LIMITER_BACKEND=memory with {workers} workers: each worker enforces the limits on its own")
+        else:
+            backend = os.environ["LIMITER_BACKEND"] = "shm"
+            logger.info(f"Using the shared-memory rate limiter across {workers} workers")
+    if backend == "shm" and not settings.limiter_shm_path:
+        # One file per deployment, so others on this host keep their own counters
+        os.environ["LIMITER_SHM_PATH"] = default_shm_path(settings.app_name, port)
+    get_settings.cache_clear()
+    return get_settings()
+
+
+def uvicorn_options(settings: Settings) -> Dict[str, Any]:
+    return {
+        "loop": event_loop(),
+        "http": http_protocol(),
+        "lifespan": "on",
+        "backlog": settings.server_backlog,
+        "timeout_keep_alive": settings.server_keepalive,
+        "limit_concurrency": settings.server_limit_concurrency or None,
+        "timeout_graceful_shutdown": settings.server_graceful_timeout,
+        "access_log": settings.server_access_log,
+    }
+
+
+def run_uvicorn(settings: Settings, host: str, port: int, workers: int) -> None:
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+
+    importlib.import_module("app.main")
+    config = uvicorn.Config(
+        APP,
+        host=host,
+        port=port,
+        workers=workers,
+        limit_max_requests=settings.server_max_requests or None,
+        limit_max_requests_jitter=settings.server_max_requests_jitter,
+        **uvicorn_options(settings)
+    )
+    if workers == 1 and not config.limit_max_requests:
+        uvicorn.Server(config).run()
+        return
+    # The supervisor replaces recycled workers, so it runs even for one worker
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+
+
+def run_gunicorn(settings: Settings, host: str, port: int, workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = uvicorn_options(settings)
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": Worker,
+        "preload_app": True,
+        "backlog": settings.server_backlog,
+        "keepalive": settings.server_keepalive,
+        "max_requests": settings.server_max_requests,
+        "max_requests_jitter": settings.server_max_requests_jitter,
+        # Leave the worker time for its lifespan shutdown after the drain
+        "graceful_timeout": settings.server_graceful_timeout + 10,
+        "accesslog": "-" if settings.server_access_log else None,
+    }
+
+    class Launcher(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    Launcher().run()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Runs the gateway with production settings (Settings.server_*).")
+    parser.add_argument("--host", help="bind address (default: SERVER_HOST)")
+    parser.add_argument("--port", type=int, help="bind port (default: SERVER_PORT)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: SERVER_WORKERS, or one per CPU)")
+    parser.add_argument("--server", default="auto", choices=["auto", "uvicorn", "gunicorn"], help="process manager (default: gunicorn if installed)")
+    args = parser.parse_args(argv)
+
+    import uvicorn.config
+    logging.config.dictConfig(uvicorn.config.LOGGING_CONFIG)
+
+    settings = get_settings()
+    workers = args.workers or settings.server_workers or default_workers()
+    host = args.host or settings.server_host
+    port = args.port or settings.server_port
+    settings = share_worker_state(settings, workers, port)
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if _installed("gunicorn") else "uvicorn"
+    logger.info(f"Starting {settings.app_name} on {host}:{port} with {server}: {workers} workers, loop {event_loop()}, http {http_protocol()}")
+    if server == "gunicorn":
+        run_gunicorn(settings, host, port, workers)
+    else:
+        run_uvicorn(settings, host, port, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Microbenchmark for the rate limiter engine.
+
+Drives `RateLimiter.check_limits` + `update_usage` with a configurable number
+of distinct client IPs and reports checks per second and resident memory.
+
+    python -m benchmarks.bench_limiter --keys 1000000
+    python -m benchmarks.bench_limiter --backend shm --keys 200000 --json out.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to peak RSS off Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ip(i: int) -> str:
+    return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" if i < 2**24 else f"11.{i}"
+
+
+async def run(args) -> dict:
+    from app.core.limiter import RateLimiter
+    from app.core.limiter_backends import create_backend
+
+    backend = create_backend(args.backend, redis_url=args.redis_url, shm_path=args.shm_path,
+                             shm_slots=max(args.keys * 2, 1024), max_keys=args.max_keys)
+    limiter = RateLimiter(backend=backend)
+    keys = [ip(i) for i in range(args.keys)]
+    gc.collect()
+    baseline = rss_mb()
+
+    # Pass 1: every key is new
+    start = time.perf_counter()
+    for key in keys:
+        await limiter.check_limits(key, False, True)
+    insert_elapsed = time.perf_counter() - start
+    after_insert = rss_mb()
+
+    # Pass 2: every key already tracked, plus a usage update
+    start = time.perf_counter()
+    for key in keys:
+        await limiter.check_limits(key, False, True)
+        await limiter.update_usage(key, 10)
+    update_elapsed = time.perf_counter() - start
+
+    result = {
+        "backend": args.backend,
+        "keys": args.keys,
+        "tracked_keys": len(backend) if hasattr(backend, "__len__") else None,
+        "insert_checks_per_sec": round(args.keys / insert_elapsed),
+        "steady_check_and_update_per_sec": round(args.keys / update_elapsed),
+        "baseline_rss_mb": round(baseline, 1),
+        "rss_mb": round(rss_mb(), 1),
+        "bytes_per_key": round((after_insert - baseline) * 2**20 / args.keys),
+        "python": sys.version.split()[0],
+    }
+    await backend.aclose()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="memory", choices=["memory", "shm", "redis"])
+    parser.add_argument("--keys", type=int, default=1_000_000, help="distinct client IPs")
+    parser.add_argument("--max-keys", type=int, default=1_000_000, help="memory backend key cap")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--shm-path", default="/tmp/axon-limiter-bench")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    for name, value in result.items():
+        print(f"{name:>34}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
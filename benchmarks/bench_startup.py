@@ -0,0 +1,184 @@
+"""Cold-start benchmark for the gateway.
+
+Starts a fresh interpreter per run and times three phases in it: importing
+`app.main`, the lifespan startup, and the first `/v1/chat` request against
+`axon-mock` (over ASGI, no sockets), which pays for anything built lazily.
+It also records which heavy modules were already loaded after the import, so
+an eager import that sneaks back in shows up even when timings are noisy.
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --json benchmarks/results/startup.json
+
+    # fail if a phase got >15% slower or a deferred module is imported eagerly again
+    python -m benchmarks.bench_startup --compare benchmarks/results/startup.json
+
+    # the slowest modules by cumulative import time, from python -X importtime
+    python -m benchmarks.bench_startup --importtime 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+PHASES = ("import_ms", "startup_ms", "first_request_ms")
+
+# Modules app.main should not need until an upstream is called
+DEFERRED_MODULES = ("httpx", "httpcore", "h2", "openai")
+
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+eager = [name for name in %(deferred)r if name in sys.modules]
+
+async def first_request(app):
+    body = json.dumps({"model": "axon-mock", "messages": [{"role": "user", "content": "ping"}]}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/v1/chat", "raw_path": b"/v1/chat", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"cache-control", b"no-cache")],
+        "client": ("127.0.0.1", 1), "server": ("gateway", 80),
+    }
+    sent = []
+    async def receive():
+        if sent:
+            await asyncio.Event().wait()
+        sent.append(True)
+        return {"type": "http.request", "body": body, "more_body": False}
+    status = []
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+    await app(scope, receive, send)
+    return status[0]
+
+async def main():
+    gateway = app.main.app
+    async with gateway.router.lifespan_context(gateway):
+        started = time.perf_counter()
+        status = await first_request(gateway)
+        return started, status, time.perf_counter()
+
+started, status, answered = asyncio.run(main())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (started - imported) * 1000,
+    "first_request_ms": (answered - started) * 1000,
+    "status": status,
+    "eager_modules": eager,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def probe_once() -> Dict[str, Any]:
+    code = PROBE % {"deferred": DEFERRED_MODULES}
+    env = {**os.environ, "CACHE_ENABLED": "false"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def importtime(top: int) -> List[Dict[str, Any]]:
+    """The `top` modules by cumulative import time under `import app.main`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(values), 1),
+        "min": round(min(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    for _ in range(args.warmup):
+        probe_once()
+    samples = [probe_once() for _ in range(args.runs)]
+    bad = [s["status"] for s in samples if s["status"] != 200]
+    if bad:
+        raise RuntimeError(f"first request failed with status {bad[0]}")
+    phases = {phase: summarize([s[phase] for s in samples]) for phase in PHASES}
+    phases["total_ms"] = summarize([sum(s[phase] for phase in PHASES) for s in samples])
+    return {
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "phases": phases,
+        "eager_modules": sorted({name for s in samples for name in s["eager_modules"]}),
+        "modules": samples[-1]["modules"],
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Returns the regressions of `current` against `baseline` beyond threshold."""
+    regressions = []
+    for phase in PHASES + ("total_ms",):
+        before, after = baseline["phases"][phase]["median"], current["phases"][phase]["median"]
+        if before and after > before * (1 + threshold):
+            regressions.append(f"{phase} {before} -> {after}")
+    for name in sorted(set(current["eager_modules"]) - set(baseline["eager_modules"])):
+        regressions.append(f"'{name}' is now imported by app.main")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to time")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs first, to warm the OS file cache")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest modules to import")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+
+    result = run(args)
+    for phase, stats in result["phases"].items():
+        print(f"{phase:>18}: median {stats['median']:>7}  min {stats['min']:>7}  max {stats['max']:>7}")
+    print(f"{'eager_modules':>18}: {', '.join(result['eager_modules']) or 'none'}")
+    print(f"{'modules':>18}: {result['modules']}")
+    if args.importtime:
+        result["importtime"] = importtime(args.importtime)
+        for row in result["importtime"]:
+            print(f"{row['cumulative_ms']:>9.1f} ms  {row['self_ms']:>7.1f} ms self  {row['module']}")
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""End-to-end load test for the gateway.
+
+Replays a JSONL corpus of chat requests (one `ChatRequest` body per line)
+against `/v1/chat` and reports throughput, latency percentiles, error and 429
+counts. The gateway runs in-process (ASGI, no sockets), under uvicorn or the
+app.server launcher in a subprocess, or is an already running server given
+by URL. Upstream calls go to `axon-mock` or to a local stub upstream with
+configurable latency; with the stub, the same load is also replayed directly
+against it so the gateway's own overhead can be reported.
+
+    # closed loop: 32 concurrent clients for 20s, mock provider, in-process
+    python -m benchmarks.loadtest --concurrency 32 --duration 20
+
+    # open loop: 200 req/s of Poisson arrivals through uvicorn to a 50ms stub
+    python -m benchmarks.loadtest --target uvicorn --upstream stub --upstream-latency-ms 50 \\
+        --rate 200 --duration 30 --json results/loadtest.json
+
+    # fail if p99 or throughput regressed more than 10% against a stored run
+    python -m benchmarks.loadtest --compare results/loadtest.json --threshold 0.10
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+STUB_PROVIDERS = ("groq", "nvidia", "openrouter", "mistral")
+STUB_MODEL = "axon-llama-3-8b"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_corpus(path: Optional[str], size: int, model: str) -> List[Dict[str, Any]]:
+    """Reads request bodies from a JSONL file, or synthesizes distinct prompts.
+
+    Lines without a model use the one selected for the run."""
+    if path:
+        corpus = []
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    body = json.loads(line)
+                    body.setdefault("model", model)
+                    corpus.append(body)
+        return corpus
+    return [
+        {"model": model, "messages": [{"role": "user", "content": f"Summarize record {i} in one sentence."}]}
+        for i in range(size)
+    ]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    # Nearest-rank percentile over sorted values
+    index = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(samples: List[Tuple[float, int]], elapsed: float) -> Dict[str, Any]:
+    """samples are (latency_seconds, status), with status 0 for transport errors."""
+    latencies = sorted(latency * 1000 for latency, status in samples if status == 200)
+    return {
+        "requests": len(samples),
+        "ok": len(latencies),
+        "rate_limited": sum(1 for _, status in samples if status == 429),
+        "errors": sum(1 for _, status in samples if status not in (200, 429)),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            **{f"p{p}": _round(percentile(latencies, p)) for p in (50, 95, 99)},
+            "max": _round(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+async def send(client: httpx.AsyncClient, path: str, body: Dict[str, Any], headers: Dict[str, str]) -> int:
+    try:
+        response = await client.post(path, json=body, headers=headers)
+        await response.aread()
+        return response.status_code
+    except httpx.HTTPError:
+        return 0
+
+
+async def closed_loop(client, path, corpus, headers, concurrency, duration, total) -> Tuple[List[Tuple[float, int]], float]:
+    """Each of `concurrency` workers sends its next request as soon as the
+    previous one finishes."""
+    samples: List[Tuple[float, int]] = []
+    counter = iter(range(total)) if total else None
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def worker(offset: int) -> None:
+        i = offset
+        while True:
+            if counter is not None:
+                if next(counter, None) is None:
+                    return
+            elif time.perf_counter() >= deadline:
+                return
+            sent = time.perf_counter()
+            status = await send(client, path, corpus[i % len(corpus)], headers)
+            samples.append((time.perf_counter() - sent, status))
+            i += concurrency
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+async def open_loop(client, path, corpus, headers, rate, duration, total, poisson) -> Tuple[List[Tuple[float, int]], float]:
+    """Requests arrive on a fixed schedule regardless of how fast earlier ones
+    complete; latency is measured from the scheduled arrival so a stalled
+    gateway is not hidden by the load generator slowing down."""
+    samples: List[Tuple[float, int]] = []
+    count = total or int(rate * duration)
+    tasks = []
+    start = time.perf_counter()
+    scheduled = start
+
+    async def fire(body: Dict[str, Any], at: float) -> None:
+        status = await send(client, path, body, headers)
+        samples.append((time.perf_counter() - at, status))
+
+    for i in range(count):
+        scheduled += random.expovariate(rate) if poisson else 1 / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(corpus[i % len(corpus)], scheduled)))
+    await asyncio.gather(*tasks)
+    return samples, time.perf_counter() - start
+
+
+async def run_load(client: httpx.AsyncClient, path: str, corpus, headers, args) -> Dict[str, Any]:
+    if args.warmup:
+        await closed_loop(client, path, corpus, headers, min(args.concurrency, args.warmup), 0, args.warmup)
+    if args.rate:
+        samples, elapsed = await open_loop(client, path, corpus, headers, args.rate, args.duration, args.requests, args.poisson)
+    else:
+        samples, elapsed = await closed_loop(client, path, corpus, headers, args.concurrency, args.duration, args.requests)
+    return summarize(samples, elapsed)
+
+
+def spawn(module_args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *module_args], env=env, stdout=subprocess.DEVNULL)
+
+
+async def wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def gateway_env(args, stub_url: Optional[str]) -> Dict[str, str]:
+    """Environment for the gateway under test. Limits are lifted unless asked
+    to keep them, so the run measures the gateway rather than the tier caps."""
+    env = {"CACHE_ENABLED": "true" if args.cache else "false"}
+    if not args.keep_limits:
+        env.update(PREMIUM_RPM=str(10**9), PREMIUM_DAILY_TOKENS=str(10**12))
+    if stub_url:
+        for provider in STUB_PROVIDERS:
+            env[f"{provider.upper()}_BASE_URL"] = stub_url
+            env[f"{provider.upper()}_API_KEY"] = "bench"
+    return env
+
+
+@asynccontextmanager
+async def gateway(args, stub_url: Optional[str]) -> AsyncIterator[Tuple[httpx.AsyncClient, Optional[subprocess.Popen]]]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=max(args.concurrency, 100))
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.target == "inprocess":
+        os.environ.update(gateway_env(args, stub_url))
+        from app.main import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=timeout) as client:
+                yield client, None
+        return
+
+    process = None
+    if args.target in ("uvicorn", "server"):
+        port = free_port()
+        env = {**os.environ, **gateway_env(args, stub_url)}
+        if args.target == "uvicorn":
+            process = spawn(["uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"], env)
+        else:
+            process = spawn(["app.server", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)], env)
+        base_url = f"http://127.0.0.1:{port}"
+    else:
+        base_url = args.target.rstrip("/")
+    try:
+        await wait_ready(f"{base_url}/health", process)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            yield client, process
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    model = args.model or (STUB_MODEL if args.upstream == "stub" else "axon-mock")
+    corpus = load_corpus(args.corpus, args.corpus_size, model)
+    headers = {"Authorization": f"Bearer {args.api_key}"}
+    if not args.cache:
+        headers["Cache-Control"] = "no-cache"
+
+    stub = None
+    stub_url = None
+    if args.upstream == "stub":
+        port = free_port()
+        stub = spawn(["benchmarks.stub_upstream", "--port", str(port), "--latency-ms", str(args.upstream_latency_ms),
+                      "--jitter-ms", str(args.upstream_jitter_ms)], dict(os.environ))
+        stub_url = f"http://127.0.0.1:{port}/v1"
+
+    try:
+        upstream = None
+        if stub:
+            await wait_ready(f"{stub_url[:-3]}/health", stub)
+            # Same load shape straight at the stub, as the baseline for overhead
+            async with httpx.AsyncClient(base_url=stub_url, timeout=args.timeout,
+                                         limits=httpx.Limits(max_connections=None)) as client:
+                upstream = await run_load(client, "/chat/completions", corpus, {}, args)
+
+        async with gateway(args, stub_url) as (client, _):
+            result = await run_load(client, "/v1/chat", corpus, headers, args)
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+    overhead = None
+    if upstream is not None:
+        overhead = {
+            key: _round(result["latency_ms"][key] - upstream["latency_ms"][key])
+            if result["latency_ms"][key] is not None and upstream["latency_ms"][key] is not None else None
+            for key in ("p50", "p95", "p99")
+        }
+    elif args.upstream == "mock":
+        # The mock provider answers in-process, so all latency is gateway time
+        overhead = {key: result["latency_ms"][key] for key in ("p50", "p95", "p99")}
+
+    return {
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "config": {
+            "target": args.target if args.target in ("inprocess", "uvicorn", "server") else "url",
+            "workers": args.workers if args.target == "server" else None,
+            "upstream": args.upstream,
+            "upstream_latency_ms": args.upstream_latency_ms if args.upstream == "stub" else None,
+            "model": model,
+            "mode": "open" if args.rate else "closed",
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate or None,
+            "poisson": bool(args.rate and args.poisson),
+            "duration_s": None if args.requests else args.duration,
+            "requests": args.requests or None,
+            "corpus_size": len(corpus),
+            "cache": args.cache,
+        },
+        "gateway": result,
+        "upstream": upstream,
+        "overhead_ms": overhead,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Returns the regressions of `current` against `baseline` beyond threshold."""
+    regressions = []
+    old, new = baseline["gateway"], current["gateway"]
+    if old["throughput_rps"] and new["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+        regressions.append(f"throughput {old['throughput_rps']} -> {new['throughput_rps']} rps")
+    for key in ("p50", "p95", "p99"):
+        before, after = old["latency_ms"][key], new["latency_ms"][key]
+        if before and after and after > before * (1 + threshold):
+            regressions.append(f"{key} {before} -> {after} ms")
+    if new["errors"] > old["errors"]:
+        regressions.append(f"errors {old['errors']} -> {new['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="inprocess", help="'inprocess', 'uvicorn', 'server' (the app.server launcher) or the base URL of a running gateway")
+    parser.add_argument("--workers", type=int, default=0, help="workers for --target server (default: one per CPU)")
+    parser.add_argument("--upstream", default="mock", choices=["mock", "stub"])
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--model", help="model for corpus lines without one (default: axon-mock, or a groq alias with --upstream stub)")
+    parser.add_argument("--corpus", help="JSONL file of ChatRequest bodies (default: synthetic prompts)")
+    parser.add_argument("--corpus-size", type=int, default=1000, help="synthetic corpus size")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (overrides --concurrency)")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times in open-loop mode")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests instead of --duration")
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--api-key", default="axn_bench_premium")
+    parser.add_argument("--cache", action="store_true", help="let requests use the response cache")
+    parser.add_argument("--keep-limits", action="store_true", help="keep the configured tier limits")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Local stand-in for an OpenAI-compatible upstream.
+
+Serves `POST /v1/chat/completions` (plain and streamed) after a configurable
+delay, so gateway overhead can be measured without real provider calls.
+
+    python -m benchmarks.stub_upstream --port 8790 --latency-ms 50 --jitter-ms 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+RATELIMIT_HEADERS = {
+    "x-ratelimit-remaining-requests": "100000",
+    "x-ratelimit-remaining-tokens": "100000000",
+    "x-ratelimit-reset-requests": "1s",
+}
+
+
+def build_app(latency_ms: float = 0.0, jitter_ms: float = 0.0) -> Starlette:
+    async def chat_completions(request: Request):
+        body = await request.json()
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+
+        model = body.get("model", "stub")
+        content = "This is a benchmark response from the stub upstream."
+        usage = {"prompt_tokens": 16, "completion_tokens": 12, "total_tokens": 28}
+        created = int(time.time())
+
+        if body.get("stream"):
+            async def events():
+                for word in content.split(" "):
+                    chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                final = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream", headers=RATELIMIT_HEADERS)
+
+        return JSONResponse({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }, headers=RATELIMIT_HEADERS)
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/health", health),
+    ])
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args.latency_ms, args.jitter_ms), host=args.host, port=args.port,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.providers.admission import AdmissionController, ProviderOverloaded
+
+
+def controller(**options) -> AdmissionController:
+    defaults = dict(initial_limit=10, min_limit=2, max_limit=100, window=0.0, min_samples=1)
+    return AdmissionController("test", **{**defaults, **options})
+
+
+def complete(admission: AdmissionController, latency: float, busy: bool = True) -> None:
+    """One call that took `latency` seconds, with the upstream kept busy or not."""
+    admission.in_flight += 1
+    admission._window_peak = int(admission.limit) if busy else 1
+    admission.release(latency)
+
+
+def test_limit_grows_while_latency_holds():
+    admission = controller()
+    for _ in range(20):
+        complete(admission, 0.1)
+    assert admission.limit > 10
+
+
+def test_limit_does_not_grow_without_demand():
+    admission = controller()
+    for _ in range(20):
+        complete(admission, 0.1, busy=False)
+    assert admission.limit == 10
+
+
+def test_limit_shrinks_when_latency_climbs():
+    admission = controller()
+    for _ in range(5):
+        complete(admission, 0.1)
+    grown = admission.limit
+    # Ten times the baseline; the baseline catches up over long_windows windows
+    for _ in range(3):
+        complete(admission, 1.0)
+    assert admission.limit < grown
+
+
+def test_overload_backs_off_once_per_window():
+    admission = controller(window=60.0)
+    for _ in range(3):
+        admission.in_flight += 1
+        admission.release(overloaded=True)
+    assert admission.limit == pytest.approx(10 * admission.backoff)
+
+
+def test_limit_stays_within_bounds():
+    admission = controller(window=0.0, min_limit=4)
+    for _ in range(50):
+        admission._backoff_until = 0.0
+        admission.in_flight += 1
+        admission.release(overloaded=True)
+    assert admission.limit == 4
+
+
+def test_release_hands_the_slot_to_a_waiter():
+    async def scenario():
+        admission = controller(initial_limit=1, min_limit=1, queue_timeout=5.0)
+        await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        assert admission.queued == 1
+        admission.release(0.1)
+        await waiting
+        return admission.in_flight, admission.queued
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_full_queue_sheds_with_retry_after():
+    async def scenario():
+        admission = controller(initial_limit=1, min_limit=1, max_queue=1, queue_timeout=5.0)
+        await admission.acquire(tenant="a")
+        waiting = asyncio.create_task(admission.acquire(tenant="a"))
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderOverloaded) as raised:
+            await admission.acquire(tenant="a")
+        admission.release()
+        await waiting
+        admission.release()
+        return raised.value, admission.shed
+
+    error, shed = asyncio.run(scenario())
+    assert error.status_code == 503 and int(error.headers["Retry-After"]) >= 1
+    assert shed == 1
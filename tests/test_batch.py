@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from app.main import app
+from app.routes import chat
+
+
+def batch_scope(client: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/v1/chat/batch", "raw_path": b"/v1/chat/batch",
+        "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/x-ndjson")],
+        "client": (client, 40000), "server": ("testserver", 80),
+    }
+
+
+def test_disconnect_after_the_body_cancels_running_items(monkeypatch):
+    started, cancelled = [], []
+
+    async def route_chat(request_data, *args, **kwargs):
+        started.append(request_data.messages[0].content)
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(request_data.messages[0].content)
+            raise
+
+    monkeypatch.setattr(chat.provider_router, "route_chat", route_chat)
+    lines = [json.dumps({"model": "axon-mock", "messages": [{"role": "user", "content": f"item {i}"}]}).encode() for i in range(3)]
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"\n".join(lines), "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        call = asyncio.create_task(app(batch_scope("10.0.0.12"), receive, send))
+        while len(started) < 3:
+            await asyncio.sleep(0.01)
+        disconnected.set()
+        await asyncio.wait_for(call, 5)
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sorted(cancelled) == ["item 0", "item 1", "item 2"]
+    assert sent[0]["status"] == 200
+    assert all(not message.get("body") for message in sent[1:])
+
+
+def test_batch_items_are_rate_limited_each(monkeypatch):
+    monkeypatch.setitem(chat.limiter.tier_limits, "guest", (2, 1_000_000))
+    body = b"\n".join(json.dumps({"model": "axon-mock", "messages": [{"role": "user", "content": "hi"}]}).encode() for _ in range(4))
+
+    async def scenario():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(60)
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.wait_for(app(batch_scope("10.0.0.13"), receive, send), 5)
+        return b"".join(message.get("body", b"") for message in sent)
+
+    results = [json.loads(line) for line in asyncio.run(scenario()).splitlines()]
+    # Two items fit the tier's requests per minute; the rest are answered inline with 429
+    assert sum("response" in result for result in results) == 2
+    assert [result["error"]["status"] for result in results if "error" in result] == [429, 429]
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.context import RouteContext
+from app.core.schemas import ChatRequest, Message
+from app.providers.base import LazyProviders, ProviderError, UpstreamError
+from app.providers.health import CircuitOpenError
+from app.providers.mock import MockProvider
+from app.providers.router import PreparedRequest, ProviderRouter, settings
+from app.routes.chat import _http_error
+
+
+class FailingProvider(MockProvider):
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.calls = 0
+
+    async def achat_completion(self, request, model_name=None, messages=None):
+        self.calls += 1
+        raise ProviderError(f"upstream said {self.status_code}", status_code=self.status_code)
+
+
+def make_router(**providers) -> ProviderRouter:
+    router = ProviderRouter()
+    router.providers = LazyProviders({name: (lambda p=provider: p) for name, provider in providers.items()})
+    return router
+
+
+def prepared() -> PreparedRequest:
+    prepared = PreparedRequest(ChatRequest(model="axon-mock", messages=[Message(role="user", content="failover")]))
+    prepared.messages = [{"role": "user", "content": "failover"}]
+    return prepared
+
+
+def chain(*providers):
+    return [(f"alias-{name}", {"provider": name, "internal_model": f"model-{name}"}) for name in providers]
+
+
+def context() -> RouteContext:
+    return RouteContext(use_cache=False, deadline=time.monotonic() + 5)
+
+
+def test_retryable_failure_fails_over_to_the_next_backend():
+    primary = FailingProvider(503)
+    router = make_router(mock=primary, groq=MockProvider())
+    response, backend = asyncio.run(router._complete_with_failover(prepared(), chain("mock", "groq"), context()))
+    assert backend == "groq/model-groq"
+    assert primary.calls == 1 and response.choices
+
+
+def test_rejected_request_does_not_fail_over():
+    fallback = FailingProvider(503)
+    router = make_router(mock=FailingProvider(400), groq=fallback)
+    with pytest.raises(ProviderError):
+        asyncio.run(router._complete_with_failover(prepared(), chain("mock", "groq"), context()))
+    assert fallback.calls == 0
+
+
+def test_open_circuit_is_skipped_for_the_fallback():
+    router = make_router(mock=MockProvider(), groq=MockProvider())
+    router.breakers["mock"]._open()
+    _, backend = asyncio.run(router._complete_with_failover(prepared(), chain("mock", "groq"), context()))
+    assert backend == "groq/model-groq"
+
+
+@pytest.mark.parametrize("upstream_status, client_status", [(500, 502), (429, 502), (401, 502), (400, 400)])
+def test_exhausted_chain_maps_to_an_upstream_status(upstream_status, client_status):
+    router = make_router(mock=FailingProvider(upstream_status))
+    request = ChatRequest(model="axon-mock", messages=[Message(role="user", content=f"exhausted {upstream_status}")])
+    with pytest.raises(UpstreamError) as raised:
+        asyncio.run(router.route_chat(request, "failover-client", False, False, context()))
+    assert _http_error(raised.value).status_code == client_status
+
+
+def test_open_circuit_maps_to_503_with_retry_after():
+    router = make_router(mock=MockProvider())
+    router.breakers["mock"]._open()
+    request = ChatRequest(model="axon-mock", messages=[Message(role="user", content="circuit open")])
+    with pytest.raises(CircuitOpenError) as raised:
+        asyncio.run(router.route_chat(request, "failover-client", False, False, context()))
+    error = _http_error(raised.value)
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) == pytest.approx(settings.breaker_open_seconds, abs=1)
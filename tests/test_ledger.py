@@ -0,0 +1,148 @@
+import asyncio
+import sqlite3
+import time
+
+from app.core.ledger import UsageLedger
+
+TODAY = time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def ledger(tmp_path, **options) -> UsageLedger:
+    return UsageLedger(str(tmp_path / "usage.db"), **options)
+
+
+def by_model(rows):
+    return {(row["key"], row["model"]): (row["requests"], row["total_tokens"]) for row in rows}
+
+
+def test_usage_survives_a_restart(tmp_path):
+    async def scenario():
+        first = ledger(tmp_path)
+        first.record("sk-alpha-1111", "axon-mock", 10, 5, 15)
+        first.record("sk-alpha-1111", "axon-mock", 20, 5, 25, cached=True)
+        first.record("sk-beta-2222", "axon-gpt-4o", 1, 1, 2)
+        await first.aclose()
+        second = ledger(tmp_path)
+        rows = await second.totals(TODAY, TODAY)
+        await second.aclose()
+        return rows
+
+    rows = asyncio.run(scenario())
+    assert by_model(rows) == {("...1111", "axon-mock"): (2, 40), ("...2222", "axon-gpt-4o"): (1, 2)}
+    assert next(row for row in rows if row["key"] == "...1111")["cached_requests"] == 1
+
+
+def test_totals_can_be_limited_to_one_key(tmp_path):
+    async def scenario():
+        usage = ledger(tmp_path)
+        usage.record("sk-alpha-1111", "axon-mock", 1, 1, 2)
+        usage.record("sk-beta-2222", "axon-mock", 1, 1, 2)
+        rows = await usage.totals(TODAY, TODAY, "sk-alpha-1111")
+        await usage.aclose()
+        return rows
+
+    assert by_model(asyncio.run(scenario())) == {("...1111", "axon-mock"): (1, 2)}
+
+
+def test_compaction_is_idempotent_and_keeps_totals(tmp_path):
+    async def scenario():
+        usage = ledger(tmp_path, retention_days=0)
+        for _ in range(3):
+            usage.record("sk-alpha-1111", "axon-mock", 1, 1, 2)
+        await usage.flush()
+        before = await usage.totals(TODAY, TODAY)
+        await usage.compact()
+        await usage.compact()
+        # New events after a compaction are added on top, not double counted
+        usage.record("sk-alpha-1111", "axon-mock", 1, 1, 2)
+        after = await usage.totals(TODAY, TODAY)
+        await usage.compact()
+        compacted = await usage.totals(TODAY, TODAY)
+        await usage.aclose()
+        return before, after, compacted
+
+    before, after, compacted = asyncio.run(scenario())
+    assert by_model(before) == {("...1111", "axon-mock"): (3, 6)}
+    assert by_model(after) == by_model(compacted) == {("...1111", "axon-mock"): (4, 8)}
+    # With zero retention, every rolled-up event was purged from the log
+    with sqlite3.connect(tmp_path / "usage.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0] == 0
+
+
+def test_client_keys_are_never_stored(tmp_path):
+    async def scenario():
+        usage = ledger(tmp_path)
+        usage.record("sk-secret-value-9999", "axon-mock", 1, 1, 2)
+        await usage.flush()
+        await usage.compact()
+        await usage.aclose()
+
+    asyncio.run(scenario())
+    raw = (tmp_path / "usage.db").read_bytes()
+    assert b"sk-secret-value" not in raw
+
+
+def test_buffer_is_bounded_and_kept_across_failed_writes(tmp_path):
+    async def scenario():
+        usage = ledger(tmp_path, max_pending=2)
+        for _ in range(3):
+            usage.record("sk-alpha-1111", "axon-mock", 1, 1, 2)
+        assert usage.dropped == 1
+        # A directory where the database file should be makes the write fail
+        usage.path = str(tmp_path)
+        await usage.flush()
+        kept = len(usage._pending)
+        usage.path = str(tmp_path / "usage.db")
+        await usage.flush()
+        rows = await usage.totals(TODAY, TODAY)
+        await usage.aclose()
+        return kept, rows
+
+    kept, rows = asyncio.run(scenario())
+    assert kept == 2
+    assert by_model(rows) == {("...1111", "axon-mock"): (2, 4)}
+
+
+def test_writer_loop_flushes_in_the_background(tmp_path):
+    async def scenario():
+        usage = ledger(tmp_path, flush_interval=0.01)
+        writer = asyncio.create_task(usage.run())
+        usage.record("sk-alpha-1111", "axon-mock", 1, 1, 2)
+        await asyncio.sleep(0.1)
+        pending = len(usage._pending)
+        writer.cancel()
+        await usage.aclose()
+        return pending
+
+    assert asyncio.run(scenario()) == 0
+    with sqlite3.connect(tmp_path / "usage.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0] == 1
+
+
+def test_usage_endpoint_access(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routes import usage as usage_route
+
+    usage = ledger(tmp_path)
+    usage.record("sk-alpha-1111", "axon-mock", 1, 1, 2)
+    usage.record("sk-beta-2222", "axon-mock", 3, 3, 6)
+    monkeypatch.setattr(usage_route, "get_ledger", lambda: usage)
+    monkeypatch.setattr(usage_route.settings, "usage_admin_key", "sk-admin-0000")
+    app = FastAPI()
+    app.include_router(usage_route.router)
+    client = TestClient(app)
+
+    def get(key=None, **params):
+        headers = {"Authorization": f"Bearer {key}"} if key else {}
+        return client.get("/v1/usage", params=params, headers=headers)
+
+    assert get().status_code == 401
+    assert get("sk-alpha-1111", scope="all").status_code == 403
+    assert get("sk-alpha-1111", start="yesterday").status_code == 400
+    own = get("sk-alpha-1111").json()
+    assert own["total"]["total_tokens"] == 2 and len(own["keys"]) == 1
+    everyone = get("sk-admin-0000", scope="all").json()
+    assert everyone["total"]["total_tokens"] == 8 and len(everyone["keys"]) == 2
+    asyncio.run(usage.aclose())
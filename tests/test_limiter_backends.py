@@ -0,0 +1,108 @@
+import asyncio
+import fcntl
+import os
+
+import pytest
+
+from app.core.limiter_backends import RedisBackend, SharedMemoryBackend
+
+DAY = "2026-10-18"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def redis_backends(monkeypatch):
+    """Two backends on one fake server, like two workers sharing Redis."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr("redis.asyncio.from_url", lambda url: fakeredis.FakeAsyncRedis(server=server))
+    return RedisBackend("redis://fake"), RedisBackend("redis://fake")
+
+
+def test_redis_check_counts_across_workers(redis_backends):
+    first, second = redis_backends
+
+    async def scenario():
+        results = []
+        for i in range(6):
+            backend = first if i % 2 else second
+            results.append(await backend.check("client", 4, 60.0, DAY))
+        return results
+
+    results = run(scenario())
+    assert [allowed for allowed, _ in results] == [True] * 4 + [False] * 2
+    assert all(tokens == 0 for _, tokens in results)
+
+
+def test_redis_check_reports_usage_and_reserve_respects_limit(redis_backends):
+    backend, other = redis_backends
+
+    async def scenario():
+        assert await backend.reserve_usage("client", DAY, 60, 100)
+        assert not await other.reserve_usage("client", DAY, 50, 100)
+        assert await other.add_usage("client", DAY, -10) == 50
+        allowed, tokens = await backend.check("client", 10, 60.0, DAY)
+        return allowed, tokens, await backend.get_usage("client", "2026-10-19")
+
+    assert run(scenario()) == (True, 50, 0)
+
+
+def test_redis_script_keys_share_one_cluster_slot(redis_backends, monkeypatch):
+    backend, _ = redis_backends
+    seen = {}
+    script = backend._check
+
+    async def recording(keys, args):
+        seen["keys"] = keys
+        return await script(keys=keys, args=args)
+
+    monkeypatch.setattr(backend, "_check", recording)
+    run(backend.check("client", 10, 60.0, DAY))
+    assert len(seen["keys"]) == 3
+    assert all("{client}" in key for key in seen["keys"])
+
+
+def test_shared_memory_backend_is_shared_between_mappings(tmp_path):
+    path = str(tmp_path / "limiter")
+    first, second = SharedMemoryBackend(path, 64), SharedMemoryBackend(path, 64)
+
+    async def scenario():
+        allowed = [await (first if i % 2 else second).hit("client", 3, 60.0) for i in range(5)]
+        await first.add_usage("client", DAY, 7)
+        usage = await second.get_usage("client", DAY)
+        await first.aclose()
+        await second.aclose()
+        return allowed, usage
+
+    assert run(scenario()) == ([True, True, True, False, False], 7)
+
+
+def test_shared_memory_backend_created_before_fork_locks_per_process(tmp_path):
+    # As under gunicorn's preload_app: the master creates the backend, then forks
+    backend = SharedMemoryBackend(str(tmp_path / "limiter"), 64)
+    locked_r, locked_w = os.pipe()
+    release_r, release_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            def hold(record):
+                os.write(locked_w, b"1")
+                os.read(release_r, 1)
+                return None, record
+            backend._update("client", hold)
+            run(backend.add_usage("client", DAY, 5))
+        finally:
+            os._exit(0)
+    try:
+        os.read(locked_r, 1)
+        # The child holds the lock; the parent must not get it through a shared file description
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(backend._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        os.write(release_w, b"1")
+        os.waitpid(pid, 0)
+    assert run(backend.add_usage("client", DAY, 2)) == 7
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.core.metrics import MetricsRegistry, merge
+
+
+def registry(directory) -> MetricsRegistry:
+    metrics = MetricsRegistry(multiprocess_dir=str(directory))
+    metrics.counter("requests_total", "Requests.", ("route",))
+    metrics.gauge("in_flight", "In flight.")
+    return metrics
+
+
+def totals(metrics: MetricsRegistry):
+    merged = merge(metrics.collect())
+    return merged["requests_total"]["samples"], merged.get("in_flight", {}).get("samples", {})
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_exited_worker_files_are_folded_into_one(tmp_path):
+    worker = registry(tmp_path)
+    worker._metrics["requests_total"].inc("/v1/chat", amount=3)
+    # A worker that crashed after its last flush
+    crashed = registry(tmp_path)
+    crashed._metrics["requests_total"].inc("/v1/chat", amount=4)
+    crashed._metrics["in_flight"].set(2)
+    with open(tmp_path / f"metrics-{dead_pid()}.json", "w") as f:
+        json.dump(crashed.snapshot(), f)
+
+    counters, gauges = totals(worker)
+    assert counters[("/v1/chat",)] == 7
+    # The crashed worker's gauges are gone with it
+    assert gauges == {}
+    assert sorted(os.listdir(tmp_path)) == ["metrics-%d.json" % os.getpid(), "metrics.lock", "retired.json"]
+    # A second scrape does not count the retired totals twice
+    assert totals(worker)[0][("/v1/chat",)] == 7
+
+
+def test_retired_worker_counters_survive_it(tmp_path):
+    # Both live in this process, one after the other, like a recycled worker
+    first, second = registry(tmp_path), registry(tmp_path)
+    first._metrics["requests_total"].inc("/v1/chat", amount=5)
+    first.flush()
+    first.retire()
+    assert not (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+    second._metrics["requests_total"].inc("/v1/chat", amount=2)
+    assert totals(second)[0][("/v1/chat",)] == 7
@@ -0,0 +1,19 @@
+import orjson
+import pytest
+
+from app.core.schemas import ChatRequest, Message
+from app.providers.openai_compat import UPSTREAMS, provider_factories
+
+
+@pytest.mark.parametrize("name", sorted(UPSTREAMS))
+def test_stream_options_follow_the_upstream_flag(name):
+    provider = provider_factories()[name]()
+    request = ChatRequest(model="axon-mock", messages=[Message(role="user", content="hi")])
+    body = orjson.loads(provider._body(request, "model", None, stream=True))
+    assert body["stream"] is True
+    assert ("stream_options" in body) == UPSTREAMS[name].get("stream_usage", True)
+    assert "stream_options" not in orjson.loads(provider._body(request, "model", None))
+
+
+def test_mistral_streams_without_stream_options():
+    assert UPSTREAMS["mistral"]["stream_usage"] is False
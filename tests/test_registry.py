@@ -0,0 +1,116 @@
+import difflib
+import json
+
+import pytest
+
+from app.models import registry
+from app.models.registry import RegistryError, compile_registry, get_registry, reload_registry
+
+MODELS = {
+    "axon-small": {"provider": "mock", "internal_model": "small", "fallbacks": ["axon-small-groq"]},
+    "axon-small-groq": {"provider": "groq", "internal_model": "small", "required_key": "groq_api_key"},
+    "axon-big": {"provider": "mock", "internal_model": "big", "large": True},
+    "axon-pro": {"provider": "mock", "internal_model": "pro", "large": True, "premium": True},
+}
+
+
+def shipped_registry():
+    with open(registry.DEFAULT_REGISTRY_PATH) as f:
+        return compile_registry(json.load(f))
+
+
+def test_tiers_and_availability_are_precomputed(monkeypatch):
+    monkeypatch.setattr(registry.settings, "groq_api_key", "")
+    monkeypatch.setattr(registry.settings, "groq_api_keys", "")
+    snapshot = compile_registry({"models": MODELS})
+    assert snapshot.tiers["guest"] == {"axon-small", "axon-small-groq"}
+    assert snapshot.tiers["test"] == {"axon-small", "axon-small-groq", "axon-big"}
+    assert snapshot.tiers["premium"] == set(MODELS)
+    assert snapshot.allows("axon-big", "test") and not snapshot.allows("axon-pro", "test")
+    assert snapshot.available == {"axon-small", "axon-big", "axon-pro"}
+    assert snapshot.by_provider["groq"] == ("axon-small-groq",)
+    assert snapshot.default_model == "axon-small"
+    assert snapshot.get("axon-small")["fallbacks"] == ("axon-small-groq",)
+
+    monkeypatch.setattr(registry.settings, "groq_api_key", "gsk-0000")
+    assert "axon-small-groq" in compile_registry({"models": MODELS}).available
+
+
+def test_entries_are_read_only():
+    snapshot = compile_registry({"models": MODELS})
+    with pytest.raises(TypeError):
+        snapshot.get("axon-small")["provider"] = "groq"
+
+
+@pytest.mark.parametrize("data, message", [
+    ([], "must be a JSON object"),
+    ({"models": {}}, "non-empty 'models'"),
+    ({"models": {"a": {"provider": "mock"}}}, "needs a 'provider' and an 'internal_model'"),
+    ({"models": {"a": {"provider": "mock", "internal_model": "a", "fallbacks": "b"}}}, "invalid 'fallbacks'"),
+    ({"models": {"a": {"provider": "mock", "internal_model": "a", "fallbacks": [["b"]]}}}, "unknown alias"),
+    ({"models": {"a": {"provider": "mock", "internal_model": "a", "fallbacks": ["b"]}}}, "unknown alias 'b'"),
+    ({"models": {"a": {"provider": "mock", "internal_model": "a"}}, "default_model": ["a"]}, "is not defined"),
+])
+def test_malformed_registries_are_rejected(data, message):
+    with pytest.raises(RegistryError, match=message):
+        compile_registry(data)
+
+
+def test_failed_reload_keeps_the_current_snapshot(tmp_path, monkeypatch):
+    current = get_registry()
+    path = tmp_path / "models.json"
+    monkeypatch.setattr(registry.settings, "model_registry_path", str(path))
+    for content in ("[]", "{\"models\": ", json.dumps({"models": {"a": {"provider": "mock", "internal_model": "a", "fallbacks": "b"}}})):
+        path.write_text(content)
+        assert reload_registry() is False
+        assert get_registry() is current
+    path.unlink()
+    assert reload_registry() is False
+    assert get_registry() is current
+
+
+def test_reload_swaps_the_snapshot(tmp_path, monkeypatch):
+    current = get_registry()
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps({"models": MODELS}))
+    try:
+        monkeypatch.setattr(registry.settings, "model_registry_path", str(path))
+        assert reload_registry() is True
+        assert get_registry().aliases == tuple(MODELS)
+    finally:
+        registry._snapshot = current
+
+
+def test_suggestions_match_difflib_over_every_alias():
+    # The trigram pre-filter only narrows what difflib compares against; for
+    # single-character typos of the shipped aliases the answer is unchanged
+    snapshot = shipped_registry()
+    aliases = list(snapshot.aliases)
+    for alias in aliases:
+        for i in range(len(alias)):
+            for typo in (alias[:i] + alias[i + 1:], alias[:i] + "x" + alias[i + 1:], alias[:i] + alias[i + 1:i + 2] + alias[i:i + 1] + alias[i + 2:]):
+                expected = difflib.get_close_matches(typo, aliases, n=1, cutoff=registry.SUGGESTION_CUTOFF)
+                assert snapshot.suggest(typo) == (expected[0] if expected else None), typo
+    for name in ("gpt-4o", "claude", "mistral", "llama"):
+        expected = difflib.get_close_matches(name, aliases, n=1, cutoff=registry.SUGGESTION_CUTOFF)
+        assert snapshot.suggest(name) == expected[0]
+
+
+def test_inputs_sharing_only_the_common_prefix_get_no_suggestion():
+    snapshot = shipped_registry()
+    # difflib over every alias would offer axon-mock here
+    assert difflib.get_close_matches("axon-foo", list(snapshot.aliases), n=1, cutoff=registry.SUGGESTION_CUTOFF)
+    assert snapshot.suggest("axon-foo") is None
+    assert snapshot.suggest("x" * (registry.MAX_ALIAS_LENGTH + 1)) is None
+
+
+def test_suggestion_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(registry, "SUGGESTION_MEMO_SIZE", 3)
+    snapshot = compile_registry({"models": MODELS})
+    for name in ("axon-smal", "axon-bg", "axon-pr", "axon-smalll"):
+        snapshot.suggest(name)
+    assert list(snapshot._suggestions) == ["axon-bg", "axon-pr", "axon-smalll"]
+    # A hit moves the entry to the back, so the next miss evicts the oldest other one
+    assert snapshot.suggest("axon-bg") == "axon-big"
+    snapshot.suggest("axon-prr")
+    assert list(snapshot._suggestions) == ["axon-smalll", "axon-bg", "axon-prr"]
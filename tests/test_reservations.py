@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.core.context import RouteContext
+from app.core.limiter import RateLimiter, UsageLimitExceeded
+from app.core.limiter_backends import MemoryBackend
+from app.core.schemas import ChatRequest, Message
+from app.providers import router as router_module
+from app.providers.base import LazyProviders, ProviderError
+from app.providers.mock import MockProvider
+from app.providers.router import ProviderRouter
+
+
+def limiter_with(daily_tokens: int) -> RateLimiter:
+    limiter = RateLimiter(MemoryBackend())
+    limiter.tier_limits = {tier: (1000, daily_tokens) for tier in ("guest", "test", "premium")}
+    return limiter
+
+
+def usage(limiter: RateLimiter, key: str) -> int:
+    return asyncio.run(limiter.backend.get_usage(key, limiter.get_current_date()))
+
+
+def test_concurrent_reservations_cannot_overshoot_the_budget():
+    limiter = limiter_with(1000)
+
+    async def reserve():
+        try:
+            return await limiter.reserve("client", False, False, 300)
+        except UsageLimitExceeded:
+            return None
+
+    async def scenario():
+        return await asyncio.gather(*(reserve() for _ in range(5)))
+
+    granted = [r for r in asyncio.run(scenario()) if r is not None]
+    assert len(granted) == 3
+    assert usage(limiter, "client") == 900
+
+
+def test_settle_replaces_the_estimate_and_refund_releases_it():
+    limiter = limiter_with(1000)
+
+    async def scenario():
+        settled = await limiter.reserve("client", False, False, 300)
+        refunded = await limiter.reserve("client", False, False, 300)
+        await limiter.settle(settled, 120)
+        await limiter.refund(refunded)
+        # Settling twice is a no-op
+        await limiter.settle(settled, 999)
+        await limiter.refund(settled)
+
+    asyncio.run(scenario())
+    assert usage(limiter, "client") == 120
+
+
+class FailingProvider(MockProvider):
+    async def achat_completion(self, request, model_name=None, messages=None):
+        raise ProviderError("upstream down", status_code=500)
+
+
+class HangingProvider(MockProvider):
+    async def achat_completion(self, request, model_name=None, messages=None):
+        await asyncio.sleep(10)
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    limiter = limiter_with(100_000)
+    monkeypatch.setattr(router_module, "limiter", limiter)
+
+    def make(provider):
+        router = ProviderRouter()
+        router.providers = LazyProviders({"mock": lambda: provider})
+        return router
+
+    return limiter, make
+
+
+def chat(router, key):
+    request = ChatRequest(model="axon-mock", messages=[Message(role="user", content=f"reserve for {key}")])
+    return router.route_chat(request, key, False, False, RouteContext(use_cache=False))
+
+
+def test_successful_request_is_charged_actual_usage(routed):
+    limiter, make = routed
+    response = asyncio.run(chat(make(MockProvider()), "ok-client"))
+    assert usage(limiter, "ok-client") == response.usage.total_tokens
+
+
+def test_failed_request_is_refunded(routed):
+    limiter, make = routed
+    with pytest.raises(ProviderError):
+        asyncio.run(chat(make(FailingProvider()), "failed-client"))
+    assert usage(limiter, "failed-client") == 0
+
+
+def test_cancelled_request_is_refunded(routed):
+    limiter, make = routed
+
+    async def scenario():
+        task = asyncio.create_task(chat(make(HangingProvider()), "cancelled-client"))
+        await asyncio.sleep(0.02)
+        assert await limiter.backend.get_usage("cancelled-client", limiter.get_current_date()) > 0
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert usage(limiter, "cancelled-client") == 0
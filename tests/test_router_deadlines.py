@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.context import DeadlineExceeded, RouteContext
+from app.core.schemas import ChatRequest, Message
+from app.providers.base import LazyProviders
+from app.providers.health import CLOSED
+from app.providers.mock import MockProvider
+from app.providers.router import ProviderRouter, settings
+
+
+class SlowProvider(MockProvider):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def achat_completion(self, request, model_name=None, messages=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return await super().achat_completion(request, model_name=model_name, messages=messages)
+
+
+@pytest.fixture
+def slow_router(monkeypatch):
+    monkeypatch.setattr(settings, "coalesce_enabled", True)
+    router = ProviderRouter()
+    provider = SlowProvider(0.3)
+    router.providers = LazyProviders({"mock": lambda: provider})
+    return router, provider
+
+
+def request(content: str = "deadline test") -> ChatRequest:
+    return ChatRequest(model="axon-mock", messages=[Message(role="user", content=content)])
+
+
+def context(timeout: float = 0.0) -> RouteContext:
+    return RouteContext(use_cache=False, deadline=time.monotonic() + timeout if timeout else None)
+
+
+def test_client_deadline_timeouts_do_not_open_the_circuit(slow_router):
+    router, _ = slow_router
+
+    async def scenario():
+        for i in range(settings.breaker_failure_threshold + 1):
+            with pytest.raises(DeadlineExceeded):
+                await router.route_chat(request(f"short {i}"), "client-short", False, False, context(0.05))
+        return await router.route_chat(request("normal"), "client-normal", False, False, context())
+
+    response = asyncio.run(scenario())
+    breaker = router.breakers["mock"]
+    assert response.choices[0].message.content
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_provider_timeout_still_counts_against_the_circuit(slow_router, monkeypatch):
+    router, provider = slow_router
+    monkeypatch.setattr(settings, "failover_attempt_timeout", 0.05)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await router._attempt("mock", "axon-mock", lambda: provider.achat_completion(request()), 0.05)
+
+    asyncio.run(scenario())
+    assert router.breakers["mock"].failures == 1
+
+
+def test_follower_outlives_a_leader_that_runs_out_of_time(slow_router):
+    router, provider = slow_router
+
+    async def scenario():
+        leader = asyncio.create_task(router.route_chat(request(), "leader", False, False, context(0.1)))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(router.route_chat(request(), "follower", False, False, context()))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(scenario())
+    assert isinstance(leader, DeadlineExceeded)
+    # The follower ran the call again as the new leader
+    assert follower.choices[0].message.content
+    assert provider.calls == 2
+
+
+def test_follower_keeps_its_own_deadline(slow_router):
+    router, provider = slow_router
+
+    async def scenario():
+        leader = asyncio.create_task(router.route_chat(request(), "leader", False, False, context()))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await router.route_chat(request(), "follower", False, False, context(0.1))
+        waited = time.monotonic() - started
+        return waited, await leader
+
+    waited, leader = asyncio.run(scenario())
+    assert waited < 0.25
+    assert leader.choices[0].message.content
+    assert provider.calls == 1
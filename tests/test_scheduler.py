@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from app.providers.admission import AdmissionController, ProviderOverloaded
+from app.providers.scheduler import FairQueue
+
+WEIGHTS = {"guest": 1.0, "test": 2.0, "premium": 8.0}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_fair_queue_interleaves_tenants_by_weight():
+    async def scenario():
+        queue = FairQueue()
+        order = {}
+        for i in range(4):
+            order[queue.push("flood", 1.0, 1.0)] = f"flood-{i}"
+        order[queue.push("premium", 8.0, 1.0)] = "premium"
+        order[queue.push("other", 1.0, 1.0)] = "other"
+        popped = []
+        while (waiter := queue.pop()) is not None:
+            popped.append(order[waiter])
+        return popped
+
+    popped = run(scenario())
+    assert popped[0] == "premium"
+    # The second guest is served next to the flooder's first, not behind all of it
+    assert popped.index("other") <= 2
+    assert popped[-1] == "flood-3"
+
+
+def test_fair_queue_discard_of_done_waiter_still_leaves_queue():
+    async def scenario():
+        queue = FairQueue()
+        waiter = queue.push("a", 1.0, 1.0)
+        waiter.cancel()
+        assert len(queue) == 1
+        queue.discard(waiter)
+        assert len(queue) == 0
+        assert queue.pop() is None
+
+    run(scenario())
+
+
+def test_acquire_succeeds_after_a_queue_timeout():
+    async def scenario():
+        admission = AdmissionController("test", initial_limit=1, min_limit=1, queue_timeout=0.05, weights=WEIGHTS)
+        await admission.acquire(tenant="a")
+        with pytest.raises(ProviderOverloaded):
+            await admission.acquire(tenant="b")
+        assert admission.queued == 0
+        admission.release()
+        # Idle again: takes the fast path instead of queueing behind a ghost
+        await asyncio.wait_for(admission.acquire(tenant="b"), 0.01)
+        assert admission.in_flight == 1
+        admission.release()
+
+    run(scenario())
+
+
+def test_acquire_succeeds_after_a_cancelled_waiter():
+    async def scenario():
+        admission = AdmissionController("test", initial_limit=1, min_limit=1, queue_timeout=5.0, weights=WEIGHTS)
+        await admission.acquire(tenant="a")
+        waiting = asyncio.create_task(admission.acquire(tenant="b"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert admission.queued == 0
+        admission.release()
+        await asyncio.wait_for(admission.acquire(tenant="c"), 0.01)
+        admission.release()
+
+    run(scenario())
+
+
+def test_premium_is_admitted_before_queued_guests():
+    async def scenario():
+        admission = AdmissionController("test", initial_limit=1, min_limit=1, queue_timeout=5.0, weights=WEIGHTS)
+        await admission.acquire(tenant="holder")
+        admitted = []
+
+        async def call(tenant, tier):
+            await admission.acquire(tenant=tenant, tier=tier)
+            admitted.append(tenant)
+            admission.release()
+
+        tasks = [asyncio.create_task(call(f"guest-{i}", "guest")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("premium", "premium")))
+        await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(*tasks)
+        return admitted
+
+    assert run(scenario())[0] == "premium"
+
+
+def test_full_queue_pushes_out_the_tenant_over_its_share():
+    async def scenario():
+        admission = AdmissionController("test", initial_limit=1, min_limit=1, max_queue=2, queue_timeout=5.0, weights=WEIGHTS)
+        await admission.acquire(tenant="holder")
+        flood = [asyncio.create_task(admission.acquire(tenant="flood", tier="guest")) for _ in range(2)]
+        await asyncio.sleep(0)
+        fair = asyncio.create_task(admission.acquire(tenant="fair", tier="guest"))
+        await asyncio.wait([flood[1]], timeout=1)
+        # The flooder's newest entry made room for the newcomer
+        assert flood[1].done() and isinstance(flood[1].exception(), ProviderOverloaded)
+        assert not fair.done()
+        admission.release()
+        await flood[0]
+        admission.release()
+        await fair
+        admission.release()
+        assert admission.in_flight == 0 and admission.queued == 0
+
+    run(scenario())
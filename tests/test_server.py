@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app.main  # noqa: F401 - the app is imported, as in a worker
+from app.core.config import get_settings
+from app.server import share_worker_state
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_single_worker_keeps_the_settings():
+    settings = get_settings()
+    assert share_worker_state(settings, 1, 5000) is settings
+
+
+def test_sharing_state_after_the_app_was_imported_fails_loudly():
+    with pytest.raises(RuntimeError, match="before the app is imported"):
+        share_worker_state(get_settings(), 2, 5000)
+
+
+def launch_settings(port: int, env: dict) -> list:
+    # A fresh interpreter, as share_worker_state runs before the app is imported
+    script = (
+        "from app.core.config import get_settings\n"
+        "from app.server import share_worker_state\n"
+        f"settings = share_worker_state(get_settings(), 2, {port})\n"
+        "print(settings.limiter_backend, settings.limiter_shm_path)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_workers_share_one_limiter_file_per_port(tmp_path):
+    env = {k: v for k, v in os.environ.items() if not k.startswith("LIMITER_")}
+    env["METRICS_MULTIPROCESS_DIR"] = str(tmp_path)
+    first, second = launch_settings(5000, env), launch_settings(5001, env)
+    assert first[0] == second[0] == "shm"
+    assert os.path.basename(first[1]) == "axonnexus-api-limiter-5000"
+    assert os.path.basename(second[1]) == "axonnexus-api-limiter-5001"
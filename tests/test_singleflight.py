@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", fn) for _ in range(5)))
+        return calls, results, flight.inflight
+
+    calls, results, inflight = run(scenario())
+    assert calls == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result == "result" for result, _ in results)
+    assert inflight == 0
+
+
+def test_different_keys_do_not_coalesce():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            return object()
+
+        (first, _), (second, _) = await asyncio.gather(flight.do("a", fn), flight.do("b", fn))
+        return first is second
+
+    assert run(scenario()) is False
+
+
+def test_leader_error_reaches_followers():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise KeyError("upstream")
+
+        return await asyncio.gather(*(flight.do("key", fn) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, KeyError) for result in run(scenario()))
+
+
+def test_follower_takes_over_when_the_leader_is_cancelled():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return calls
+
+        leader = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, calls
+
+    (result, shared), calls = run(scenario())
+    assert calls == 2 and result == 2 and shared is False
+
+
+def test_cancelled_follower_leaves_the_leader_running():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.03)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert run(scenario()) == ("done", False)
+
+
+def test_coalesced_chat_callers_get_their_own_copies(monkeypatch):
+    from app.core.context import RouteContext
+    from app.core.schemas import ChatRequest, Message
+    from app.providers.base import LazyProviders
+    from app.providers.mock import MockProvider
+    from app.providers.router import ProviderRouter, settings
+
+    class SlowMock(MockProvider):
+        calls = 0
+
+        async def achat_completion(self, request, model_name=None, messages=None):
+            SlowMock.calls += 1
+            await asyncio.sleep(0.05)
+            return await super().achat_completion(request, model_name=model_name, messages=messages)
+
+    monkeypatch.setattr(settings, "coalesce_enabled", True)
+    router = ProviderRouter()
+    provider = SlowMock()
+    router.providers = LazyProviders({"mock": lambda: provider})
+
+    async def call(key):
+        ctx = RouteContext(use_cache=False)
+        request = ChatRequest(model="axon-mock", messages=[Message(role="user", content="coalesce me")])
+        return await router.route_chat(request, key, False, False, ctx), ctx
+
+    async def scenario():
+        return await asyncio.gather(call("coalesce-a"), call("coalesce-b"), call("coalesce-c"))
+
+    results = run(scenario())
+    assert SlowMock.calls == 1
+    assert len({response.id for response, _ in results}) == 3
+    assert sum(ctx.headers.get("X-Axon-Coalesced") == "true" for _, ctx in results) == 2
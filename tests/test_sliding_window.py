@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.core import limiter_backends
+from app.core.limiter_backends import MemoryBackend, SharedMemoryBackend, _slide
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_000_000.0)
+    monkeypatch.setattr(limiter_backends.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture(params=["memory", "shm"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    return SharedMemoryBackend(str(tmp_path / "limiter"), 64)
+
+
+def hits(backend, count: int, limit: int = 10, window: float = 60.0) -> int:
+    async def scenario():
+        return sum([await backend.hit("client", limit, window) for _ in range(count)])
+    return asyncio.run(scenario())
+
+
+def test_slide_weights_the_previous_window_by_its_overlap():
+    # A quarter into window 11, three quarters of window 10 still overlap
+    index, current, previous, estimate = _slide(10, 8, 0, 11.25 * 60, 60)
+    assert (index, current, previous) == (11, 0, 8)
+    assert estimate == pytest.approx(6.0)
+    # Skipping a whole window forgets everything
+    assert _slide(10, 8, 4, 12.5 * 60, 60)[1:] == (0, 0, 0.0)
+
+
+def test_limit_holds_within_a_window(backend, clock):
+    clock.now = 60.0 * 1000
+    assert hits(backend, 15) == 10
+
+
+def test_no_double_burst_across_a_window_boundary(backend, clock):
+    # The whole limit at the very end of one window...
+    clock.now = 60.0 * 1000 + 59.0
+    assert hits(backend, 10) == 10
+    # ...leaves almost nothing right after the boundary, unlike a fixed window
+    clock.now = 60.0 * 1001 + 1.0
+    assert hits(backend, 10) == 1
+    # and frees up as the old window slides out: 10 * 0.5 + 1 counted so far
+    clock.now = 60.0 * 1001 + 30.0
+    assert hits(backend, 10) == 4
+
+
+def test_memory_backend_stays_bounded(clock):
+    backend = MemoryBackend(max_keys=3, idle_ttl=60.0)
+
+    async def scenario():
+        for i in range(5):
+            await backend.hit(f"client-{i}", 10, 60.0)
+        assert len(backend) == 3
+        # Idle keys are evicted as others are touched
+        clock.now += 120.0
+        await backend.hit("fresh", 10, 60.0)
+        await backend.hit("fresh", 10, 60.0)
+        return len(backend)
+
+    assert asyncio.run(scenario()) == 1
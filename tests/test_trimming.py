@@ -0,0 +1,104 @@
+import pytest
+
+from app.core.schemas import Message
+from app.core.trimming import trim_messages
+
+
+def message(role: str, name: str) -> Message:
+    # 40 characters estimate to 10 tokens, 14 with the message framing
+    return Message(role=role, content=name.ljust(40, "."))
+
+
+@pytest.fixture
+def conversation():
+    """A system prompt and four turns, the last one unanswered: 115 tokens."""
+    roles = ["system", "user", "assistant", "user", "assistant", "user", "assistant", "user"]
+    names = ["sys", "u1", "a1", "u2", "a2", "u3", "a3", "u4"]
+    return [message(role, name) for role, name in zip(roles, names)]
+
+
+def names(messages):
+    return [m.content.rstrip(".") for m in messages]
+
+
+def test_last_n_keeps_system_messages_and_the_last_turns(conversation):
+    result = trim_messages(conversation, "last_n", None, 2)
+    assert names(result.messages) == ["sys", "u3", "a3", "u4"]
+    assert (result.dropped, result.tokens_before, result.tokens_after) == (4, 115, 59)
+    assert result.header() == "last_n; messages=4; tokens=56"
+
+
+def test_last_n_with_fewer_turns_than_asked_keeps_everything(conversation):
+    result = trim_messages(conversation, "last_n", None, 10)
+    assert result.dropped == 0
+    assert result.messages == conversation
+
+
+def test_fit_drops_the_oldest_messages_and_stops_at_a_turn(conversation):
+    # 30 tokens over: u1, a1 and u2 cover it, and a2 goes too so the history starts at a user message
+    result = trim_messages(conversation, "fit", 85, 8)
+    assert names(result.messages) == ["sys", "u3", "a3", "u4"]
+    assert result.tokens_after <= 85
+    assert result.header() == "fit; messages=4; tokens=56"
+
+
+def test_fit_within_budget_changes_nothing(conversation):
+    for budget in (None, 115):
+        result = trim_messages(conversation, "fit", budget, 8)
+        assert result.dropped == 0
+        assert result.messages == conversation
+
+
+def test_middle_out_keeps_the_opening_and_the_end(conversation):
+    # After the system prompt, u1, u4 and the placeholder, 32 tokens are left: a3 and u3 fit, a2 does not
+    result = trim_messages(conversation, "middle_out", 95, 8)
+    assert names(result.messages) == ["sys", "u1", "[3 earlier messages omitted to fit the context window]", "u3", "a3", "u4"]
+    assert result.messages[2].role == "system"
+    assert result.tokens_after == 91
+    assert result.header() == "middle_out; messages=3; tokens=24"
+
+
+def test_middle_out_resumes_at_the_start_of_a_turn(conversation):
+    # a2 would fit as well, but the kept tail must not open with an assistant reply
+    result = trim_messages(conversation, "middle_out", 109, 8)
+    assert names(result.messages)[3:] == ["u3", "a3", "u4"]
+    assert result.dropped == 3
+
+
+def test_a_budget_below_the_last_message_keeps_system_and_last(conversation):
+    fit = trim_messages(conversation, "fit", 10, 8)
+    assert names(fit.messages) == ["sys", "u4"]
+    middle_out = trim_messages(conversation, "middle_out", 10, 8)
+    assert names(middle_out.messages) == ["sys", "u1", "[5 earlier messages omitted to fit the context window]", "u4"]
+    # Nothing else can go, so the result stays over budget and the upstream decides
+    assert fit.tokens_after > 10 and middle_out.tokens_after > 10
+
+
+def test_unknown_strategy_is_rejected(conversation):
+    with pytest.raises(ValueError, match="Unknown trim strategy"):
+        trim_messages(conversation, "oldest", 100, 8)
+
+
+def test_trimmed_header_on_chat_response(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.providers import router
+
+    monkeypatch.setattr(router.settings, "trim_last_turns", 1)
+    client = TestClient(app)
+    body = {"model": "axon-mock", "messages": [
+        {"role": "user", "content": "u1".ljust(40, ".")},
+        {"role": "assistant", "content": "a1".ljust(40, ".")},
+        {"role": "user", "content": "u2".ljust(40, ".")},
+    ]}
+    headers = {"X-Axon-Trim": "last_n", "Cache-Control": "no-store"}
+    response = client.post("/v1/chat", json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["X-Axon-Trimmed"] == "last_n; messages=2; tokens=28"
+
+    response = client.post("/v1/chat", json=body, headers={**headers, "X-Axon-Trim": "off"})
+    assert "X-Axon-Trimmed" not in response.headers
+
+    response = client.post("/v1/chat", json=body, headers={**headers, "X-Axon-Trim": "newest"})
+    assert response.status_code == 400